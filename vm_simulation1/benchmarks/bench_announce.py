@@ -0,0 +1,119 @@
+# Benchmark: one AnnounceFile per file against batched AnnounceFiles
+#
+#   python benchmarks/bench_announce.py --files 10000 --nodes 20 --replicas 2 --batch 500
+#
+# Starts a controller, registers --nodes simulated nodes that all point at one
+# NodeFileService in this process (answering after --notify-delay seconds),
+# then announces --files files twice: one AnnounceFile call each, as the
+# upload command does, and over one AnnounceFiles stream in batches of
+# --batch, as upload-dir does. Reported for each: time until every file is
+# announced, time until every replica target has been notified, and how many
+# notification calls the controller made.
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+
+from bench_download import free_port, ROOT
+
+import grpc
+from proto import storage_pb2, storage_pb2_grpc
+from channel_pool import pool
+
+
+class CountingNodeService(storage_pb2_grpc.NodeFileServiceServicer):
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+        self.files = 0
+        self._lock = threading.Lock()
+
+    def _count(self, files):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            self.files += files
+        return storage_pb2.Response(message="ok")
+
+    def NotifyDuplicate(self, request, context):
+        return self._count(1)
+
+    def NotifyDuplicates(self, request, context):
+        return self._count(len(request.files))
+
+
+def announcement(i, prefix, args):
+    return storage_pb2.FileAnnouncement(id="sim0", address="127.0.0.1", port=1, filename=f"{prefix}/f{i}.bin",
+                                        replication_factor=args.replicas, size=1000)
+
+
+def run(stub, service, label, announce, args):
+    calls, files = service.calls, service.files
+    start = time.perf_counter()
+    announce()
+    announced = time.perf_counter() - start
+    expected = files + args.files * args.replicas
+    while service.files < expected:
+        time.sleep(0.01)
+    notified = time.perf_counter() - start
+    print(f"{label:28} announced in {announced:7.2f} s, all targets notified after {notified:7.2f} s, "
+          f"{service.calls - calls:6} notification calls")
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        import controller
+        controller.serve_controller("127.0.0.1", int(sys.argv[2]), node_timeout=3600, data_dir="")
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--batch", type=int, default=500, help="Announcements per AnnounceFiles message")
+    parser.add_argument("--notify-delay", type=float, default=0.002, help="Seconds a node takes to answer")
+    args = parser.parse_args()
+
+    service = CountingNodeService(args.notify_delay)
+    node_port, controller_port = free_port(), free_port()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+    storage_pb2_grpc.add_NodeFileServiceServicer_to_server(service, server)
+    server.add_insecure_port(f"127.0.0.1:{node_port}")
+    server.start()
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(controller_port)], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{controller_port}") as channel:
+            grpc.channel_ready_future(channel).result(timeout=15)
+        stub = pool.controller_stub("127.0.0.1", controller_port)
+        for i in range(args.nodes):
+            stub.RegisterNode(storage_pb2.NodeInfo(id=f"sim{i}", address="127.0.0.1", port=node_port))
+
+        def one_by_one():
+            for i in range(args.files):
+                stub.AnnounceFile(announcement(i, "single", args))
+
+        def batched():
+            def batches():
+                for start in range(0, args.files, args.batch):
+                    yield storage_pb2.FileAnnouncementBatch(
+                        files=[announcement(i, "batched", args) for i in range(start, min(start + args.batch, args.files))])
+            for _ in stub.AnnounceFiles(batches()):
+                pass
+
+        print(f"{args.files} files, {args.nodes} nodes, {args.replicas} replicas, "
+              f"{args.notify_delay * 1000:.0f} ms per notification")
+        run(stub, service, "AnnounceFile per file", one_by_one, args)
+        run(stub, service, f"AnnounceFiles, batch {args.batch}", batched, args)
+    finally:
+        proc.terminate()
+        proc.wait()
+        server.stop(0)
+
+
+if __name__ == "__main__":
+    main()
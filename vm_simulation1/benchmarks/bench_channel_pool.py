@@ -0,0 +1,59 @@
+# Benchmark: RPCs/sec with a fresh channel per call vs the shared ChannelPool
+#
+#   python benchmarks/bench_channel_pool.py --calls 2000
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_download import free_port
+
+import grpc
+from proto import storage_pb2, storage_pb2_grpc
+from channel_pool import ChannelPool
+
+
+def per_call_channel(port, request, calls):
+    # What controller.py and node.py used to do: new channel for every request
+    for _ in range(calls):
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            storage_pb2_grpc.NodeFileServiceStub(channel).StatFile(request)
+
+
+def pooled(port, request, calls):
+    pool = ChannelPool()
+    for _ in range(calls):
+        pool.node_stub("127.0.0.1", port).StatFile(request)
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    serve_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_download.py")
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(workdir, "small.txt"), "w") as f:
+            f.write("hello")
+        port = free_port()
+        server = subprocess.Popen([sys.executable, serve_script, "--serve", str(port)], cwd=workdir,
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        server.stdout.readline()
+        request = storage_pb2.FileDownloadRequest(filename="small.txt")
+        try:
+            for name, fn in (("channel per call", per_call_channel), ("pooled channel", pooled)):
+                start = time.perf_counter()
+                fn(port, request, args.calls)
+                elapsed = time.perf_counter() - start
+                print(f"{name:>17}: {args.calls / elapsed:8.0f} RPCs/sec")
+        finally:
+            server.stdin.close()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Benchmark: content-defined chunking, dedup and bytes pushed per replica
+#
+#   python benchmarks/bench_chunk_store.py --size 64M
+#
+# Reported:
+#   - chunking throughput on random and on text-like data
+#   - bytes stored for a file plus an exact copy, and for a file plus a version
+#     with a few bytes inserted in the middle, with content-defined chunks vs
+#     fixed-size chunks of the same mean size
+#   - bytes sent by push_replica for v1, then for the edited v2, between two
+#     nodes running in this process
+
+import argparse
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench_download import free_port, parse_size
+
+from chunk_store import ChunkStore, digest, split
+from node import TransferStats, push_replica, serve_node_file_service
+from proto import storage_pb2
+
+
+def text_data(size):
+    words = ["".join(random.choices("abcdefghijklmnopqrstuvwxyz", k=random.randint(2, 9))) for _ in range(5000)]
+    out = []
+    n = 0
+    while n < size:
+        line = " ".join(random.choices(words, k=12)) + "\n"
+        out.append(line)
+        n += len(line)
+    return "".join(out).encode()[:size]
+
+
+def chunking_speed(data):
+    start = time.perf_counter()
+    sizes = [len(c) for c in split(io.BytesIO(data))]
+    elapsed = time.perf_counter() - start
+    return len(data) / elapsed / 1e6, len(data) / len(sizes)
+
+
+def fixed_split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def stored_bytes(files, chunker):
+    # Bytes kept when every file is cut by chunker and equal chunks are kept once
+    seen = {}
+    for data in files:
+        for c in chunker(data):
+            seen[digest(c)] = len(c)
+    return sum(seen.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="64M", help="Size of the test file")
+    parser.add_argument("--insert", type=int, default=100, help="Bytes inserted into the middle for v2")
+    args = parser.parse_args()
+    size = parse_size(args.size)
+
+    random.seed(1)
+    data = os.urandom(size)
+    speed, mean = chunking_speed(data)
+    print(f"chunking random data: {speed:6.1f} MB/s, mean chunk {mean / 1024:.0f}K")
+    speed, _ = chunking_speed(text_data(min(size, 32 * 1024 * 1024)))
+    print(f"chunking text:        {speed:6.1f} MB/s")
+
+    v2 = data[:size // 2] + os.urandom(args.insert) + data[size // 2:]
+    cdc = lambda d: split(io.BytesIO(d))
+    fixed = lambda d: fixed_split(d, int(mean))
+    print(f"\n{'':24}{'content-defined':>18}{'fixed-size':>14}")
+    for label, files in (("file + exact copy", [data, data]), (f"file + {args.insert}-byte insert", [data, v2])):
+        logical = sum(len(d) for d in files)
+        a = stored_bytes(files, cdc)
+        b = stored_bytes(files, fixed)
+        print(f"{label:24}{logical / a:15.2f}x{logical / b:13.2f}x   (dedup ratio)")
+
+    work = tempfile.mkdtemp(prefix="bench_chunk_store_")
+    try:
+        v1_path = os.path.join(work, "v1.bin")
+        v2_path = os.path.join(work, "v2.bin")
+        with open(v1_path, "wb") as f:
+            f.write(data)
+        with open(v2_path, "wb") as f:
+            f.write(v2)
+        del data, v2
+        sender = ChunkStore(os.path.join(work, "sender"))
+        receiver = ChunkStore(os.path.join(work, "receiver"))
+        port = free_port()
+        server = serve_node_file_service("127.0.0.1", port, store=receiver)
+        target = storage_pb2.NodeLocation(id="receiver", address="127.0.0.1", port=port)
+        transfers = TransferStats()
+        print()
+        try:
+            for path, fname in ((v1_path, "file"), (v2_path, "file.v2")):
+                start = time.perf_counter()
+                sender.ingest(path, fname)
+                _, sent = push_replica(sender, fname, target, transfers)
+                elapsed = time.perf_counter() - start
+                print(f"push {fname:8}: {sent:>12} of {os.path.getsize(path):>12} bytes sent in {elapsed:5.2f} s")
+        finally:
+            server.stop(0)
+        st = receiver.stats()
+        print(f"receiver: {st['logical']} bytes in {st['files']} files, {st['stored']} on disk "
+              f"(dedup ratio {st['dedup_ratio']:.2f})")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: replication traffic and CPU with transfer compression
+#
+#   python benchmarks/bench_compression.py --size 16M --link-mbps 100
+#
+# Pushes a --size file to a fresh receiver node (push_replica, the path
+# replication uses) once raw and once with every codec available here, for
+# text, already-compressed (random) and half-and-half content. Reported: bytes
+# on the wire, the sender's CPU time, and the transfer time on a --link-mbps
+# link (the larger of the measured time and wire bytes / link speed, since
+# localhost has no link to saturate).
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_download import free_port, parse_size, ROOT
+
+import grpc
+from chunk_store import ChunkStore
+from node import TransferStats, push_replica, serve_node_file_service
+from proto import storage_pb2
+import transfer_codec
+
+
+WORDS = ("the of and to in is that for it as was with be by on not he this are or his from at which but have an they "
+         "you were her she there been one all we their has would when if so what no out up into more").split()
+
+
+def serve(port, store_dir):
+    server = serve_node_file_service("127.0.0.1", port, store=ChunkStore(store_dir))
+    sys.stdin.read()  # run until the parent closes our stdin
+    server.stop(0)
+
+
+def make_content(kind, size, rng):
+    if kind == "random":
+        return os.urandom(size)
+    text = " ".join(rng.choices(WORDS, k=size // 4)).encode()[:size]
+    if kind == "text":
+        return text
+    return text[:size // 2] + os.urandom(size - size // 2)
+
+
+def push(work, store, fname, codecs):
+    # One push_replica to a new receiver; (wire bytes, sender CPU s, elapsed s)
+    port = free_port()
+    receiver_dir = tempfile.mkdtemp(dir=work)
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port), receiver_dir],
+                            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            grpc.channel_ready_future(channel).result(timeout=15)
+        target = storage_pb2.NodeLocation(id="receiver", address="127.0.0.1", port=port, codecs=codecs)
+        transfers = TransferStats()
+        cpu = time.process_time()
+        start = time.perf_counter()
+        push_replica(store, fname, target, transfers)
+        return transfers.total_bytes, time.process_time() - cpu, time.perf_counter() - start
+    finally:
+        proc.stdin.close()
+        proc.wait()
+        shutil.rmtree(receiver_dir)
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve(int(sys.argv[2]), sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="16M")
+    parser.add_argument("--link-mbps", type=float, default=100, help="Link speed used for the transfer time")
+    args = parser.parse_args()
+    size = parse_size(args.size)
+    link = args.link_mbps * 1e6 / 8
+
+    work = tempfile.mkdtemp(prefix="bench_compression_")
+    try:
+        store = ChunkStore(os.path.join(work, "store"))
+        rng = random.Random(1)
+        print(f"codecs available: {', '.join(transfer_codec.available())}")
+        for kind in ("text", "random", "mixed"):
+            path = os.path.join(work, kind)
+            with open(path, "wb") as f:
+                f.write(make_content(kind, size, rng))
+            store.ingest(path, kind)
+            for codec in [""] + transfer_codec.available():
+                wire, cpu, elapsed = push(work, store, kind, [codec] if codec else [])
+                print(f"{kind:>6} {codec or 'raw':>5}: {wire / 1e6:7.2f} MB on the wire ({wire / size:5.1%}), "
+                      f"sender CPU {cpu:5.2f} s, {max(elapsed, wire / link):6.2f} s at {args.link_mbps:g} Mbit/s")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Load test: threaded controller vs the --async (grpc.aio) controller
+#
+#   python benchmarks/bench_controller.py --nodes 1000 --duration 20
+#
+# Every simulated node has its own connection, registers, sends a heartbeat
+# every --interval seconds and now and then announces a file instead. The
+# replica targets of each announced file get a NotifyDuplicate; all simulated
+# nodes point at one NodeFileService that takes --notify-delay seconds to
+# answer, like a cluster of busy nodes. Reported: controller RPC latency and
+# how long the notification fan-out needs to drain after the load stops.
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+from bench_download import free_port, ROOT
+
+import grpc
+import grpc.aio
+from proto import storage_pb2, storage_pb2_grpc
+
+RPC_TIMEOUT = 10
+DRAIN_TIMEOUT = 120
+
+
+class SlowNodeService(storage_pb2_grpc.NodeFileServiceServicer):
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def NotifyDuplicate(self, request, context):
+        await asyncio.sleep(self.delay)
+        return storage_pb2.Response(message="ok")
+
+
+async def serve_slow_node(port, delay):
+    server = grpc.aio.server()
+    storage_pb2_grpc.add_NodeFileServiceServicer_to_server(SlowNodeService(delay), server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    await server.start()
+    await server.wait_for_termination()
+
+
+def serve_controller(port, mode):
+    import controller
+    serve = controller.serve_controller_async if mode == "async" else controller.serve_controller
+    # Nodes must not time out while the fan-out drains after the load stops
+    serve("127.0.0.1", port, node_timeout=3600, data_dir="")
+
+
+def start(args, ready_port):
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__)] + args, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with grpc.insecure_channel(f"127.0.0.1:{ready_port}") as channel:
+        grpc.channel_ready_future(channel).result(timeout=15)
+    return proc
+
+
+async def simulate_node(i, port, node_port, args, deadline, results):
+    # Nodes come up spread over the first interval, as a cluster would; opening
+    # thousands of connections in the same instant gets calls CANCELLED
+    nid = f"sim{i}"
+    await asyncio.sleep(i * args.interval / args.nodes)
+    async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+        stub = storage_pb2_grpc.StorageControllerStub(channel)
+        try:
+            await stub.RegisterNode(storage_pb2.NodeInfo(id=nid, address="127.0.0.1", port=node_port),
+                                    timeout=RPC_TIMEOUT)
+        except grpc.aio.AioRpcError:
+            results["unregistered"] += 1
+            return
+        seq = 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                if random.random() < args.announce_ratio:
+                    fname = f"{nid}-{seq}.txt"
+                    seq += 1
+                    await stub.AnnounceFile(storage_pb2.FileAnnouncement(
+                        id=nid, filename=fname, address="127.0.0.1", port=node_port), timeout=RPC_TIMEOUT)
+                    results["files"].append(fname)
+                else:
+                    await stub.Heartbeat(storage_pb2.NodeInfo(id=nid), timeout=RPC_TIMEOUT)
+                results["latency"].append(time.perf_counter() - start)
+            except grpc.aio.AioRpcError:
+                results["errors"] += 1
+            await asyncio.sleep(max(0.0, args.interval - (time.perf_counter() - start)))
+
+
+async def drain(port, files):
+    # Seconds until no file has a pending notification left, and the final counts
+    async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+        stub = storage_pb2_grpc.StorageControllerStub(channel)
+        start = time.monotonic()
+        while True:
+            statuses = await asyncio.gather(*(stub.GetReplicationStatus(
+                storage_pb2.FileName(filename=f), timeout=RPC_TIMEOUT) for f in files))
+            pending = sum(s.pending for s in statuses)
+            if pending == 0 or time.monotonic() - start > DRAIN_TIMEOUT:
+                return (time.monotonic() - start, pending,
+                        sum(s.notified for s in statuses), sum(s.failed for s in statuses))
+            await asyncio.sleep(0.5)
+
+
+async def load(port, node_port, args):
+    results = {"latency": [], "files": [], "errors": 0, "unregistered": 0}
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*(simulate_node(i, port, node_port, args, deadline, results)
+                           for i in range(args.nodes)))
+    return results, await drain(port, results["files"])
+
+
+def run_case(mode, args):
+    port, node_port = free_port(), free_port()
+    slow_node = start(["--slow-node", str(node_port), str(args.notify_delay)], node_port)
+    controller = start(["--controller", str(port), mode], port)
+    try:
+        results, (drain_s, pending, notified, failed) = asyncio.run(load(port, node_port, args))
+    finally:
+        controller.terminate()
+        slow_node.terminate()
+        controller.wait()
+        slow_node.wait()
+    latency = sorted(results["latency"])
+    pct = lambda p: latency[min(len(latency) - 1, int(p * len(latency)))] * 1000 if latency else 0.0
+    print(f"{mode:>8}: {len(latency) / args.duration:7.0f} RPCs/sec  p50 {pct(0.5):6.1f} ms  "
+          f"p99 {pct(0.99):7.1f} ms  errors {results['errors']:4}  "
+          f"failed registrations {results['unregistered']:4}  | "
+          f"{len(results['files'])} files, fan-out drained in {drain_s:5.1f} s "
+          f"(notified {notified}, failed {failed}, still pending {pending})")
+
+
+def main():
+    if sys.argv[1:2] == ["--slow-node"]:
+        asyncio.run(serve_slow_node(int(sys.argv[2]), float(sys.argv[3])))
+        return
+    if sys.argv[1:2] == ["--controller"]:
+        serve_controller(int(sys.argv[2]), sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between requests of one node")
+    parser.add_argument("--announce-ratio", type=float, default=0.05, help="Share of requests that announce a file")
+    parser.add_argument("--notify-delay", type=float, default=0.5, help="Seconds a node takes per NotifyDuplicate")
+    parser.add_argument("--modes", default="threaded,async")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        run_case(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Benchmark: throughput and peak RSS of unary DownloadFile vs streamed DownloadFileStream
+#
+#   python benchmarks/bench_download.py --sizes 1M,64M,512M,2G
+#
+# Server and client each run in their own process so peak RSS is measured per side.
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def parse_size(text):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_file(path, size):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[:min(len(block), remaining)])
+            remaining -= len(block)
+
+
+def serve(port):
+    from node import serve_node_file_service
+    server = serve_node_file_service("127.0.0.1", port)
+    print("ready", flush=True)
+    sys.stdin.read()  # run until the parent closes our stdin
+    server.stop(0)
+    print(json.dumps({"rss_mb": peak_rss_mb()}), flush=True)
+
+
+def fetch(port, fname, mode):
+    import grpc
+    from proto import storage_pb2, storage_pb2_grpc
+    from node import write_chunks
+    channel = grpc.insecure_channel(f"127.0.0.1:{port}")
+    stub = storage_pb2_grpc.NodeFileServiceStub(channel)
+    req = storage_pb2.FileDownloadRequest(filename=fname)
+    out = f"bench_copy_{fname}"
+    start = time.perf_counter()
+    error = ""
+    try:
+        if mode == "unary":
+            content = stub.DownloadFile(req)
+            with open(out, "wb") as f:
+                f.write(content.content)
+        else:
+            write_chunks(stub.DownloadFileStream(req), out)
+    except grpc.RpcError as e:
+        error = e.code().name
+    elapsed = time.perf_counter() - start
+    if os.path.exists(out):
+        os.remove(out)
+    print(json.dumps({"seconds": elapsed, "rss_mb": peak_rss_mb(), "error": error}), flush=True)
+
+
+def run_case(workdir, fname, size, mode):
+    port = free_port()
+    me = os.path.abspath(__file__)
+    server = subprocess.Popen([sys.executable, me, "--serve", str(port)], cwd=workdir,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    server.stdout.readline()
+    client = subprocess.run([sys.executable, me, "--fetch", str(port), fname, mode], cwd=workdir,
+                            capture_output=True, text=True)
+    server.stdin.close()
+    server_stats = json.loads(server.stdout.readlines()[-1])
+    server.wait()
+    client_stats = json.loads(client.stdout.strip().splitlines()[-1])
+    mb = size / (1024 * 1024)
+    if client_stats["error"]:
+        rate = f"FAILED ({client_stats['error']})"
+    else:
+        rate = f"{mb / client_stats['seconds']:8.1f} MB/s"
+    print(f"{mode:>7} {mb:10.0f} MB  {rate:>28}  client RSS {client_stats['rss_mb']:8.1f} MB  "
+          f"server RSS {server_stats['rss_mb']:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1M,16M,128M,512M,2G")
+    parser.add_argument("--modes", default="unary,stream")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fetch", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve)
+    if args.fetch:
+        return fetch(int(args.fetch[0]), args.fetch[1], args.fetch[2])
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in [parse_size(s) for s in args.sizes.split(",")]:
+            fname = f"bench_{size}.bin"
+            make_file(os.path.join(workdir, fname), size)
+            for mode in args.modes.split(","):
+                run_case(workdir, fname, size, mode)
+            os.remove(os.path.join(workdir, fname))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Benchmark: erasure coding against whole-file replicas
+#
+#   python benchmarks/bench_erasure.py --size 16M --layouts 4+2,6+3,10+4
+#
+# For each k+m layout: encode throughput, decode throughput with every data
+# shard present (a plain join) and with m data shards lost (the worst case,
+# m shards rebuilt from parity), and the bytes stored compared with the
+# m + 1 whole copies it takes to survive the same m lost nodes.
+
+import argparse
+import os
+import random
+import time
+
+from bench_download import parse_size
+
+import erasure
+
+
+def timed(fn, repeat=3):
+    # Best wall time of fn() over repeat runs, and its last result
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="16M")
+    parser.add_argument("--layouts", default="4+2,6+3,10+4", help="Comma-separated k+m shard layouts")
+    args = parser.parse_args()
+    size = parse_size(args.size)
+    data = os.urandom(size)
+    rng = random.Random(1)
+
+    for layout in args.layouts.split(","):
+        k, m = (int(part) for part in layout.split("+"))
+        encode_time, shards = timed(lambda: erasure.encode(data, k, m))
+        complete = dict(enumerate(shards[:k]))
+        join_time, rebuilt = timed(lambda: erasure.decode(complete, k, m, size))
+        assert rebuilt == data
+        lost = set(rng.sample(range(k), min(m, k)))
+        degraded = {i: shard for i, shard in enumerate(shards) if i not in lost}
+        degraded = dict(list(degraded.items())[:k])
+        decode_time, rebuilt = timed(lambda: erasure.decode(degraded, k, m, size))
+        assert rebuilt == data
+        stored = sum(len(shard) for shard in shards)
+        print(f"{k:>2}+{m}: encode {size / encode_time / 1e6:7.1f} MB/s, join {size / join_time / 1e6:8.1f} MB/s, "
+              f"rebuild {m} lost {size / decode_time / 1e6:7.1f} MB/s | stored {stored / size:4.2f}x "
+              f"vs {m + 1} copies {m + 1:.2f}x, survives {m} lost nodes")
+
+
+if __name__ == "__main__":
+    main()
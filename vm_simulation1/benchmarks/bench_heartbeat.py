@@ -0,0 +1,82 @@
+# Benchmark: controller cost of unary Heartbeat RPCs vs one HeartbeatStream per node
+#
+#   python benchmarks/bench_heartbeat.py --nodes 200 --beats 50
+#
+# Every simulated node sends --beats heartbeats back to back, either as unary
+# calls or as messages on its stream. Reported: wall time and the controller
+# process's CPU time per 1000 heartbeats (Linux, read from /proc).
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from bench_download import free_port, ROOT
+
+import grpc
+import grpc.aio
+from proto import storage_pb2, storage_pb2_grpc
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def simulate_node(port, nid, beats, mode):
+    async with grpc.aio.insecure_channel(f"127.0.0.1:{port}") as channel:
+        stub = storage_pb2_grpc.StorageControllerStub(channel)
+        await stub.RegisterNode(storage_pb2.NodeInfo(id=nid, address="127.0.0.1", port=1))
+        stats = storage_pb2.NodeStats(id=nid, free_disk=1 << 40, file_count=10)
+        if mode == "unary":
+            for _ in range(beats):
+                await stub.Heartbeat(storage_pb2.NodeInfo(id=nid, address="127.0.0.1", port=1, free_disk=1 << 40))
+        else:
+            call = stub.HeartbeatStream()
+            for _ in range(beats):
+                await call.write(stats)
+            await call.done_writing()
+            async for _ in call:
+                pass
+
+
+async def load(port, args, mode):
+    await asyncio.gather(*(simulate_node(port, f"sim{i}", args.beats, mode) for i in range(args.nodes)))
+
+
+def main():
+    if sys.argv[1:2] == ["--controller"]:
+        import controller
+        controller.serve_controller_async("127.0.0.1", int(sys.argv[2]), data_dir="")
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=200)
+    parser.add_argument("--beats", type=int, default=50, help="Heartbeats per node")
+    args = parser.parse_args()
+
+    for mode in ("unary", "stream"):
+        port = free_port()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--controller", str(port)], cwd=ROOT,
+                                stdout=subprocess.DEVNULL)
+        try:
+            with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+                grpc.channel_ready_future(channel).result(timeout=15)
+            cpu_before = cpu_seconds(proc.pid)
+            start = time.perf_counter()
+            asyncio.run(load(port, args, mode))
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds(proc.pid) - cpu_before
+        finally:
+            proc.terminate()
+            proc.wait()
+        total = args.nodes * args.beats
+        print(f"{mode:>6}: {total} heartbeats in {elapsed:5.2f} s, "
+              f"controller CPU {cpu * 1000 / total * 1000:6.1f} ms per 1000 heartbeats")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Microbenchmark: ListFiles against paged, filtered listing
+#
+#   python benchmarks/bench_listing.py --files 200000 --page-size 1000
+#
+# Fills a MetadataStore with --files files spread over projects and
+# directories, then times (including protobuf serialization):
+#   - ListFiles: every visible name in one FileList,
+#   - the first page of ListFilesPage, unfiltered and with a prefix,
+#   - a whole listing under one directory prefix, page by page,
+#   - one ListFilesStream batch with sizes, owners and upload times.
+# Also reported: the cost of announcing a file now that the visible names
+# are kept sorted.
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata_store import MetadataStore
+from proto import storage_pb2
+
+
+def build(num_files, num_nodes):
+    rng = random.Random(42)
+    store = MetadataStore()
+    for i in range(num_nodes):
+        store.set_node_online(f"vm{i}", "127.0.0.1", 5000 + i)
+    names = [f"project{i % 100}/dir{i % 7}/file{i}.bin" for i in range(num_files)]
+    rng.shuffle(names)
+    start = time.perf_counter()
+    for i, fname in enumerate(names):
+        nid = f"vm{i % num_nodes}"
+        store.add_file_owner(fname, (nid, "127.0.0.1", 5000 + i % num_nodes), upload=True)
+        store.set_size(fname, 1000 + i)
+    return store, (time.perf_counter() - start) / num_files * 1e6
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200000)
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    store, announce_us = build(args.files, args.nodes)
+    print(f"{args.files} files, {args.nodes} nodes; announcing a file (sorted index kept up to date) "
+          f"{announce_us:.1f} us")
+
+    def full():
+        return storage_pb2.FileList(filenames=store.visible_files()).SerializeToString()
+
+    def page(prefix=""):
+        names, token = store.list_files("", prefix, "", args.page_size)
+        return storage_pb2.FileList(filenames=names, next_page_token=token).SerializeToString()
+
+    def directory(prefix):
+        # Every page under one directory
+        total, token = 0, ""
+        while True:
+            names, token = store.list_files(token, prefix, "", args.page_size)
+            total += len(storage_pb2.FileList(filenames=names, next_page_token=token).SerializeToString())
+            if not token:
+                return total
+
+    def summaries():
+        names, token = store.list_files("", "project42/", "", args.page_size)
+        return storage_pb2.FileSummaryBatch(next_page_token=token, files=[
+            storage_pb2.FileSummary(filename=fname, size=size, upload_time=when, owners=owners)
+            for fname, size, when, owners in store.file_summaries(names)]).SerializeToString()
+
+    for label, fn in [("ListFiles (all names)", full),
+                      (f"ListFilesPage first {args.page_size}", page),
+                      (f"ListFilesPage first {args.page_size}, prefix", lambda: page("project42/")),
+                      ("ListFilesPage whole project42/dir3/", lambda: directory("project42/dir3/")),
+                      (f"ListFilesStream batch of {args.page_size}", summaries)]:
+        ms, message = timed(fn, args.repeat)
+        size = message if isinstance(message, int) else len(message)
+        print(f"{label:40} {ms:9.3f} ms  {size / 1024:9.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
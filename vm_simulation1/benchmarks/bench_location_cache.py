@@ -0,0 +1,112 @@
+# Benchmark: controller load and lookup latency with the node location cache
+#
+#   python benchmarks/bench_location_cache.py --readers 20 --files 500 --lookups 500
+#
+# --readers threads stand in for nodes in a read-heavy burst; each looks up
+# --lookups files picked from a skewed (Zipf) distribution over --files files,
+# either with a GetFileLocations call each time or through a LocationCache.
+# Reported: controller RPCs, controller CPU (Linux, /proc) and lookup latency.
+# Then resolving 100 filenames with 100 GetFileLocations calls vs one
+# GetFileLocationsBatch.
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from bench_download import free_port, ROOT
+from bench_heartbeat import cpu_seconds
+from bench_read_cache import zipf_sampler
+
+import grpc
+from location_cache import LocationCache
+from proto import storage_pb2, storage_pb2_grpc
+
+
+def populate(stub, files):
+    stub.RegisterNode(storage_pb2.NodeInfo(id="owner", address="127.0.0.1", port=1))
+    for i in range(files):
+        stub.AnnounceFile(storage_pb2.FileAnnouncement(id="owner", address="127.0.0.1", port=1,
+                                                       filename=f"f{i}", replication_factor=1))
+
+
+def reader(port, rid, args, cached, results):
+    pick = zipf_sampler(args.files, args.skew, random.Random(rid))
+    with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+        stub = storage_pb2_grpc.StorageControllerStub(channel)
+        cache = LocationCache(stub, f"reader{rid}") if cached else None
+        latencies = []
+        for _ in range(args.lookups):
+            fname = f"f{pick()}"
+            start = time.perf_counter()
+            if cache:
+                cache.locate([fname])
+            else:
+                stub.GetFileLocations(storage_pb2.FileName(filename=fname, id=f"reader{rid}"))
+            latencies.append(time.perf_counter() - start)
+        rpcs = cache.misses if cache else args.lookups
+    with results["lock"]:
+        results["latency"] += latencies
+        results["rpcs"] += rpcs
+
+
+def main():
+    if sys.argv[1:2] == ["--controller"]:
+        import controller
+        controller.serve_controller("127.0.0.1", int(sys.argv[2]), node_timeout=3600, data_dir="")
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=500, help="Lookups per reader")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent")
+    args = parser.parse_args()
+
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--controller", str(port)], cwd=ROOT,
+                            stdout=subprocess.DEVNULL)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            grpc.channel_ready_future(channel).result(timeout=15)
+            stub = storage_pb2_grpc.StorageControllerStub(channel)
+            populate(stub, args.files)
+
+            for cached in (False, True):
+                results = {"lock": threading.Lock(), "latency": [], "rpcs": 0}
+                threads = [threading.Thread(target=reader, args=(port, i, args, cached, results))
+                           for i in range(args.readers)]
+                cpu_before = cpu_seconds(proc.pid)
+                start = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                elapsed = time.perf_counter() - start
+                cpu = cpu_seconds(proc.pid) - cpu_before
+                latency = sorted(results["latency"])
+                pct = lambda p: latency[min(len(latency) - 1, int(p * len(latency)))] * 1000
+                print(f"{'cached' if cached else 'direct':>6}: {results['rpcs']:6} controller RPCs "
+                      f"({results['rpcs'] / elapsed:7.0f}/s), controller CPU {cpu:5.2f} s, "
+                      f"lookup p50 {pct(0.5):6.3f} ms  p99 {pct(0.99):6.3f} ms")
+
+            names = [f"f{i}" for i in range(100)]
+            start = time.perf_counter()
+            for fname in names:
+                stub.GetFileLocations(storage_pb2.FileName(filename=fname))
+            unary = time.perf_counter() - start
+            start = time.perf_counter()
+            stub.GetFileLocationsBatch(storage_pb2.FileNameBatch(filenames=names))
+            batch = time.perf_counter() - start
+            print(f"resolve 100 files: {unary * 1000:6.1f} ms with GetFileLocations, "
+                  f"{batch * 1000:6.1f} ms with one GetFileLocationsBatch")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
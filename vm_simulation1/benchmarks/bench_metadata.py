@@ -0,0 +1,89 @@
+# Microbenchmark: ListFiles and node departure with and without the FileIndex
+#
+#   python benchmarks/bench_metadata.py --files 100000 --nodes 1000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_index import FileIndex
+
+
+def build(num_files, num_nodes, owners_per_file):
+    rng = random.Random(42)
+    nodes = {f"vm{i}": ("127.0.0.1", 5000 + i, True, "") for i in range(num_nodes)}
+    files = {}
+    index = FileIndex()
+    for nid in nodes:
+        index.node_online(nid)
+    for i in range(num_files):
+        fname = f"file{i}.txt"
+        owners = {(nid, "127.0.0.1", 0) for nid in rng.sample(sorted(nodes), owners_per_file)}
+        files[fname] = {'owners': owners, 'upload_time': ""}
+        for nid, _, _ in owners:
+            index.add_owner(fname, nid)
+    return nodes, files, index
+
+
+def scan_list_files(nodes, files):
+    # ListFiles before the index: check every owner of every file
+    visible = []
+    for fname, info in files.items():
+        for nid, _, _ in info['owners']:
+            if nid in nodes and nodes[nid][2]:
+                visible.append(fname)
+                break
+    return visible
+
+
+def scan_orphans(nodes, files):
+    # serve_controller before the index: walk every file after a departure
+    return [fname for fname, info in files.items()
+            if not [nid for nid, _, _ in info['owners'] if nid in nodes and nodes[nid][2]]]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--owners", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    nodes, files, index = build(args.files, args.nodes, args.owners)
+    print(f"{args.files} files, {args.nodes} nodes, {args.owners} owners per file")
+
+    scan = timed(lambda: scan_list_files(nodes, files), args.repeat)
+    indexed = timed(lambda: list(index.visible), args.repeat)
+    print(f"ListFiles       scan {scan:9.3f} ms   index {indexed:9.3f} ms")
+
+    # Take nodes offline one at a time and bring them back
+    departing = sorted(nodes)[:args.repeat]
+    start = time.perf_counter()
+    for nid in departing:
+        addr, port, _, seen = nodes[nid]
+        nodes[nid] = (addr, port, False, seen)
+        scan_orphans(nodes, files)
+        nodes[nid] = (addr, port, True, seen)
+    scan = (time.perf_counter() - start) / len(departing) * 1000
+    start = time.perf_counter()
+    for nid in departing:
+        index.node_offline(nid)
+        index.node_online(nid)
+    indexed = (time.perf_counter() - start) / len(departing) * 1000
+    print(f"Node departure  scan {scan:9.3f} ms   index {indexed:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
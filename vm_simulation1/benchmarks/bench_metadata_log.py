@@ -0,0 +1,79 @@
+# Benchmark: controller metadata restore time from the WAL and from a snapshot
+#
+#   python benchmarks/bench_metadata_log.py --files 1000000 --nodes 1000
+#
+# "without log" is the cost of building the store itself, which bounds how
+# fast a restore can replay it.
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata_log import MetadataLog, SNAPSHOT_FILE, WAL_FILE
+from metadata_store import MetadataStore
+
+
+def populate(store, num_files, num_nodes):
+    for i in range(num_nodes):
+        store.set_node_online(f"vm{i}", "127.0.0.1", 5000 + i)
+    for i in range(num_files):
+        nid = f"vm{i % num_nodes}"
+        store.add_file_owner(f"project{i % 100}/file{i}.txt", (nid, "127.0.0.1", 5000 + i % num_nodes), upload=True)
+
+
+def restore(data_dir):
+    store = MetadataStore()
+    log = MetadataLog(data_dir, compact_every=10 ** 9)
+    start = time.perf_counter()
+    count = log.restore(store)
+    elapsed = time.perf_counter() - start
+    log.close()
+    return store, count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200000)
+    parser.add_argument("--nodes", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        plain = MetadataStore()
+        start = time.perf_counter()
+        populate(plain, args.files, args.nodes)
+        base = time.perf_counter() - start
+        del plain
+
+        store = MetadataStore()
+        log = MetadataLog(data_dir, compact_every=10 ** 9)
+        log.restore(store)
+        start = time.perf_counter()
+        populate(store, args.files, args.nodes)
+        log.flush()
+        logged = time.perf_counter() - start
+        log.close()
+        del store
+        print(f"Populate {args.files} files: {base:.2f} s without log, {logged:.2f} s with log")
+        print(f"WAL size: {os.path.getsize(os.path.join(data_dir, WAL_FILE)) / 2 ** 20:.1f} MB")
+
+        restored, count, elapsed = restore(data_dir)
+        print(f"Restore from WAL:      {count} records in {elapsed:.2f} s "
+              f"({len(restored.files_snapshot())} files)")
+        del restored
+
+        log = MetadataLog(data_dir, compact_every=10 ** 9)
+        log.restore(MetadataStore())
+        log.compact()
+        log.close()
+        print(f"Snapshot size: {os.path.getsize(os.path.join(data_dir, SNAPSHOT_FILE)) / 2 ** 20:.1f} MB")
+        restored, count, elapsed = restore(data_dir)
+        print(f"Restore from snapshot: {count} records in {elapsed:.2f} s "
+              f"({len(restored.files_snapshot())} files)")
+
+
+if __name__ == "__main__":
+    main()
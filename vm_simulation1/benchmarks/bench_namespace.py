@@ -0,0 +1,72 @@
+# Microbenchmark: directory operations against the size of the namespace
+#
+#   python benchmarks/bench_namespace.py --sizes 10000 100000 300000 --subtree 100
+#
+# For each size, fills a MetadataStore with that many files spread over
+# projects and directories, then times operations on one directory of
+# --subtree files:
+#   - listing it (ListDirectory) and walking it recursively,
+#   - the same listing found by scanning every filename for the prefix
+#     (what a flat name table needs),
+#   - moving it to a new name and back (RenamePath),
+#   - deleting it (DeletePath).
+# With the directory tree the subtree operations should stay flat as the
+# namespace grows; the scan grows with it.
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metadata_store import MetadataStore
+
+
+def build(num_files, subtree, num_nodes=20):
+    store = MetadataStore()
+    for i in range(num_nodes):
+        store.set_node_online(f"vm{i}", "127.0.0.1", 5000 + i)
+    names = [f"project{i % 100}/dir{i % 50}/file{i}.bin" for i in range(num_files)]
+    names += [f"target/sub{i % 10}/file{i}.bin" for i in range(subtree)]
+    for i, fname in enumerate(names):
+        store.add_file_owner(fname, (f"vm{i % num_nodes}", "127.0.0.1", 5000 + i % num_nodes), upload=True)
+    return store
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--subtree", type=int, default=100, help="Files in the directory operated on")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'files':>8} {'list':>9} {'walk -r':>9} {'scan':>9} {'move+back':>10} {'delete':>9}  (ms)")
+    for size in args.sizes:
+        store = build(size, args.subtree)
+
+        def scan():
+            return sorted(fname for fname in store.visible_files() if fname.startswith("target/"))
+
+        def move():
+            store.rename("target", "moved/target")
+            return store.rename("moved/target", "target")
+
+        list_ms, _ = timed(lambda: store.list_dir("target"), args.repeat)
+        walk_ms, entries = timed(lambda: store.list_dir("target", recursive=True), args.repeat)
+        scan_ms, _ = timed(scan, args.repeat)
+        move_ms, _ = timed(move, args.repeat)
+        delete_ms, removed = timed(lambda: store.remove_tree("target"), 1)
+        assert len(removed) == args.subtree and len(entries) == args.subtree + 10
+        print(f"{size:>8} {list_ms:9.3f} {walk_ms:9.3f} {scan_ms:9.3f} {move_ms:10.3f} {delete_ms:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: metadata throughput with the controller split into partitions
+#
+#   python benchmarks/bench_partitions.py --partitions 1,2,4 --clients 4 --duration 10
+#
+# For each partition count, that many controller processes are started and
+# --clients client processes hammer them through PartitionedStub (the
+# routing nodes use) for --duration seconds: every client announces new
+# files and looks up files announced before, --lookups lookups per
+# announcement. Reported: metadata operations per second over all clients.
+# The partitions only run in parallel when the host has cores to spare;
+# os.cpu_count() is printed with the results.
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from bench_download import free_port, ROOT
+
+import grpc
+from proto import storage_pb2
+from partition import PartitionedStub
+from channel_pool import pool
+
+NODES = 20  # registered nodes the files are spread over
+
+
+def serve_partition(partitions, index):
+    import controller
+    host, port = partitions[index]
+    controller.serve_controller(host, port, node_timeout=3600, data_dir="", partitions=partitions, partition=index)
+
+
+def client(ports, seed, duration, lookups):
+    # Runs in its own process; prints the operations it completed
+    stub = PartitionedStub([pool.controller_stub("127.0.0.1", port) for port in ports])
+    rng = random.Random(seed)
+    announced = []
+    ops = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        nid = f"sim{rng.randrange(NODES)}"
+        fname = f"c{seed}-{len(announced)}.bin"
+        stub.AnnounceFile(storage_pb2.FileAnnouncement(id=nid, filename=fname, address="127.0.0.1",
+                                                       port=9000 + int(nid[3:]), replication_factor=1))
+        announced.append(fname)
+        for _ in range(lookups):
+            stub.GetFileLocations(storage_pb2.FileName(filename=rng.choice(announced)))
+        ops += 1 + lookups
+    print(ops)
+
+
+def run(count, args):
+    partitions = [("127.0.0.1", free_port()) for _ in range(count)]
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", json.dumps(partitions), str(i)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+             for i in range(count)]
+    try:
+        for host, port in partitions:
+            with grpc.insecure_channel(f"{host}:{port}") as channel:
+                grpc.channel_ready_future(channel).result(timeout=15)
+        ports = [port for _, port in partitions]
+        stub = PartitionedStub([pool.controller_stub("127.0.0.1", port) for port in ports])
+        for i in range(NODES):
+            stub.RegisterNode(storage_pb2.NodeInfo(id=f"sim{i}", address="127.0.0.1", port=9000 + i))
+        clients = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--client", json.dumps(ports), str(seed),
+                                     str(args.duration), str(args.lookups)], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+                   for seed in range(args.clients)]
+        ops = sum(int(c.communicate()[0].split()[-1]) for c in clients)
+        print(f"{count} partition(s): {ops / args.duration:8.0f} metadata ops/sec "
+              f"({args.clients} clients, {os.cpu_count()} CPUs)")
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve_partition([tuple(p) for p in json.loads(sys.argv[2])], int(sys.argv[3]))
+        return
+    if sys.argv[1:2] == ["--client"]:
+        client(json.loads(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4]), int(sys.argv[5]))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--partitions", default="1,2,4", help="Comma-separated partition counts to compare")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes generating load")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per partition count")
+    parser.add_argument("--lookups", type=int, default=4, help="GetFileLocations per AnnounceFile")
+    args = parser.parse_args()
+
+    for count in args.partitions.split(","):
+        run(int(count), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Benchmark: download latency with one overloaded replica
+#
+#   python benchmarks/bench_peer_selection.py --peers 3 --size 64K --slow-ms 50 --requests 300
+#
+# --peers node processes serve the same file; the first one answers every
+# request --slow-ms late, standing in for a node busy with other transfers.
+# Each download goes to:
+#   random  one peer picked at random (the old random.choice)
+#   ewma    PeerSelector ranking on measured latency only
+#   hints   PeerSelector with the load hint the controller would send
+#           (active_transfers from the busy node's heartbeats)
+#   failover  as hints, with one more location whose node is down
+# Reported: p50/p99 download latency and failed downloads.
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_download import free_port, make_file, parse_size
+
+import grpc
+from concurrent import futures
+from proto import storage_pb2, storage_pb2_grpc
+from node import NodeFileService
+from peer_selector import PeerSelector
+from swarm import SwarmDownloader, SwarmDownloadError
+
+
+BUSY_TRANSFERS = 8  # active_transfers reported for the slow peer in "hints" mode
+
+
+class SlowFileService(NodeFileService):
+    # Every call waits delay seconds before it is served
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def StatFile(self, request, context):
+        time.sleep(self.delay)
+        return super().StatFile(request, context)
+
+    def ReadRange(self, request, context):
+        time.sleep(self.delay)
+        yield from super().ReadRange(request, context)
+
+
+def serve(port, delay):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+    storage_pb2_grpc.add_NodeFileServiceServicer_to_server(SlowFileService(delay), server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    print("ready", flush=True)
+    sys.stdin.read()
+    server.stop(0)
+
+
+def start_peers(workdir, count, slow_ms):
+    peers = []
+    for i in range(count):
+        port = free_port()
+        delay = slow_ms / 1000 if i == 0 else 0
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port),
+                                 "--delay", str(delay)], cwd=workdir,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        proc.stdout.readline()
+        peers.append((proc, storage_pb2.NodeLocation(id=f"vm{i}", address="127.0.0.1", port=port)))
+    return peers
+
+
+def run(workdir, fname, locations, mode, requests):
+    rng = random.Random(1)
+    selector = PeerSelector(rng=random.Random(1))
+    out = os.path.join(workdir, "copy.bin")
+    latencies = []
+    failed = 0
+    for _ in range(requests):
+        peers = [rng.choice(locations)] if mode == "random" else locations
+        start = time.perf_counter()
+        try:
+            SwarmDownloader(peers, selector=selector).download(fname, out)
+        except (grpc.RpcError, SwarmDownloadError):
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"{mode:>8}: p50 {pct(0.5):7.2f} ms  p99 {pct(0.99):7.2f} ms  {failed} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--peers", type=int, default=3)
+    parser.add_argument("--size", default="64K")
+    parser.add_argument("--slow-ms", type=float, default=50, help="Extra delay of the overloaded peer")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--delay", type=float, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.delay)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        fname = "hot.bin"
+        make_file(os.path.join(workdir, fname), parse_size(args.size))
+        peers = start_peers(workdir, args.peers, args.slow_ms)
+        try:
+            plain = [loc for _, loc in peers]
+            hinted = [storage_pb2.NodeLocation(id=loc.id, address=loc.address, port=loc.port,
+                                               active_transfers=BUSY_TRANSFERS if i == 0 else 0)
+                      for i, loc in enumerate(plain)]
+            down = storage_pb2.NodeLocation(id="down", address="127.0.0.1", port=free_port())
+            run(workdir, fname, plain, "random", args.requests)
+            run(workdir, fname, plain, "ewma", args.requests)
+            run(workdir, fname, hinted, "hints", args.requests)
+            run(workdir, fname, hinted + [down], "failover", args.requests)
+        finally:
+            for proc, _ in peers:
+                proc.stdin.close()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Benchmark: a replicated controller group against a single controller
+#
+#   python benchmarks/bench_raft.py --members 3 --clients 4 --duration 5
+#
+# Starts one controller, then a group of --members controllers, and measures
+# for each:
+#   - write latency: AnnounceFile round trips from one client (the group only
+#     answers once a majority has the change),
+#   - read throughput: --clients client processes calling GetFileLocations
+#     through the stub nodes use (GroupStub spreads them over every member),
+#   - failover (group only): the leader is killed and a client retries a
+#     write until the new leader accepts it.
+# Members and clients only run in parallel when the host has cores to spare;
+# os.cpu_count() is printed with the results.
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from bench_download import free_port, ROOT
+
+import grpc
+from proto import storage_pb2
+from raft import GroupStub
+from channel_pool import pool
+
+NODES = 20  # registered nodes the files are spread over
+FILES = 2000  # files announced before the reads
+
+
+def serve_member(group, index):
+    import controller
+    host, port = group[index]
+    if len(group) == 1:
+        controller.serve_controller(host, port, node_timeout=3600, data_dir="")
+    else:
+        controller.serve_controller(host, port, node_timeout=3600, data_dir="", group=group, member=index)
+
+
+def connect(group):
+    if len(group) == 1:
+        return pool.controller_stub(*group[0])
+    stub = GroupStub(group)
+    stub.find_leader()
+    return stub
+
+
+def announce(stub, fname, rng):
+    nid = rng.randrange(NODES)
+    stub.AnnounceFile(storage_pb2.FileAnnouncement(id=f"sim{nid}", filename=fname, address="127.0.0.1",
+                                                   port=9000 + nid, replication_factor=1))
+
+
+def client(group, seed, duration):
+    # Runs in its own process; prints the lookups it completed
+    stub = connect(group)
+    rng = random.Random(seed)
+    ops = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        stub.GetFileLocations(storage_pb2.FileName(filename=f"f{rng.randrange(FILES)}.bin"))
+        ops += 1
+    print(ops)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(count, args):
+    group = [("127.0.0.1", free_port()) for _ in range(count)]
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", json.dumps(group), str(i)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+             for i in range(count)]
+    try:
+        for host, port in group:
+            with grpc.insecure_channel(f"{host}:{port}") as channel:
+                grpc.channel_ready_future(channel).result(timeout=15)
+        stub = connect(group)
+        while count > 1 and stub.leader < 0:
+            time.sleep(0.1)
+            stub.find_leader()
+        for i in range(NODES):
+            stub.RegisterNode(storage_pb2.NodeInfo(id=f"sim{i}", address="127.0.0.1", port=9000 + i))
+        rng = random.Random(0)
+        latencies = []
+        for i in range(FILES):
+            start = time.perf_counter()
+            announce(stub, f"f{i}.bin", rng)
+            latencies.append(time.perf_counter() - start)
+        name = "1 controller" if count == 1 else f"group of {count}"
+        print(f"{name:>14}: write {sum(latencies) / len(latencies) * 1000:6.2f} ms mean, "
+              f"{percentile(latencies, 0.99) * 1000:6.2f} ms p99")
+        time.sleep(1)  # followers catch up and get a lease
+        clients = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--client", json.dumps(group),
+                                     str(seed), str(args.duration)], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+                   for seed in range(args.clients)]
+        ops = sum(int(c.communicate()[0].split()[-1]) for c in clients)
+        print(f"{'':>14}  reads {ops / args.duration:8.0f} lookups/sec ({args.clients} clients, "
+              f"{os.cpu_count()} CPUs)")
+        if count > 1:
+            leader = stub.leader
+            procs[leader].kill()
+            start = time.perf_counter()
+            announce(stub, "after-failover.bin", rng)
+            print(f"{'':>14}  failover: leader {leader} killed, next write accepted by member {stub.leader} "
+                  f"after {time.perf_counter() - start:.2f} s")
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve_member([tuple(m) for m in json.loads(sys.argv[2])], int(sys.argv[3]))
+        return
+    if sys.argv[1:2] == ["--client"]:
+        client([tuple(m) for m in json.loads(sys.argv[2])], int(sys.argv[3]), float(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=3, help="Controllers in the replicated group")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes generating reads")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of reads per setup")
+    args = parser.parse_args()
+
+    run(1, args)
+    run(args.members, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Benchmark: node read cache under a skewed (Zipfian) download workload
+#
+#   python benchmarks/bench_read_cache.py --files 200 --size 256K --cache-mb 16 --requests 4000
+#
+# A node process serves --files files from its chunk store; the client picks
+# each download from a Zipf(--skew) distribution over them, so a few files
+# are hot and most are rarely asked for. Runs once without a cache and once
+# with a --cache-mb read cache. Reported: hit ratio (GetCacheStats), the
+# server's CPU time per request (Linux, /proc) and throughput.
+
+import argparse
+import bisect
+import itertools
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_download import free_port, make_file, parse_size, ROOT
+from bench_heartbeat import cpu_seconds
+
+import grpc
+from chunk_store import ChunkStore
+from node import serve_node_file_service
+from read_cache import ReadCache
+from proto import storage_pb2, storage_pb2_grpc
+
+
+def serve(port, store_dir, cache_bytes):
+    cache = ReadCache(cache_bytes) if cache_bytes else None
+    server = serve_node_file_service("127.0.0.1", port, store=ChunkStore(store_dir), cache=cache)
+    sys.stdin.read()  # run until the parent closes our stdin
+    server.stop(0)
+
+
+def zipf_sampler(n, skew, rng):
+    # Pick 0..n-1 with probability proportional to 1 / (rank + 1) ** skew
+    cumulative = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(n)))
+    return lambda: bisect.bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def run(args, store_dir, cache_bytes):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port), store_dir,
+                             str(cache_bytes)], cwd=ROOT, stdin=subprocess.PIPE)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}") as channel:
+            grpc.channel_ready_future(channel).result(timeout=15)
+            stub = storage_pb2_grpc.NodeFileServiceStub(channel)
+            pick = zipf_sampler(args.files, args.skew, random.Random(1))
+            cpu_before = cpu_seconds(proc.pid)
+            start = time.perf_counter()
+            moved = 0
+            for _ in range(args.requests):
+                request = storage_pb2.FileDownloadRequest(filename=f"f{pick()}")
+                for chunk in stub.DownloadFileStream(request):
+                    moved += len(chunk.content)
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds(proc.pid) - cpu_before
+            stats = stub.GetCacheStats(storage_pb2.CacheStatsRequest())
+    finally:
+        proc.stdin.close()
+        proc.wait()
+    return stats, cpu / args.requests * 1000, moved / elapsed / 1e6
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--size", default="256K", help="Size of each file")
+    parser.add_argument("--cache-mb", type=float, default=16)
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent")
+    parser.add_argument("--requests", type=int, default=4000)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_read_cache_")
+    try:
+        store = ChunkStore(os.path.join(work, "store"))
+        for i in range(args.files):
+            path = os.path.join(work, "tmp")
+            make_file(path, parse_size(args.size))
+            store.ingest(path, f"f{i}")
+            os.remove(path)
+        total_mb = args.files * parse_size(args.size) / (1024 * 1024)
+        print(f"{args.files} files, {total_mb:.0f} MB stored, Zipf skew {args.skew}")
+        for cache_mb in (0, args.cache_mb):
+            stats, cpu_ms, mbps = run(args, store.root, int(cache_mb * 1024 * 1024))
+            lookups = stats.hits + stats.misses
+            ratio = f"{stats.hits / lookups:6.1%}" if lookups else "   n/a"
+            print(f"cache {cache_mb:5.0f} MB: hit ratio {ratio}, server CPU {cpu_ms:5.2f} ms/request, "
+                  f"{mbps:7.1f} MB/s, {stats.evictions} evictions")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: swarm download throughput as the number of replicas grows
+#
+#   python benchmarks/bench_swarm.py --size 512M --peers 4 --peer-mbps 50
+#
+# Every replica is a separate node process serving the same file, so the
+# download can use up to --peers sources at once. On localhost there is no
+# network link to saturate, so --peer-mbps caps each peer's upload rate to
+# stand in for one VM's NIC (0 disables the cap).
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_download import free_port, make_file, parse_size
+
+import grpc
+from concurrent import futures
+from proto import storage_pb2, storage_pb2_grpc
+from node import NodeFileService
+from swarm import SwarmDownloader
+
+
+class ThrottledFileService(NodeFileService):
+    # Paces ReadRange so one peer never sends faster than mbps MB/s
+    def __init__(self, mbps):
+        super().__init__()
+        self.rate = mbps * 1024 * 1024
+        self.lock = threading.Lock()
+        self.next_free = time.monotonic()
+
+    def ReadRange(self, request, context):
+        for chunk in super().ReadRange(request, context):
+            if self.rate:
+                with self.lock:
+                    start = max(self.next_free, time.monotonic())
+                    self.next_free = start + len(chunk.content) / self.rate
+                time.sleep(max(0.0, start - time.monotonic()))
+            yield chunk
+
+
+def serve(port, mbps):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+    storage_pb2_grpc.add_NodeFileServiceServicer_to_server(ThrottledFileService(mbps), server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    print("ready", flush=True)
+    sys.stdin.read()
+    server.stop(0)
+
+
+def start_peers(workdir, count, mbps):
+    peers = []
+    for i in range(count):
+        port = free_port()
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port),
+                                 "--peer-mbps", str(mbps)], cwd=workdir,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        proc.stdout.readline()
+        peers.append((proc, storage_pb2.NodeLocation(id=f"vm{i}", address="127.0.0.1", port=port)))
+    return peers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="256M")
+    parser.add_argument("--peers", type=int, default=4)
+    parser.add_argument("--range-size", default="4M")
+    parser.add_argument("--peer-mbps", type=float, default=50)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.peer_mbps)
+
+    size = parse_size(args.size)
+    with tempfile.TemporaryDirectory() as workdir:
+        fname = "swarm.bin"
+        make_file(os.path.join(workdir, fname), size)
+        peers = start_peers(workdir, args.peers, args.peer_mbps)
+        try:
+            for count in range(1, args.peers + 1):
+                out = os.path.join(workdir, "swarm_copy.bin")
+                downloader = SwarmDownloader([loc for _, loc in peers[:count]], range_size=parse_size(args.range_size))
+                start = time.perf_counter()
+                downloader.download(fname, out)
+                elapsed = time.perf_counter() - start
+                os.remove(out)
+                split = ", ".join(f"{pid}={n}" for pid, n in downloader.ranges_per_peer.items())
+                print(f"{count} peer(s): {size / (1024 * 1024) / elapsed:8.1f} MB/s  ranges: {split}")
+        finally:
+            for proc, _ in peers:
+                proc.stdin.close()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
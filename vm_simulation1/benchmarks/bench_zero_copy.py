@@ -0,0 +1,125 @@
+# Benchmark: download serving cost with and without the zero-copy (mmap) path
+#
+#   python benchmarks/bench_zero_copy.py --files 8 --size 2M --requests 400
+#
+# A node process serves --files files of --size bytes from its chunk store,
+# once with zero_copy=False (read() into messages) and once with the mapped,
+# pre-encoded path. The client downloads random files with DownloadFile and
+# DownloadFileStream. Reported per request: the server's CPU time (Linux,
+# /proc) and the peak Python memory a handler allocates (tracemalloc, handlers
+# called in this process and serialized as gRPC would).
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_download import free_port, make_file, parse_size, ROOT
+from bench_heartbeat import cpu_seconds
+
+import grpc
+from chunk_store import ChunkStore
+from node import NodeFileService, serve_node_file_service
+from proto import storage_pb2, storage_pb2_grpc
+from zero_copy import serialize
+
+
+def serve(port, store_dir, zero_copy):
+    server = serve_node_file_service("127.0.0.1", port, store=ChunkStore(store_dir), zero_copy=zero_copy)
+    sys.stdin.read()  # run until the parent closes our stdin
+    server.stop(0)
+
+
+def make_store(work, files, size):
+    store = ChunkStore(os.path.join(work, "store"))
+    for i in range(files):
+        path = os.path.join(work, f"f{i}")
+        make_file(path, size)
+        store.ingest(path, f"f{i}")
+        os.remove(path)
+    return store
+
+
+def server_cpu(args, store_dir, zero_copy, method):
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port), store_dir,
+                             str(int(zero_copy))], cwd=ROOT, stdin=subprocess.PIPE)
+    try:
+        with grpc.insecure_channel(f"127.0.0.1:{port}", options=[("grpc.max_receive_message_length", -1)]) as channel:
+            grpc.channel_ready_future(channel).result(timeout=15)
+            stub = storage_pb2_grpc.NodeFileServiceStub(channel)
+            call = getattr(stub, method)
+            rng = random.Random(1)
+            # Warm up: first mappings / first reads from disk
+            for i in range(args.files):
+                list(call(storage_pb2.FileDownloadRequest(filename=f"f{i}"))) if method.endswith("Stream") \
+                    else call(storage_pb2.FileDownloadRequest(filename=f"f{i}"))
+            cpu_before = cpu_seconds(proc.pid)
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                request = storage_pb2.FileDownloadRequest(filename=f"f{rng.randrange(args.files)}")
+                if method.endswith("Stream"):
+                    for _ in call(request):
+                        pass
+                else:
+                    call(request)
+            elapsed = time.perf_counter() - start
+            cpu = cpu_seconds(proc.pid) - cpu_before
+    finally:
+        proc.stdin.close()
+        proc.wait()
+    return cpu / args.requests * 1000, args.requests * args.size / elapsed / 1e6
+
+
+def peak_allocations(store, files, zero_copy, method):
+    # Peak Python memory held while one request is handled and serialized
+    service = NodeFileService(store=store, zero_copy=zero_copy)
+    peaks = []
+    for i in range(files):
+        request = storage_pb2.FileDownloadRequest(filename=f"f{i}")
+        tracemalloc.start()
+        if method == "DownloadFile":
+            wire = serialize(service.DownloadFile(request, None))
+            del wire
+        else:
+            for message in service.DownloadFileStream(request, None):
+                wire = serialize(message)
+            del wire
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1e6
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve(int(sys.argv[2]), sys.argv[3], sys.argv[4] == "1")
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=8, help="Hot files served")
+    parser.add_argument("--size", default="2M", help="Size of each file (DownloadFile must fit in 4 MB)")
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+    args.size = parse_size(args.size)
+
+    work = tempfile.mkdtemp(prefix="bench_zero_copy_")
+    try:
+        store = make_store(work, args.files, args.size)
+        for method in ("DownloadFile", "DownloadFileStream"):
+            for zero_copy in (False, True):
+                cpu_ms, mbps = server_cpu(args, store.root, zero_copy, method)
+                peak = peak_allocations(store, args.files, zero_copy, method)
+                label = "mmap" if zero_copy else "read"
+                print(f"{method:>18} {label}: server CPU {cpu_ms:6.2f} ms/request, {mbps:7.1f} MB/s, "
+                      f"peak Python allocations {peak:6.2f} MB/request")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Shared pool of gRPC channels keyed by (address, port).
+#
+# Opening a grpc.insecure_channel costs a TCP + HTTP/2 handshake, and channels
+# that are never closed leak sockets in long-running controllers and nodes.
+# The pool hands out one channel per peer, keeps it alive with HTTP/2 pings,
+# replaces channels that have shut down and closes the ones left idle.
+
+import threading
+import time
+
+import grpc
+import grpc.aio
+
+from proto import storage_pb2_grpc
+
+
+IDLE_TIMEOUT = 300  # seconds a channel may go unused before it is closed
+
+# Client keepalive: ping every 30 s, even between calls, so dead peers are noticed
+KEEPALIVE_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+# Servers must accept those pings or they answer with GOAWAY (too_many_pings)
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 10000),
+]
+
+
+class ChannelPool:
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, options=None):
+        self.idle_timeout = idle_timeout
+        self.options = KEEPALIVE_OPTIONS if options is None else options
+        self._lock = threading.RLock()
+        self._channels = {}   # (address, port) -> channel
+        self._stubs = {}      # (address, port, stub class) -> stub
+        self._last_used = {}  # (address, port) -> monotonic time
+        self._states = {}     # (address, port) -> grpc.ChannelConnectivity
+        self._janitor = None
+        self._stop = threading.Event()
+
+    def channel(self, address, port):
+        key = (address, int(port))
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None or self._states.get(key) == grpc.ChannelConnectivity.SHUTDOWN:
+                channel = self._open(key)
+            self._last_used[key] = time.monotonic()
+            self._start_janitor()
+            return channel
+
+    def stub(self, address, port, stub_class):
+        # Stubs are cheap but stateless, so one per (peer, service) is plenty
+        channel = self.channel(address, port)
+        key = (address, int(port), stub_class)
+        with self._lock:
+            stub = self._stubs.get(key)
+            if stub is None:
+                stub = self._stubs[key] = stub_class(channel)
+            return stub
+
+    def node_stub(self, address, port):
+        return self.stub(address, port, storage_pb2_grpc.NodeFileServiceStub)
+
+    def controller_stub(self, address, port):
+        return self.stub(address, port, storage_pb2_grpc.StorageControllerStub)
+
+    def is_healthy(self, address, port, timeout=1.0):
+        # True if a connection to the peer is (or can quickly become) READY
+        try:
+            grpc.channel_ready_future(self.channel(address, port)).result(timeout=timeout)
+            return True
+        except grpc.FutureTimeoutError:
+            return False
+
+    def discard(self, address, port):
+        # Drop a peer's channel, e.g. after the node has gone offline
+        with self._lock:
+            self._close((address, int(port)))
+
+    def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            for key in [k for k, used in self._last_used.items() if used < cutoff]:
+                self._close(key)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            for key in list(self._channels):
+                self._close(key)
+
+    def __len__(self):
+        return len(self._channels)
+
+    def _open(self, key):
+        self._close(key)
+        channel = grpc.insecure_channel(f"{key[0]}:{key[1]}", options=self.options)
+        self._channels[key] = channel
+        self._states[key] = grpc.ChannelConnectivity.IDLE
+        channel.subscribe(lambda state, key=key, channel=channel: self._on_state(key, channel, state))
+        return channel
+
+    def _on_state(self, key, channel, state):
+        with self._lock:
+            if self._channels.get(key) is channel:
+                self._states[key] = state
+
+    def _close(self, key):
+        channel = self._channels.pop(key, None)
+        self._states.pop(key, None)
+        self._last_used.pop(key, None)
+        for stub_key in [k for k in self._stubs if k[:2] == key]:
+            del self._stubs[stub_key]
+        if channel is not None:
+            channel.close()
+
+    def _start_janitor(self):
+        if self._janitor is None:
+            self._janitor = threading.Thread(target=self._janitor_loop, daemon=True, name="channel-pool-janitor")
+            self._janitor.start()
+
+    def _janitor_loop(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while not self._stop.wait(interval):
+            self.evict_idle()
+
+
+class AioChannelPool:
+    # grpc.aio flavour of ChannelPool for the asyncio controller. It is only
+    # used from the event loop thread, so it needs no lock, and aio channels
+    # reconnect on their own, so idle eviction is all the upkeep there is.
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, options=None):
+        self.idle_timeout = idle_timeout
+        self.options = KEEPALIVE_OPTIONS if options is None else options
+        self._channels = {}   # (address, port) -> grpc.aio.Channel
+        self._stubs = {}      # (address, port, stub class) -> stub
+        self._last_used = {}  # (address, port) -> monotonic time
+
+    def channel(self, address, port):
+        key = (address, int(port))
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = grpc.aio.insecure_channel(f"{address}:{port}", options=self.options)
+        self._last_used[key] = time.monotonic()
+        return channel
+
+    def stub(self, address, port, stub_class):
+        channel = self.channel(address, port)
+        key = (address, int(port), stub_class)
+        stub = self._stubs.get(key)
+        if stub is None:
+            stub = self._stubs[key] = stub_class(channel)
+        return stub
+
+    def node_stub(self, address, port):
+        return self.stub(address, port, storage_pb2_grpc.NodeFileServiceStub)
+
+    async def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        for key in [k for k, used in self._last_used.items() if used < cutoff]:
+            await self._close(key)
+
+    async def close(self):
+        for key in list(self._channels):
+            await self._close(key)
+
+    def __len__(self):
+        return len(self._channels)
+
+    async def _close(self, key):
+        channel = self._channels.pop(key, None)
+        self._last_used.pop(key, None)
+        for stub_key in [k for k in self._stubs if k[:2] == key]:
+            del self._stubs[stub_key]
+        if channel is not None:
+            await channel.close()
+
+
+# Process-wide pool shared by the controller and node code
+pool = ChannelPool()
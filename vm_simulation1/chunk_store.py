@@ -0,0 +1,385 @@
+# Content-addressed chunk store for a node.
+#
+# Files are cut into content-defined chunks, each chunk is stored once under
+# its SHA-256, and a file is a manifest listing its chunks. Identical content
+# (the same file under two names, the unchanged parts of an edited file) is
+# stored once, and peers only need to send the chunks a node is missing.
+#
+# Chunk boundaries: every byte is mapped to one pseudo-random bit with
+# bytes.translate, and a boundary falls wherever the last 16 bits spell a
+# fixed pattern (found with bytes.find). Both run in C, so chunking keeps up
+# with disk reads without a compiled extension. A boundary depends only on the
+# 16 bytes before it, so an insert or delete only changes the chunks around
+# the edit. Chunks are kept between MIN_CHUNK and MAX_CHUNK bytes.
+#
+# Layout under the node's data dir:
+#   chunks/<first two hex digits>/<sha256>   chunk contents
+#   manifests/<quoted filename>.json         {"filename", "size", "chunks": [[sha256, size], ...]}
+#
+# Each chunk has a reference count in memory (rebuilt from the manifests on
+# start): one per manifest that lists it, plus one per ingest still writing
+# it. A chunk is deleted when its count drops to zero.
+
+import bisect
+import collections
+import hashlib
+import json
+import mmap
+import os
+import random
+import tempfile
+import threading
+from urllib.parse import quote, unquote
+
+from proto import storage_pb2
+
+
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+READ_SIZE = 4 * 1024 * 1024  # bytes read from a file per chunking step
+MMAP_CACHE_SIZE = 256        # chunk mappings kept open; each holds a file descriptor
+
+# Byte -> bit table (128 of each), and the bit pattern that marks a boundary.
+# The pattern has as many 0s as 1s, so data using only part of the byte range
+# (text) still hits it about once every 2**16 bytes.
+_rng = random.Random(0x5EED)
+_bits = [0] * 128 + [1] * 128
+_rng.shuffle(_bits)
+_BIT_TABLE = bytes(_bits)
+_PATTERN = bytes([1, 0, 1, 1, 0, 0, 1, 0, 0, 1, 1, 1, 0, 1, 0, 0])
+
+
+class MissingChunkError(Exception):
+    pass
+
+
+def split(f, read_size=READ_SIZE):
+    # Yield the content-defined chunks of an open binary file
+    buf = b""
+    while True:
+        data = f.read(read_size)
+        buf = buf + data if buf else data
+        bits = buf.translate(_BIT_TABLE)
+        start = 0
+        while len(buf) - start > MIN_CHUNK:
+            i = bits.find(_PATTERN, start + MIN_CHUNK - len(_PATTERN), start + MAX_CHUNK)
+            if i >= 0:
+                cut = i + len(_PATTERN)
+            elif len(buf) - start >= MAX_CHUNK:
+                cut = start + MAX_CHUNK
+            elif data:
+                break  # the boundary may be in the next read
+            else:
+                cut = len(buf)
+            yield buf[start:cut]
+            start = cut
+        buf = buf[start:]
+        if not data:
+            if buf:
+                yield buf
+            return
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _hashes(manifest):
+    # The distinct chunks of a manifest; each holds one reference to them
+    return {h for h, _ in manifest['chunks']}
+
+
+def to_proto(manifest):
+    return storage_pb2.Manifest(filename=manifest['filename'], size=manifest['size'],
+                                chunks=[storage_pb2.ChunkRef(hash=h, size=n) for h, n in manifest['chunks']])
+
+
+def from_proto(message):
+    return {'filename': message.filename, 'size': message.size,
+            'chunks': [[c.hash, c.size] for c in message.chunks]}
+
+
+class ChunkReader:
+    # Read-only, seekable file object over a stored file's chunks
+    def __init__(self, store, manifest):
+        self.store = store
+        self.chunks = manifest['chunks']
+        self.starts = []  # offset of each chunk in the file
+        offset = 0
+        for _, size in self.chunks:
+            self.starts.append(offset)
+            offset += size
+        self.size = offset
+        self.pos = 0
+        self._open = (None, None)  # (chunk index, file)
+
+    def seek(self, pos):
+        self.pos = pos
+
+    def read(self, n=-1):
+        # Reads across chunk boundaries like a regular file
+        n = self.size - self.pos if n < 0 else min(n, self.size - self.pos)
+        parts = []
+        while n > 0:
+            data = self._read_chunk(n)
+            parts.append(data)
+            n -= len(data)
+        return b"".join(parts)
+
+    def _read_chunk(self, n):
+        # Up to n bytes from the chunk holding the current position
+        index = bisect.bisect(self.starts, self.pos) - 1
+        if self._open[0] != index:
+            self.close()
+            self._open = (index, open(self.store.chunk_path(self.chunks[index][0]), "rb"))
+        f = self._open[1]
+        start = self.starts[index]
+        f.seek(self.pos - start)
+        data = f.read(min(n, start + self.chunks[index][1] - self.pos))
+        if not data:
+            raise MissingChunkError(f"Chunk {self.chunks[index][0][:12]} is truncated")
+        self.pos += len(data)
+        return data
+
+    def close(self):
+        if self._open[1] is not None:
+            self._open[1].close()
+        self._open = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MmapCache:
+    # LRU of read-only mappings of chunk files. Chunk files never change once
+    # written, so a mapping can't go stale or be truncated under a reader (a
+    # plain file edited in place could, and touching the lost pages is SIGBUS).
+    # Evicted mappings are only dropped, not closed: views handed out for
+    # transfers still in flight keep them alive until they are done.
+    def __init__(self, capacity=MMAP_CACHE_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._maps = collections.OrderedDict()  # path -> memoryview of the mapping
+        self.hits = 0
+        self.misses = 0
+
+    def view(self, path):
+        with self._lock:
+            view = self._maps.get(path)
+            if view is not None:
+                self._maps.move_to_end(path)
+                self.hits += 1
+                return view
+            self.misses += 1
+        with open(path, "rb") as f:
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        with self._lock:
+            self._maps[path] = view
+            while len(self._maps) > self.capacity:
+                self._maps.popitem(last=False)
+        return view
+
+    def discard(self, path):
+        with self._lock:
+            self._maps.pop(path, None)
+
+
+class ChunkStore:
+    def __init__(self, root, mmap_cache_size=MMAP_CACHE_SIZE):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.manifest_dir = os.path.join(root, "manifests")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        # Held while manifests and reference counts change, so garbage
+        # collection never removes a chunk a manifest being committed needs
+        self._lock = threading.RLock()
+        self._refs = collections.Counter()  # chunk hash -> manifests and ingests using it
+        for fname in self.files():
+            manifest = self.get_manifest(fname)
+            if manifest:
+                self._refs.update(_hashes(manifest))
+        self.maps = MmapCache(mmap_cache_size)
+        self.on_change = None  # callback(filename) after a file is committed or removed
+
+    # ---------------- chunks ----------------
+    def chunk_path(self, h):
+        return os.path.join(self.chunk_dir, h[:2], h)
+
+    def has_chunk(self, h):
+        return os.path.exists(self.chunk_path(h))
+
+    def missing(self, hashes):
+        # The hashes (in order, without repeats) that are not stored yet
+        return [h for h in dict.fromkeys(hashes) if not self.has_chunk(h)]
+
+    def read_chunk(self, h):
+        with open(self.chunk_path(h), "rb") as f:
+            return f.read()
+
+    def view(self, h, size):
+        # memoryview of a mapped chunk, without copying it into Python
+        view = self.maps.view(self.chunk_path(h))
+        if len(view) != size:
+            raise MissingChunkError(f"Chunk {h[:12]} is truncated")
+        return view
+
+    def write_chunk(self, h, data):
+        # Store data under h; returns False if it was already there.
+        # Raises ValueError if data does not hash to h.
+        if digest(data) != h:
+            raise ValueError(f"Chunk {h[:12]} does not match its hash")
+        return self._store(h, data)
+
+    def _store(self, h, data):
+        path = self.chunk_path(h)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return True
+
+    def _release(self, hashes):
+        # Caller holds _lock. Drop a reference to each chunk and delete the
+        # ones nothing uses any more
+        for h in hashes:
+            self._refs[h] -= 1
+            if self._refs[h] > 0:
+                continue
+            del self._refs[h]
+            self.maps.discard(self.chunk_path(h))
+            try:
+                os.remove(self.chunk_path(h))
+            except OSError:
+                pass  # already gone, or (Windows) still mapped by a transfer in flight
+
+    # ---------------- files ----------------
+    def _manifest_path(self, fname):
+        return os.path.join(self.manifest_dir, quote(fname, safe="") + ".json")
+
+    def ingest(self, path, fname=None):
+        # Chunk a local file into the store; returns (manifest, bytes newly stored)
+        with open(path, "rb") as f:
+            return self.ingest_stream(f, fname or path)
+
+    def ingest_stream(self, f, fname):
+        # Same for a readable binary file object. Each chunk is pinned before
+        # it is stored, so a concurrent remove can't delete it (or a shared
+        # copy already there) before the manifest commits.
+        chunks = []
+        pinned = set()
+        new = 0
+        try:
+            for data in split(f):
+                h = digest(data)
+                if h not in pinned:
+                    with self._lock:
+                        self._refs[h] += 1
+                    pinned.add(h)
+                if self._store(h, data):
+                    new += len(data)
+                chunks.append([h, len(data)])
+            manifest = {'filename': fname, 'size': sum(n for _, n in chunks), 'chunks': chunks}
+            self.put_manifest(manifest)
+        finally:
+            with self._lock:
+                self._release(pinned)
+        return manifest, new
+
+    def put_manifest(self, manifest):
+        # Commit a file; all of its chunks must already be stored
+        with self._lock:
+            missing = self.missing(h for h, _ in manifest['chunks'])
+            if missing:
+                raise MissingChunkError(f"{len(missing)} chunks of {manifest['filename']} are not stored")
+            old = self.get_manifest(manifest['filename'])
+            path = self._manifest_path(manifest['filename'])
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(path + ".tmp", path)
+            self._refs.update(_hashes(manifest))
+            if old:
+                self._release(_hashes(old))  # the chunks only the replaced version used
+        if self.on_change:
+            self.on_change(manifest['filename'])
+
+    def get_manifest(self, fname):
+        try:
+            with open(self._manifest_path(fname), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def files(self):
+        return [unquote(name[:-5]) for name in os.listdir(self.manifest_dir) if name.endswith(".json")]
+
+    def open(self, manifest):
+        return ChunkReader(self, manifest)
+
+    def export(self, fname, dest):
+        # Write the stored file out as a plain file; returns its size
+        manifest = self.get_manifest(fname)
+        tmp = f"{dest}.part"
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)  # a nested name like d/f
+        with open(tmp, "wb") as out:
+            for h, _ in manifest['chunks']:
+                out.write(self.read_chunk(h))
+        os.replace(tmp, dest)
+        return manifest['size']
+
+    def remove(self, fname):
+        # Drop a file and every chunk no other file uses; returns False if absent
+        with self._lock:
+            manifest = self.get_manifest(fname)
+            if manifest is None:
+                return False
+            os.remove(self._manifest_path(fname))
+            self._release(_hashes(manifest))
+        if self.on_change:
+            self.on_change(fname)
+        return True
+
+    def rename(self, fname, new_fname):
+        # Give a stored file a new name; the chunks stay. Returns False if absent
+        with self._lock:
+            manifest = self.get_manifest(fname)
+            if manifest is None:
+                return False
+            if new_fname == fname:
+                return True
+            manifest['filename'] = new_fname
+            replaced = self.get_manifest(new_fname)
+            path = self._manifest_path(new_fname)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(path + ".tmp", path)
+            os.remove(self._manifest_path(fname))
+            if replaced:
+                self._release(_hashes(replaced))
+        if self.on_change:
+            self.on_change(fname)
+            self.on_change(new_fname)
+        return True
+
+    def stats(self):
+        # Logical bytes (sum of file sizes) vs bytes actually stored
+        logical = 0
+        for fname in self.files():
+            manifest = self.get_manifest(fname)
+            if manifest:
+                logical += manifest['size']
+        stored = 0
+        chunks = 0
+        for sub in os.listdir(self.chunk_dir):
+            for entry in os.scandir(os.path.join(self.chunk_dir, sub)):
+                if not entry.name.endswith(".tmp"):
+                    stored += entry.stat().st_size
+                    chunks += 1
+        return {'files': len(self.files()), 'chunks': chunks, 'logical': logical, 'stored': stored,
+                'dedup_ratio': logical / stored if stored else 1.0}
@@ -0,0 +1,105 @@
+# Controller -> node commands over HeartbeatStream.
+#
+# Every node with an open HeartbeatStream registers a deliver callback here,
+# and send() hands a NodeCommand to it. The threaded server delivers into a
+# queue.Queue that the stream's response generator drains; the asyncio server
+# delivers into an asyncio.Queue via call_soon_threadsafe. Either way send()
+# is safe to call from any thread and never blocks.
+#
+# LocationWatchers uses the same streams to tell nodes that the file
+# locations they cached are stale.
+
+import threading
+
+from proto import storage_pb2
+
+
+REPLICATE = "replicate"    # push a copy of the file to the command's targets
+DELETE = "delete"          # drop the local copy of the file (or of each of the command's filenames)
+RENAME = "rename"          # rename the local copies of the command's filenames to its new_filenames
+INVALIDATE = "invalidate"  # forget the cached locations of the command's filenames
+
+
+class CommandHub:
+    def __init__(self, max_streams=None):
+        self.max_streams = max_streams  # None = unlimited
+        self._lock = threading.Lock()
+        self._streams = {}  # node id -> deliver callback
+
+    def attach(self, nid, deliver):
+        # Returns False when the stream limit is reached. A node opening a
+        # second stream (it reconnected before the old one was noticed as
+        # dead) replaces the first, which is ended.
+        with self._lock:
+            if self.max_streams is not None and nid not in self._streams and len(self._streams) >= self.max_streams:
+                return False
+            old, self._streams[nid] = self._streams.get(nid), deliver
+        if old is not None and old is not deliver:
+            old(None)
+        return True
+
+    def detach(self, nid, deliver):
+        # Only the stream that attached last owns the node's slot
+        with self._lock:
+            if self._streams.get(nid) is deliver:
+                del self._streams[nid]
+
+    def connected(self, nid):
+        with self._lock:
+            return nid in self._streams
+
+    def send(self, nid, command):
+        # Returns False if the node has no open stream
+        with self._lock:
+            deliver = self._streams.get(nid)
+        if deliver is None:
+            return False
+        deliver(command)
+        return True
+
+    def close_all(self):
+        # End every open stream (a replicated controller stepping down); the
+        # nodes reconnect to the new leader
+        with self._lock:
+            delivers, self._streams = list(self._streams.values()), {}
+        for deliver in delivers:
+            deliver(None)
+
+    def __len__(self):
+        return len(self._streams)
+
+
+class LocationWatchers:
+    # Which nodes looked up which files. When a file's owners change, every
+    # node that looked it up gets one INVALIDATE and is forgotten until it
+    # looks the file up again; nodes without a stream rely on their cache TTL.
+    def __init__(self, hub):
+        self.hub = hub
+        self._lock = threading.Lock()
+        self._watchers = {}  # filename -> node ids
+
+    def watch(self, nid, fnames):
+        if not nid:
+            return
+        with self._lock:
+            for fname in fnames:
+                self._watchers.setdefault(fname, set()).add(nid)
+
+    def changed(self, fnames):
+        # One command per node, covering all of its stale files
+        stale = {}
+        with self._lock:
+            for fname in fnames:
+                for nid in self._watchers.pop(fname, ()):
+                    stale.setdefault(nid, []).append(fname)
+        for nid, names in stale.items():
+            self.hub.send(nid, storage_pb2.NodeCommand(action=INVALIDATE, filenames=names))
+
+    def take(self):
+        # Remove and return every watch (a follower handing them to its leader)
+        with self._lock:
+            watchers, self._watchers = self._watchers, {}
+        return watchers
+
+    def __len__(self):
+        return len(self._watchers)
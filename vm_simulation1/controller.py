@@ -1,128 +1,782 @@
 import grpc # type: ignore
+import grpc.aio
 from concurrent import futures
+import asyncio
+import queue
 import time
 import threading
 
 from proto import storage_pb2, storage_pb2_grpc
+from replication import ReplicationScheduler, PENDING, NOTIFIED, FAILED
+from channel_pool import SERVER_OPTIONS, AioChannelPool
+from placement import DEFAULT_REPLICATION_FACTOR, make_policy
+from liveness import LivenessTracker, DEFAULT_NODE_TIMEOUT
+from metadata_store import MetadataStore, LIST_PAGE_SIZE
+from metadata_log import MetadataLog
+from command_hub import CommandHub, LocationWatchers, REPLICATE, DELETE, RENAME
+from partition import partition_of, NodeSync
+from raft import RaftMember, GroupInterceptor
+import erasure
 
 
-registered_nodes = {}  # id -> (address, port, online, last_seen)
-file_locations = {}    # filename -> { 'owners': set of (id, address, port), 'upload_time': str }
+DEFAULT_DATA_DIR = "controller_data"  # metadata WAL and snapshots, relative to the working directory
+HANDLER_WORKERS = 10         # threaded server: workers for unary RPCs
+MAX_HEARTBEAT_STREAMS = 100  # threaded server: each open HeartbeatStream holds a worker
+FOLLOWER_SWEEP = 0.5         # controller group: how often a follower checks whether it became the leader
+
+store = MetadataStore()       # nodes, files and the node -> files index, thread-safe
+liveness = LivenessTracker()  # heartbeat deadlines, drives offline detection
+replication = ReplicationScheduler()
+commands = CommandHub()       # open HeartbeatStreams, used to push commands to nodes
+watchers = LocationWatchers(commands)  # nodes caching file locations, told when owners change
+store.on_node_online = watchers.changed  # a node coming back adds an online owner to its files
+
+
+# Node and file changes that also concern liveness/replication go through
+# these helpers, shared by the gRPC handlers, the sweep loop and the dashboard.
+def set_node_online(nid, address, port, stats=None):
+    now = store.set_node_online(nid, address, port, stats)
+    liveness.beat(nid)
+    return now
+
+
+def set_node_offline(nid):
+    # Only the files this node owns are touched. Returns the files that lost
+    # this copy but still have other online owners.
+    orphaned, degraded = store.set_node_offline(nid) or ([], [])
+    for fname in orphaned:
+        replication.forget(fname)
+        print(f"[Controller] File {fname} removed from cloud (all owners offline)")
+    watchers.changed(orphaned + degraded)
+    return degraded
+
+
+def remove_file(fname):
+    replication.forget(fname)
+    removed = store.remove_file(fname)
+    watchers.changed([fname])
+    return removed
+
+
+def remove_tree(path):
+    # {filename: owners} of the files removed with the directory, or None
+    removed = store.remove_tree(path)
+    for fname in removed or ():
+        replication.forget(fname)
+    watchers.changed(list(removed or ()))
+    return removed
+
+
+def by_node(files):
+    # {node id: [filenames]} from {filename: owners}, for one command per node
+    grouped = {}
+    for fname, owners in files.items():
+        for nid, _, _ in owners:
+            grouped.setdefault(nid, []).append(fname)
+    return grouped
+
+
+def expire_nodes(controller):
+    # Mark nodes whose heartbeat deadline has passed as offline; files left
+    # without an online owner are removed from the cloud, files that lost a
+    # copy get a new replica
+    for nid in liveness.expire():
+        node = store.get_node(nid)
+        if node and node[2]:
+            print(f"[Controller] Node {nid} OFFLINE at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+            controller.rereplicate(set_node_offline(nid))
+            if controller.node_sync:
+                controller.node_sync.forward("SyncNodes", storage_pb2.NodeTable(offline=[nid]))
+
+
+def location(nid, address, port, codecs, stats=None, shards=()):
+    # NodeLocation handed to nodes, with the codecs the node decodes and, when
+    # stats are given, its load hint
+    return storage_pb2.NodeLocation(id=nid, address=address, port=port, codecs=codecs.get(nid, ()),
+                                    active_transfers=(stats or {}).get(nid, {}).get('active_transfers', 0),
+                                    shards=shards)
+
+
+def node_stats(request):
+    # Load figures from a NodeStats heartbeat, as kept in the store
+    return {'free_disk': request.free_disk, 'active_transfers': request.active_transfers,
+            'bandwidth': request.bandwidth, 'file_count': request.file_count}
 
 
 class StorageController(storage_pb2_grpc.StorageControllerServicer):
+    def __init__(self, replication_factor=DEFAULT_REPLICATION_FACTOR, placement="hash", partitions=(), partition=0):
+        self.replication_factor = replication_factor
+        self.placement = make_policy(placement)
+        self.partitions = list(partitions)  # (host, port) of every partition when the metadata is partitioned
+        self.partition = partition          # which of them this process is
+        self.raft = None                    # RaftMember when this controller is one of a replicated group
+        self.node_sync = None               # NodeSync on partition 0 of a partitioned controller
+
+    @property
+    def owns_liveness(self):
+        # Only partition 0 hears heartbeats and expires nodes (partition.py)
+        return not self.partitions or self.partition == 0
+
+    def _misrouted(self, fname, context):
+        # Refuse to record a file that belongs to another partition; it would
+        # be invisible to the nodes looking for it there
+        reason = self._wrong_partition(fname)
+        if not reason:
+            return False
+        context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+        context.set_details(reason)
+        return True
+
+    def _partitioned(self, call, context):
+        # Directory calls need the whole namespace in one process: across
+        # partitions a file and a directory of the same name (a and a/b) can
+        # both exist, as neither partition sees the other's name
+        if not self.partitions:
+            return False
+        context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+        context.set_details(f"{call} needs an unpartitioned controller: the directory tree is split over the partitions")
+        return True
+
+    def _wrong_partition(self, fname):
+        owner = partition_of(fname, len(self.partitions)) if self.partitions else self.partition
+        if owner == self.partition:
+            return None
+        return f"{fname} belongs to controller partition {owner}, this is partition {self.partition}"
+
     def SetOffline(self, request, context):
         # Mark node as offline immediately
-        if request.id in registered_nodes:
-            addr, port, _, last_seen = registered_nodes[request.id]
-            registered_nodes[request.id] = (addr, port, False, last_seen)
+        if store.get_node(request.id):
             now = time.strftime('%Y-%m-%d %H:%M:%S')
             print(f"[Controller] Node {request.id} set OFFLINE at {now} (by VM exit)")
+            self.rereplicate(set_node_offline(request.id))
+            if self.node_sync:
+                self.node_sync.forward("SyncNodes", storage_pb2.NodeTable(offline=[request.id]))
             return storage_pb2.Response(message=f"Node {request.id} set offline at {now}")
         return storage_pb2.Response(message="Node not found")
     def RegisterNode(self, request, context):
-        now = time.strftime('%Y-%m-%d %H:%M:%S')
-        registered_nodes[request.id] = (request.address, request.port, True, now)
+        store.set_codecs(request.id, request.codecs)
+        now = set_node_online(request.id, request.address, request.port, {'free_disk': request.free_disk})
         print(f"[Controller] Node {request.id} registered at {request.address}:{request.port} ONLINE at {now}")
+        if self.node_sync:
+            # The node opens its streams to the other partitions next; they must know it by then
+            self.node_sync.forward("RegisterNode", request, wait=True)
         return storage_pb2.Response(message=f"Node {request.id} registered successfully at {now}")
 
     def Heartbeat(self, request, context):
-        if request.id in registered_nodes:
-            addr, port, _, _ = registered_nodes[request.id]
-            now = time.strftime('%Y-%m-%d %H:%M:%S')
-            registered_nodes[request.id] = (addr, port, True, now)
+        if store.heartbeat(request.id, {'free_disk': request.free_disk}):
+            liveness.beat(request.id)
         return storage_pb2.Response(message="Heartbeat received")
 
+    def HeartbeatStream(self, request_iterator, context):
+        # One long-lived stream per node: NodeStats come up, NodeCommands go
+        # down. A reader thread consumes the stats so commands are sent the
+        # moment they are queued, not only when the next heartbeat arrives.
+        first = next(request_iterator, None)
+        if first is None:
+            return
+        if not self._record_stats(first):
+            context.abort(grpc.StatusCode.NOT_FOUND, "Node not registered")
+        outbox = queue.Queue()
+        deliver = outbox.put
+        if not commands.attach(first.id, deliver):
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many heartbeat streams, use Heartbeat")
+        context.add_callback(lambda: outbox.put(None))
+        threading.Thread(target=self._read_stats, args=(request_iterator, outbox), daemon=True).start()
+        try:
+            while True:
+                command = outbox.get()
+                if command is None:
+                    return
+                yield command
+        finally:
+            commands.detach(first.id, deliver)
+
+    def _read_stats(self, request_iterator, outbox):
+        try:
+            for request in request_iterator:
+                self._record_stats(request)
+        except grpc.RpcError:
+            pass
+        finally:
+            outbox.put(None)
+
+    def _record_stats(self, request):
+        if store.heartbeat(request.id, node_stats(request)):
+            liveness.beat(request.id)
+            return True
+        return False
+
+    def rereplicate(self, fnames):
+        # Ask a surviving owner of each file to push a copy to a new node
+        online = store.online_nodes()
+        stats = store.stats_snapshot()
+        codecs = store.codecs_snapshot()
+        for fname in fnames:
+            info = store.get_file(fname)
+            if info is None or info['erasure']:
+                # Lost shards are not rebuilt; the file stays readable while k shards are online
+                continue
+            owners = {nid for nid, _, _ in info['owners']}
+            targets = self.placement.choose(fname, online, 1, exclude=owners, stats=stats)
+            if not targets:
+                continue
+            command = storage_pb2.NodeCommand(action=REPLICATE, filename=fname, targets=[
+                location(nid, addr, port, codecs) for nid, addr, port in targets])
+            sources = [nid for nid, _, _ in store.online_owners(fname)]
+            if any(commands.send(nid, command) for nid in sources):
+                print(f"[Controller] Re-replicating {fname} to {targets[0][0]}")
+            else:
+                print(f"[Controller] No owner of {fname} has a heartbeat stream, cannot re-replicate")
+
     def AnnounceFile(self, request, context):
         # Node tells controller it has a file (using FileAnnouncement)
-        if request.id not in registered_nodes:
+        if not store.get_node(request.id):
             return storage_pb2.Response(message="Node not registered")
-        loc = (request.id, request.address, request.port)
+        if self._misrouted(request.filename, context):
+            return storage_pb2.Response()
         now = time.strftime('%Y-%m-%d %H:%M:%S')
-        if request.filename not in file_locations:
-            file_locations[request.filename] = {'owners': set(), 'upload_time': now}
-        file_locations[request.filename]['owners'].add(loc)
-        file_locations[request.filename]['upload_time'] = now
+        _, message, targets = self._announce(request, now)
+        if targets is None:
+            return storage_pb2.Response(message=message)
         print(f"[Controller] Node {request.id} announced file {request.filename} at {now}")
-        # Notify all other online VMs to ghost/duplicate the file
-        for nid, (addr, port, online, _) in registered_nodes.items():
-            if nid != request.id and online:
-                try:
-                    channel = grpc.insecure_channel(f"{addr}:{port}")
-                    stub = storage_pb2_grpc.NodeFileServiceStub(channel)
-                    stub.NotifyDuplicate(request)
-                    print(f"[Controller] Notified {nid} to ghost file {request.filename}")
-                except Exception as e:
-                    print(f"[Controller] Failed to notify {nid}: {e}")
-        return storage_pb2.Response(message=f"File {request.filename} announced by {request.id} at {now}")
+        replicas = request.replication_factor or self.replication_factor
+        if len(targets) < replicas:
+            print(f"[Controller] Only {len(targets)} of {replicas} replica targets available for {request.filename}")
+        # Notify the targets in the background; the upload doesn't wait for them
+        replication.schedule(request, targets)
+        return storage_pb2.Response(message=message)
+
+    def _announce(self, request, now):
+        # Record an upload or a pushed replica. Returns (recorded, message,
+        # replica targets of an upload, else None)
+        loc = (request.id, request.address, request.port)
+        reason = None if request.replica or store.has_file(request.filename) else store.path_conflict(request.filename)
+        if reason:
+            return False, f"Can't upload {request.filename}: {reason}", None
+        if request.replica:
+            # A node finished receiving a pushed replica; it can now serve downloads
+            if not store.add_file_owner(request.filename, loc, now):
+                return False, "File not found", None
+            watchers.changed([request.filename])
+            print(f"[Controller] Node {request.id} now holds a replica of {request.filename}")
+            return True, f"Replica of {request.filename} recorded for {request.id}", None
+        store.add_file_owner(request.filename, loc, now, upload=True)
+        if request.size:
+            store.set_size(request.filename, request.size)
+        watchers.changed([request.filename])
+        # The placement policy picks exactly R replica targets; the uploader pushes the bytes
+        replicas = request.replication_factor or self.replication_factor
+        targets = self.placement.choose(request.filename, store.online_nodes(), replicas,
+                                        exclude={request.id}, stats=store.stats_snapshot())
+        store.set_targets(request.filename, targets)
+        return True, f"File {request.filename} announced by {request.id} at {now}", targets
+
+    def AnnounceFiles(self, request_iterator, context):
+        # Many announcements over one stream, answered batch by batch with the
+        # replica targets of every file
+        for batch in request_iterator:
+            yield self._announce_batch(batch)
+
+    def _announce_batch(self, batch):
+        # Each target node hears about all of its new replicas in this batch
+        # in one NotifyDuplicates call instead of one call per file
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        codecs = store.codecs_snapshot()
+        results, uploads, short = [], [], 0
+        for request in batch.files:
+            reason = self._wrong_partition(request.filename) if store.get_node(request.id) else "Node not registered"
+            if reason:
+                results.append(storage_pb2.AnnounceResult(filename=request.filename, message=reason))
+                continue
+            recorded, message, targets = self._announce(request, now)
+            result = storage_pb2.AnnounceResult(filename=request.filename, ok=recorded, message=message)
+            if targets is not None:
+                uploads.append((request, targets))
+                result.targets.extend(location(nid, addr, port, codecs) for nid, addr, port in targets)
+                short += len(targets) < (request.replication_factor or self.replication_factor)
+            results.append(result)
+        if uploads:
+            print(f"[Controller] Node {uploads[0][0].id} announced {len(uploads)} files at {now}")
+        if short:
+            print(f"[Controller] {short} of them have fewer replica targets than requested")
+        replication.schedule_batch(uploads)
+        return storage_pb2.AnnounceResultBatch(results=results)
 
     def GetFileLocations(self, request, context):
-        # Return all online nodes that have the file
-        filename = request.filename
+        # Return all online nodes that have the file, with their load from the
+        # last heartbeat so the reader can pick the least busy. The asking
+        # node is watched first, so a change right after the read still
+        # reaches it.
+        watchers.watch(request.id, [request.filename])
+        return storage_pb2.NodeLocationList(nodes=self._locations(request.filename, store.codecs_snapshot(),
+                                                                  store.stats_snapshot()))
+
+    def GetFileLocationsBatch(self, request, context):
+        watchers.watch(request.id, request.filenames)
+        codecs, stats = store.codecs_snapshot(), store.stats_snapshot()
+        return storage_pb2.FileLocationsBatch(files=[
+            storage_pb2.FileLocations(filename=fname, nodes=self._locations(fname, codecs, stats))
+            for fname in request.filenames])
+
+    def _locations(self, fname, codecs, stats):
+        # Holders of an erasure-coded file say which shards they have
+        layout = store.online_shards(fname)
+        held = {}
+        for index, (nid, _, _) in (layout[3] if layout else ()):
+            held.setdefault(nid, []).append(index)
+        return [location(nid, addr, port, codecs, stats, held.get(nid, ()))
+                for nid, addr, port in store.online_owners(fname)]
+
+    def GetReplicaTargets(self, request, context):
+        # Nodes chosen to receive a pushed replica of the file
+        info = store.get_file(request.filename)
+        codecs = store.codecs_snapshot()
         nodes = []
-        if filename in file_locations:
-            for nid, addr, port in file_locations[filename]['owners']:
-                if nid in registered_nodes and registered_nodes[nid][2]:  # online
-                    nodes.append(storage_pb2.NodeLocation(id=nid, address=addr, port=port))
+        if info:
+            for nid, addr, port in info.get('targets', []):
+                nodes.append(location(nid, addr, port, codecs))
         return storage_pb2.NodeLocationList(nodes=nodes)
 
+    def GetReplicationStatus(self, request, context):
+        fname = request.filename
+        states = replication.progress(fname)
+        info = store.get_file(fname)
+        owners = {nid for nid, _, _ in info['owners']} if info else set()
+        states_list = list(states.values())
+        return storage_pb2.ReplicationStatus(
+            filename=fname,
+            targets=len(states),
+            pending=states_list.count(PENDING),
+            notified=states_list.count(NOTIFIED),
+            failed=states_list.count(FAILED),
+            replicas=len(owners & set(states)),
+        )
+
     def CreateFile(self, request, context):
         # Just for compatibility, does nothing
         return storage_pb2.Response(message=f"File {request.filename} create requested (noop)")
 
+    def MakeDirectory(self, request, context):
+        if self._partitioned("MakeDirectory", context):
+            return storage_pb2.Response()
+        path = request.path.rstrip("/")
+        reason = store.mkdir(path)
+        if reason:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(reason)
+            return storage_pb2.Response()
+        print(f"[Controller] Made directory {path}")
+        return storage_pb2.Response(message=f"Made directory {path}")
+
+    def ListDirectory(self, request, context):
+        if self._partitioned("ListDirectory", context):
+            return
+        entries = store.list_dir(request.path.rstrip("/"), request.recursive)
+        if entries is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"No directory {request.path}")
+        for start in range(0, max(len(entries), 1), LIST_PAGE_SIZE):
+            yield storage_pb2.DirListing(entries=[storage_pb2.DirEntry(path=path, is_dir=is_dir)
+                                                  for path, is_dir in entries[start:start + LIST_PAGE_SIZE]])
+
+    def RenamePath(self, request, context):
+        # Move a file or a directory subtree; the online owners rename their
+        # copies, each told about all of its files in one command
+        if self._partitioned("RenamePath", context):
+            return storage_pb2.Response()
+        path, new_path = request.path.rstrip("/"), request.new_path.rstrip("/")
+        reason, moved = store.rename(path, new_path)
+        if reason:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(reason)
+            return storage_pb2.Response()
+        renamed = {old: new for old, new, _ in moved}
+        for old in renamed:
+            replication.forget(old)
+        for nid, olds in by_node({old: owners for old, _, owners in moved}).items():
+            commands.send(nid, storage_pb2.NodeCommand(action=RENAME, filenames=olds,
+                                                       new_filenames=[renamed[old] for old in olds]))
+        watchers.changed(list(renamed))
+        count = sum(new is not None for new in renamed.values())  # files without an online owner were removed
+        print(f"[Controller] Moved {path} to {new_path} ({count} files)")
+        return storage_pb2.Response(message=f"Moved {path} to {new_path} ({count} files)")
+
+    def DeletePath(self, request, context):
+        path = request.path.rstrip("/")
+        if store.has_file(path):
+            return self.DeleteFile(storage_pb2.FileName(filename=path), context)
+        if self._partitioned("Deleting a directory", context):
+            return storage_pb2.Response()
+        removed = remove_tree(path)
+        if removed is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"No file or directory {path}")
+            return storage_pb2.Response()
+        for nid, fnames in by_node(removed).items():
+            commands.send(nid, storage_pb2.NodeCommand(action=DELETE, filenames=fnames))
+        print(f"[Controller] Deleted directory {path} ({len(removed)} files)")
+        return storage_pb2.Response(message=f"Deleted {path} ({len(removed)} files)")
+
     def DeleteFile(self, request, context):
         # Remove file from all nodes
         fname = request.filename
-        if fname in file_locations:
-            del file_locations[fname]
+        info = store.get_file(fname)
+        if remove_file(fname):
             print(f"[Controller] Deleted file record: {fname}")
+            # Owners with an open heartbeat stream drop their copy right away
+            command = storage_pb2.NodeCommand(action=DELETE, filename=fname)
+            for nid, _, _ in info['owners']:
+                commands.send(nid, command)
             return storage_pb2.Response(message=f"Deleted {fname}")
         return storage_pb2.Response(message="File not found")
 
     def ModifyFile(self, request, context):
-        # Not implemented in controller
-        return storage_pb2.Response(message="Modify not supported at controller")
+        # A node changed a file. It becomes the only owner; the returned online
+        # owners get a delta from it and announce themselves as replicas again,
+        # offline ones keep a stale copy and are forgotten.
+        fname = request.filename
+        if not store.get_node(request.id):
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Node not registered")
+            return storage_pb2.NodeLocationList()
+        if self._misrouted(fname, context):
+            return storage_pb2.NodeLocationList()
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        previous = store.modify_file(fname, (request.id, request.address, request.port), now)
+        if previous is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("File not found")
+            return storage_pb2.NodeLocationList()
+        if request.size:
+            store.set_size(fname, request.size)
+        online = {nid for nid, _, _ in store.online_nodes()}
+        targets = [loc for loc in previous if loc[0] in online]
+        store.set_targets(fname, targets)
+        watchers.changed([fname])
+        print(f"[Controller] Node {request.id} modified file {fname} at {now}; "
+              f"{len(targets)} replicas to update, {len(previous) - len(targets)} offline copies dropped")
+        codecs = store.codecs_snapshot()
+        return storage_pb2.NodeLocationList(nodes=[location(nid, addr, port, codecs) for nid, addr, port in targets])
+
+    def PlaceShards(self, request, context):
+        # Erasure-coded upload: one shard per node on k + m distinct online
+        # nodes (the uploader may keep one). Nothing is recorded until
+        # CommitShards.
+        k, m = request.k, request.m
+        if self._misrouted(request.filename, context):
+            return storage_pb2.ShardLayout()
+        try:
+            erasure.check(k, m)
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return storage_pb2.ShardLayout()
+        online = store.online_nodes()
+        if len(online) < k + m:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(f"{k}+{m} shards need {k + m} online nodes, {len(online)} are online")
+            return storage_pb2.ShardLayout()
+        nodes = self.placement.choose(request.filename, online, k + m, stats=store.stats_snapshot())
+        codecs = store.codecs_snapshot()
+        return storage_pb2.ShardLayout(filename=request.filename, k=k, m=m, size=request.size, shards=[
+            storage_pb2.ShardLocation(index=i, node=location(nid, addr, port, codecs))
+            for i, (nid, addr, port) in enumerate(nodes)])
+
+    def CommitShards(self, request, context):
+        # The uploader stored these shards; at least k are needed to read the file
+        fname = request.filename
+        if not store.get_node(request.id):
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("Node not registered")
+            return storage_pb2.Response()
+        if self._misrouted(fname, context):
+            return storage_pb2.Response()
+        if len(request.shards) < request.k:
+            context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+            context.set_details(f"{len(request.shards)} shards stored, {request.k} needed to rebuild {fname}")
+            return storage_pb2.Response()
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        shards = {s.index: (s.node.id, s.node.address, s.node.port) for s in request.shards}
+        replication.forget(fname)
+        store.set_shards(fname, request.k, request.m, request.size, shards, now)
+        watchers.changed([fname])
+        print(f"[Controller] Node {request.id} uploaded {fname} erasure-coded at {now}: {len(shards)} of "
+              f"{request.k}+{request.m} shards on {', '.join(nid for nid, _, _ in shards.values())}")
+        return storage_pb2.Response(message=f"File {fname} stored as {len(shards)} shards, any {request.k} "
+                                            f"rebuild it")
+
+    def GetShardLayout(self, request, context):
+        layout = store.online_shards(request.filename)
+        if layout is None:
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details("File is not erasure-coded")
+            return storage_pb2.ShardLayout()
+        k, m, size, shards = layout
+        codecs, stats = store.codecs_snapshot(), store.stats_snapshot()
+        return storage_pb2.ShardLayout(filename=request.filename, k=k, m=m, size=size, shards=[
+            storage_pb2.ShardLocation(index=index, node=location(nid, addr, port, codecs, stats, [index]))
+            for index, (nid, addr, port) in shards])
 
     def ListFiles(self, request, context):
-        # Only show files uploaded by online VMs
-        visible_files = []
-        for fname, info in file_locations.items():
-            # At least one owner must be online
-            for nid, addr, port in info['owners']:
-                if nid in registered_nodes and registered_nodes[nid][2]:
-                    visible_files.append(fname)
-                    break
-        return storage_pb2.FileList(filenames=visible_files)
-
-def serve_controller(host="127.0.0.1", port=6000):
+        # Only show files with at least one online owner (maintained by the index)
+        return storage_pb2.FileList(filenames=store.visible_files())
+
+    def ListFilesPage(self, request, context):
+        names, next_token = store.list_files(request.page_token, request.prefix, request.pattern, request.page_size)
+        return storage_pb2.FileList(filenames=names, next_page_token=next_token)
+
+    def ListFilesStream(self, request, context):
+        # Batches of file summaries until the listing is complete; each batch
+        # is read under the file lock on its own, so a long listing never
+        # holds it for more than one page
+        token = request.page_token
+        while True:
+            names, token = store.list_files(token, request.prefix, request.pattern, request.page_size)
+            if names or not token:
+                yield storage_pb2.FileSummaryBatch(next_page_token=token, files=[
+                    storage_pb2.FileSummary(filename=fname, size=-1 if size is None else size,
+                                            upload_time=when, owners=owners)
+                    for fname, size, when, owners in store.file_summaries(names)])
+            if not token:
+                return
+
+    def GetPartitions(self, request, context):
+        return storage_pb2.PartitionTable(controllers=[
+            storage_pb2.ControllerAddress(address=host, port=port) for host, port in self.partitions])
+
+    def node_table(self):
+        # Every node's state as partition 0 pushes it to the other partitions
+        nodes, stats, codecs = store.nodes_snapshot(), store.stats_snapshot(), store.codecs_snapshot()
+        table = storage_pb2.NodeTable()
+        for nid, (address, port, online, _) in nodes.items():
+            if online:
+                table.online.add(id=nid, address=address, port=port, codecs=codecs.get(nid, ()))
+                table.stats.add(id=nid, **stats.get(nid, {}))
+            else:
+                table.offline.append(nid)
+        return table
+
+    def SyncNodes(self, request, context):
+        # Node states from partition 0, which owns liveness; only changes are
+        # logged and printed
+        for info, stats in zip(request.online, request.stats):
+            node = store.get_node(info.id)
+            store.set_codecs(info.id, info.codecs)
+            now = set_node_online(info.id, info.address, info.port, node_stats(stats))
+            if node is None or not node[2]:
+                print(f"[Controller] Node {info.id} ONLINE at {now} (from partition 0)")
+        for nid in request.offline:
+            node = store.get_node(nid)
+            if node and node[2]:
+                print(f"[Controller] Node {nid} OFFLINE at {time.strftime('%Y-%m-%d %H:%M:%S')} (from partition 0)")
+                self.rereplicate(set_node_offline(nid))
+        return storage_pb2.Response(message=f"{len(request.online)} online and {len(request.offline)} offline nodes")
+
+    def GetGroup(self, request, context):
+        if self.raft is None:
+            return storage_pb2.ControllerGroup(leader=-1)
+        return storage_pb2.ControllerGroup(leader=self.raft.leader, members=[
+            storage_pb2.ControllerAddress(address=host, port=port) for host, port in self.raft.members])
+
+
+class AsyncStorageController(StorageController):
+    # Coroutine handlers for the grpc.aio server. Lookups, listings and
+    # heartbeats of known nodes only read or refresh the in-memory store, so
+    # they run inline on the event loop. Handlers that change files or nodes
+    # append to the metadata log and can wait on the store's locks (a
+    # compaction freezes the store while it copies it), so they run in worker
+    # threads (asyncio.to_thread). NotifyDuplicate fan-out runs as tasks on
+    # the loop.
+    async def SetOffline(self, request, context):
+        return await asyncio.to_thread(super().SetOffline, request, context)
+
+    async def RegisterNode(self, request, context):
+        return await asyncio.to_thread(super().RegisterNode, request, context)
+
+    async def Heartbeat(self, request, context):
+        return super().Heartbeat(request, context)
+
+    async def HeartbeatStream(self, request_iterator, context):
+        # Same protocol as the threaded handler, with a reader task and an
+        # asyncio.Queue; commands.send() may run on other threads, hence
+        # call_soon_threadsafe
+        requests = request_iterator.__aiter__()
+        try:
+            first = await requests.__anext__()
+        except StopAsyncIteration:
+            return
+        if not self._record_stats(first):
+            await context.abort(grpc.StatusCode.NOT_FOUND, "Node not registered")
+        outbox = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        deliver = lambda command: loop.call_soon_threadsafe(outbox.put_nowait, command)
+        if not commands.attach(first.id, deliver):
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Too many heartbeat streams, use Heartbeat")
+
+        async def read_stats():
+            try:
+                async for request in requests:
+                    self._record_stats(request)
+            except grpc.RpcError:
+                pass
+            finally:
+                outbox.put_nowait(None)
+
+        reader = loop.create_task(read_stats())
+        try:
+            while True:
+                command = await outbox.get()
+                if command is None:
+                    return
+                yield command
+        finally:
+            reader.cancel()
+            commands.detach(first.id, deliver)
+
+    async def AnnounceFile(self, request, context):
+        return await asyncio.to_thread(super().AnnounceFile, request, context)
+
+    async def AnnounceFiles(self, request_iterator, context):
+        async for batch in request_iterator:
+            yield await asyncio.to_thread(self._announce_batch, batch)
+
+    async def GetFileLocations(self, request, context):
+        return super().GetFileLocations(request, context)
+
+    async def GetFileLocationsBatch(self, request, context):
+        return super().GetFileLocationsBatch(request, context)
+
+    async def GetReplicaTargets(self, request, context):
+        return super().GetReplicaTargets(request, context)
+
+    async def GetReplicationStatus(self, request, context):
+        return super().GetReplicationStatus(request, context)
+
+    async def CreateFile(self, request, context):
+        return super().CreateFile(request, context)
+
+    async def DeleteFile(self, request, context):
+        return await asyncio.to_thread(super().DeleteFile, request, context)
+
+    async def ModifyFile(self, request, context):
+        return await asyncio.to_thread(super().ModifyFile, request, context)
+
+    async def PlaceShards(self, request, context):
+        return super().PlaceShards(request, context)
+
+    async def CommitShards(self, request, context):
+        return await asyncio.to_thread(super().CommitShards, request, context)
+
+    async def GetShardLayout(self, request, context):
+        return super().GetShardLayout(request, context)
+
+    async def ListFiles(self, request, context):
+        return super().ListFiles(request, context)
+
+    async def MakeDirectory(self, request, context):
+        return await asyncio.to_thread(super().MakeDirectory, request, context)
+
+    async def ListDirectory(self, request, context):
+        for listing in super().ListDirectory(request, context):
+            yield listing
+
+    async def RenamePath(self, request, context):
+        return await asyncio.to_thread(super().RenamePath, request, context)
+
+    async def DeletePath(self, request, context):
+        return await asyncio.to_thread(super().DeletePath, request, context)
+
+    async def ListFilesPage(self, request, context):
+        return super().ListFilesPage(request, context)
+
+    async def ListFilesStream(self, request, context):
+        for batch in super().ListFilesStream(request, context):
+            yield batch
+
+    async def GetPartitions(self, request, context):
+        return super().GetPartitions(request, context)
+
+    async def SyncNodes(self, request, context):
+        return await asyncio.to_thread(super().SyncNodes, request, context)
+
+    async def GetGroup(self, request, context):
+        return super().GetGroup(request, context)
+
+def restore_metadata(data_dir):
+    # Reload nodes and files from the snapshot + WAL and keep logging changes
+    metadata_log = MetadataLog(data_dir)
+    start = time.time()
+    count = metadata_log.restore(store)
+    # Restored online nodes get one timeout to send a heartbeat
+    for nid, _, _ in store.online_nodes():
+        liveness.beat(nid)
+    print(f"[Controller] Restored {count} metadata records from {data_dir} in {time.time() - start:.2f} seconds")
+    return metadata_log
+
+
+def describe_partition(partitions, partition):
+    if partitions:
+        print(f"[Controller] Partition {partition} of {len(partitions)}: files whose name hashes to {partition}")
+
+
+def share_liveness(controller, partitions, partition):
+    # Partition 0 keeps the other partitions' node tables in step
+    if partitions and partition == 0:
+        controller.node_sync = NodeSync(partitions, controller.node_table)
+        controller.node_sync.start()
+
+
+def join_group(controller, group, member):
+    # Replicate the metadata with the other controllers of the group; the
+    # store's changes go through the RaftMember, which keeps the WAL going
+    def lead():
+        # Every known node gets a full timeout to reach the new leader
+        for nid, _, _ in store.online_nodes():
+            liveness.beat(nid)
+
+    raft = RaftMember(group, member, store, watchers, on_leader=lead, on_step_down=commands.close_all)
+    raft.attach(store)
+    controller.raft = raft
+    print(f"[Controller] Member {member} of a group of {len(group)}: "
+          + ", ".join(f"{host}:{port}" for host, port in group))
+    return raft
+
+
+def serve_controller(host="127.0.0.1", port=6000, replication_factor=DEFAULT_REPLICATION_FACTOR, placement="hash",
+                     node_timeout=DEFAULT_NODE_TIMEOUT, data_dir=DEFAULT_DATA_DIR, partitions=(), partition=0,
+                     group=(), member=0):
+    # partitions: (host, port) of every controller process sharing the file
+    # metadata, this one being partitions[partition]; empty for one controller.
+    # group: (host, port) of every controller replicating the metadata, this
+    # one being group[member]
     print(f"[DEBUG] serve_controller called with host={host}, port={port}")
+    liveness.timeout = node_timeout
+    metadata_log = restore_metadata(data_dir) if data_dir else None
     try:
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-        storage_pb2_grpc.add_StorageControllerServicer_to_server(StorageController(), server)
+        # Open heartbeat streams each hold a worker; past the limit nodes fall back to unary Heartbeat
+        commands.max_streams = MAX_HEARTBEAT_STREAMS
+        controller = StorageController(replication_factor, placement, partitions, partition)
+        share_liveness(controller, partitions, partition)
+        raft = join_group(controller, group, member) if group else None
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=HANDLER_WORKERS + MAX_HEARTBEAT_STREAMS),
+                             options=SERVER_OPTIONS, interceptors=[GroupInterceptor(raft)] if raft else None)
+        storage_pb2_grpc.add_StorageControllerServicer_to_server(controller, server)
+        if raft:
+            storage_pb2_grpc.add_ControllerRaftServicer_to_server(raft, server)
         server.add_insecure_port(f"{host}:{port}")
         print(f"[Controller] Running on {host}:{port}")
+        describe_partition(partitions, partition)
         server.start()
+        if raft:
+            raft.start()
         while True:
-            # Check for offline nodes and remove their files from cloud
-            now = time.time()
-            offline_nodes = []
-            for nid, (addr, port, online, last_seen) in registered_nodes.items():
-                # If last seen > 15 seconds ago, mark offline
-                last_seen_time = time.mktime(time.strptime(last_seen, '%Y-%m-%d %H:%M:%S'))
-                if online and now - last_seen_time > 15:
-                    registered_nodes[nid] = (addr, port, False, last_seen)
-                    print(f"[Controller] Node {nid} OFFLINE at {time.strftime('%Y-%m-%d %H:%M:%S')}")
-                    offline_nodes.append(nid)
-            # Remove files from cloud if all owners are offline
-            to_remove = []
-            for fname, info in file_locations.items():
-                online_owners = [nid for nid, _, _ in info['owners'] if nid in registered_nodes and registered_nodes[nid][2]]
-                if not online_owners:
-                    to_remove.append(fname)
-            for fname in to_remove:
-                print(f"[Controller] File {fname} removed from cloud (all owners offline)")
-                del file_locations[fname]
-            time.sleep(5)
+            if (raft is None or raft.is_leader()) and controller.owns_liveness:
+                expire_nodes(controller)
+            else:
+                # Offline detection is the leader's (it restarts the deadlines when
+                # elected) or partition 0's
+                liveness.expire()
+            # Sleep until the next heartbeat deadline is due
+            liveness.wait(FOLLOWER_SWEEP if raft else None)
     except Exception as e:
         print(f"[ERROR] Exception in serve_controller: {e}")
         import traceback
@@ -130,6 +784,51 @@ def serve_controller(host="127.0.0.1", port=6000):
     except KeyboardInterrupt:
         print("\n[Controller] Shutting down...")
         server.stop(0)
+        replication.shutdown()
+        if metadata_log:
+            metadata_log.close()
+
+
+async def _serve_async(host, port, replication_factor, placement, metadata_log, partitions, partition):
+    # One event loop serves every connection; there is no worker pool to exhaust
+    aio_pool = AioChannelPool()
+    replication.use_asyncio(aio_pool)
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    controller = AsyncStorageController(replication_factor, placement, partitions, partition)
+    share_liveness(controller, partitions, partition)
+    storage_pb2_grpc.add_StorageControllerServicer_to_server(controller, server)
+    server.add_insecure_port(f"{host}:{port}")
+    await server.start()
+    print(f"[Controller] Running on {host}:{port} (asyncio)")
+    describe_partition(partitions, partition)
+    try:
+        while True:
+            if controller.owns_liveness:
+                expire_nodes(controller)
+            else:
+                liveness.expire()  # partition 0 detects offline nodes
+            await aio_pool.evict_idle()
+            # A new node's deadline is never earlier than the current next one,
+            # so unlike the threaded loop this sleep needs no wake-up event
+            await asyncio.sleep(liveness.delay())
+    finally:
+        await server.stop(0)
+        replication.shutdown()
+        await aio_pool.close()
+        if metadata_log:
+            metadata_log.close()
+
+
+def serve_controller_async(host="127.0.0.1", port=6000, replication_factor=DEFAULT_REPLICATION_FACTOR,
+                           placement="hash", node_timeout=DEFAULT_NODE_TIMEOUT, data_dir=DEFAULT_DATA_DIR,
+                           partitions=(), partition=0):
+    # Same API as serve_controller, served by grpc.aio for large node counts
+    liveness.timeout = node_timeout
+    metadata_log = restore_metadata(data_dir) if data_dir else None
+    try:
+        asyncio.run(_serve_async(host, port, replication_factor, placement, metadata_log, partitions, partition))
+    except KeyboardInterrupt:
+        print("\n[Controller] Shutting down...")
 
 def start_dashboard():
     try:
@@ -3,7 +3,7 @@ from flask import Flask, render_template_string, request, redirect, send_file, f
 import threading
 import time
 import io
-from controller import registered_nodes, file_locations
+from controller import store, set_node_online
 
 app = Flask(__name__)
 
@@ -93,7 +93,7 @@ TEMPLATE = '''
 
 @app.route('/')
 def dashboard():
-    return render_template_string(TEMPLATE, nodes=registered_nodes, files=file_locations)
+    return render_template_string(TEMPLATE, nodes=store.nodes_snapshot(), files=store.files_snapshot())
 
 
 # --- Web endpoints for actions ---
@@ -102,8 +102,7 @@ def register_node():
     node_id = request.form['node_id']
     address = request.form['address']
     port = int(request.form['port'])
-    now = time.strftime('%Y-%m-%d %H:%M:%S')
-    registered_nodes[node_id] = (address, port, True, now)
+    set_node_online(node_id, address, port)
     flash(f"Node {node_id} registered at {address}:{port} (ONLINE)")
     return redirect(url_for('dashboard'))
 
@@ -117,22 +116,20 @@ def upload_file():
         return redirect(url_for('dashboard'))
     now = time.strftime('%Y-%m-%d %H:%M:%S')
     # Simulate file storage: just record metadata
-    if filename not in file_locations:
-        file_locations[filename] = {'owners': set(), 'upload_time': now}
     # Use dummy address/port if owner not registered
-    if owner_id in registered_nodes:
-        addr, port, _, _ = registered_nodes[owner_id]
+    node = store.get_node(owner_id)
+    if node:
+        addr, port, _, _ = node
     else:
         addr, port = '127.0.0.1', 5001
-    file_locations[filename]['owners'].add((owner_id, addr, port))
-    file_locations[filename]['upload_time'] = now
+    store.add_file_owner(filename, (owner_id, addr, port), now, upload=True)
     flash(f"File '{filename}' uploaded and owned by {owner_id}")
     return redirect(url_for('dashboard'))
 
 @app.route('/download_file', methods=['GET'])
 def download_file():
     filename = request.args.get('filename')
-    if filename not in file_locations:
+    if not store.has_file(filename):
         flash(f"File '{filename}' not found!")
         return redirect(url_for('dashboard'))
     # Simulate file content
@@ -0,0 +1,140 @@
+# rsync-style delta transfer for modified files.
+#
+# The node holding the old version sends a signature: for every block_size
+# block of its copy, a weak Adler-32 checksum and a strong BLAKE2b-128 hash.
+# The node with the new version slides a block_size window over it. Where the
+# window's Adler-32 is in the signature and the strong hash agrees, it sends
+# "copy old block i"; bytes that match no block are sent as literals. The
+# receiver rebuilds the new version from its old copy plus the literals, so a
+# small edit costs about the edit plus the signature, not the file size.
+#
+# The window is checked with zlib.adler32 (C) at every block it can jump to;
+# only while no block matches (the edited region) does it roll one byte at a
+# time in Python, so unchanged parts of the file are scanned at C speed.
+
+import hashlib
+import math
+import zlib
+
+
+MIN_BLOCK = 1024
+MAX_BLOCK = 64 * 1024
+LITERAL_SIZE = 256 * 1024  # max literal bytes per delta op
+_MOD = 65521               # Adler-32 modulus
+
+
+def block_size_for(size):
+    # sqrt(size) balances signature size against literal bytes per edit
+    return max(MIN_BLOCK, min(MAX_BLOCK, math.isqrt(size)))
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def signature(f, block_size):
+    # [(weak, strong)] for every block of an open file; the last may be short
+    blocks = []
+    while True:
+        data = f.read(block_size)
+        if not data:
+            return blocks
+        blocks.append((zlib.adler32(data), strong_hash(data)))
+
+
+def delta(data, block_size, blocks, old_size):
+    # Yield (copy_block, copy_count, literal) ops that turn the old file
+    # described by blocks into data (any bytes-like, e.g. an mmap). An op either
+    # copies copy_count old blocks starting at copy_block or carries a literal.
+    table = {}  # weak -> {strong: block index}
+    tail = None  # (index, length, weak, strong) of a short last block
+    for i, (weak, strong) in enumerate(blocks):
+        if i == len(blocks) - 1 and old_size % block_size:
+            tail = (i, old_size % block_size, weak, strong)
+        else:
+            table.setdefault(weak, {}).setdefault(strong, i)
+
+    n = len(data)
+    pos = 0
+    literal_start = 0
+    run = None  # [first block, count] of copies not yet yielded
+    a = None    # rolling Adler-32 halves of data[pos:pos + block_size]
+    b = 0
+    while pos + block_size <= n:
+        if a is None:
+            weak = zlib.adler32(data[pos:pos + block_size])
+            a, b = weak & 0xFFFF, weak >> 16
+        candidates = table.get((b << 16) | a)
+        if candidates:
+            index = candidates.get(strong_hash(data[pos:pos + block_size]))
+            if index is not None:
+                if literal_start < pos:
+                    if run:
+                        yield run[0], run[1], b""
+                        run = None
+                    yield from _literals(data, literal_start, pos)
+                if run and run[0] + run[1] == index:
+                    run[1] += 1
+                else:
+                    if run:
+                        yield run[0], run[1], b""
+                    run = [index, 1]
+                pos += block_size
+                literal_start = pos
+                a = None
+                continue
+        if pos + block_size < n:
+            out, new = data[pos], data[pos + block_size]
+            a = (a - out + new) % _MOD
+            b = (b - block_size * out + a - 1) % _MOD
+        pos += 1
+
+    end = n
+    if tail is not None:
+        index, length, weak, strong = tail
+        start = n - length
+        if start >= literal_start and zlib.adler32(data[start:]) == weak and strong_hash(data[start:]) == strong:
+            end = start
+    if literal_start < end:
+        if run:
+            yield run[0], run[1], b""
+            run = None
+        yield from _literals(data, literal_start, end)
+    if end < n:
+        if run and run[0] + run[1] == tail[0]:
+            run[1] += 1
+        else:
+            if run:
+                yield run[0], run[1], b""
+            run = [tail[0], 1]
+    if run:
+        yield run[0], run[1], b""
+
+
+def _literals(data, start, end):
+    for i in range(start, end, LITERAL_SIZE):
+        yield 0, 0, bytes(data[i:min(end, i + LITERAL_SIZE)])
+
+
+def apply(old, ops, out, block_size):
+    # Write the new version to out from the old file object and the ops;
+    # returns (size, SHA-256 hex digest) of what was written
+    h = hashlib.sha256()
+    size = 0
+    for copy_block, copy_count, literal in ops:
+        if copy_count:
+            old.seek(copy_block * block_size)
+            remaining = copy_count * block_size
+            while remaining > 0:
+                data = old.read(min(remaining, LITERAL_SIZE))
+                if not data:
+                    break  # the last block may be short
+                out.write(data)
+                h.update(data)
+                size += len(data)
+                remaining -= len(data)
+        if literal:
+            out.write(literal)
+            h.update(literal)
+            size += len(literal)
+    return size, h.hexdigest()
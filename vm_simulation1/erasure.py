@@ -0,0 +1,130 @@
+# Reed-Solomon erasure coding over GF(2^8).
+#
+# A file is cut into k equal data shards (the last one zero-padded) and m
+# parity shards are computed from them; any k of the k+m shards rebuild the
+# file. With k=4, m=2 a file survives two lost nodes at 1.5x its size on disk,
+# where surviving two losses with whole copies takes three copies (3x).
+#
+# The code is systematic: data shards are the file's bytes as they are, so a
+# download that gets all k data shards just joins them. Parity row i uses the
+# Cauchy coefficients 1 / (x_i + y_j) with x_i = k + i and y_j = j; every
+# square submatrix of a Cauchy matrix is invertible, so any k shards decode.
+#
+# Pure Python without NumPy: multiplying a whole shard by a constant is one
+# bytes.translate() with that constant's 256-entry product table, and adding
+# (XOR) two shards goes through int.from_bytes, so both run in C.
+
+DEFAULT_DATA_SHARDS = 4
+DEFAULT_PARITY_SHARDS = 2
+MAX_SHARDS = 256  # x_i and y_j must be distinct field elements
+
+SHARD_MARK = "#ec"  # stored shards are named <filename>#ec<index>
+
+# exp/log tables of GF(2^8) with the polynomial x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _EXP[_i] = _x
+    _LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11d
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+
+def _mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+
+def _inv(a):
+    return _EXP[255 - _LOG[a]]
+
+
+# _TABLES[c] maps every byte x to c * x, for bytes.translate
+_TABLES = [bytes(_mul(c, x) for x in range(256)) for c in range(256)]
+
+
+def shard_name(fname, index):
+    return f"{fname}{SHARD_MARK}{index}"
+
+
+def shard_of(name):
+    # (filename, index) for a stored shard name, else None
+    fname, mark, index = name.rpartition(SHARD_MARK)
+    if not mark or not index.isdigit():
+        return None
+    return fname, int(index)
+
+
+def check(k, m):
+    if k < 1 or m < 0 or k + m > MAX_SHARDS:
+        raise ValueError(f"Need k >= 1, m >= 0 and k + m <= {MAX_SHARDS} (got k={k}, m={m})")
+
+
+def _row(index, k):
+    # Coefficients that make shard `index` out of the k data shards
+    if index < k:
+        return [int(j == index) for j in range(k)]
+    return [_inv(index ^ j) for j in range(k)]
+
+
+def _combine(coefficients, shards, size):
+    # sum(c * shard) over GF(2^8), shards all `size` bytes
+    acc = 0
+    for c, shard in zip(coefficients, shards):
+        if c == 0:
+            continue
+        scaled = shard if c == 1 else shard.translate(_TABLES[c])
+        acc ^= int.from_bytes(scaled, "little")
+    return acc.to_bytes(size, "little")
+
+
+def _invert(matrix):
+    # Gauss-Jordan inverse of a square matrix over GF(2^8)
+    n = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = next(r for r in range(col, n) if rows[r][col])
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        scale = _inv(rows[col][col])
+        rows[col] = [_mul(scale, v) for v in rows[col]]
+        for r in range(n):
+            factor = rows[r][col]
+            if r != col and factor:
+                rows[r] = [v ^ _mul(factor, p) for v, p in zip(rows[r], rows[col])]
+    return [row[n:] for row in rows]
+
+
+def shard_size(size, k):
+    return max(1, -(-size // k))
+
+
+def encode(data, k, m):
+    # The k + m shards of data, each shard_size(len(data), k) bytes
+    check(k, m)
+    n = shard_size(len(data), k)
+    data = bytes(data)
+    shards = [data[i * n:(i + 1) * n].ljust(n, b"\0") for i in range(k)]
+    for index in range(k, k + m):
+        shards.append(_combine(_row(index, k), shards, n))
+    return shards
+
+
+def decode(shards, k, m, size):
+    # Rebuild the original size bytes from any k shards ({index: bytes})
+    check(k, m)
+    if len(shards) < k:
+        raise ValueError(f"Need {k} shards to rebuild, got {len(shards)}")
+    n = shard_size(size, k)
+    if all(i in shards for i in range(k)):
+        return b"".join(shards[i] for i in range(k))[:size]
+    # Prefer data shards: they need no arithmetic
+    chosen = sorted(shards)[:k]
+    inverse = _invert([_row(i, k) for i in chosen])
+    available = [shards[i] for i in chosen]
+    data = [shards[j] if j in shards else _combine(inverse[j], available, n) for j in range(k)]
+    return b"".join(data)[:size]
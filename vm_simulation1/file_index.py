@@ -0,0 +1,181 @@
+# Reverse index over the controller's file metadata.
+#
+# Keeps node -> owned files and, per file, how many of its owners are online.
+# Online/offline transitions then only touch the files the node owns, and the
+# set of visible files (at least one online owner) is maintained as it changes
+# instead of being recomputed by ListFiles. It is kept sorted, so listings are
+# paged by name and a prefix costs a binary search instead of a full scan.
+
+from bisect import bisect_left, bisect_right, insort
+
+
+class SortedNames:
+    # A set of names that also keeps them in sorted order. New names wait in
+    # a set until something reads the order, then are sorted in at once, so
+    # loading many names (restoring the metadata log) is not a list shift
+    # per name. Removing one shifts the list (a memmove).
+    def __init__(self):
+        self._names = []
+        self._members = set()
+        self._pending = set()  # added since the list was last sorted
+
+    def add(self, name):
+        if name not in self._members:
+            self._members.add(name)
+            self._pending.add(name)
+
+    def discard(self, name):
+        if name in self._members:
+            self._members.discard(name)
+            if name in self._pending:
+                self._pending.discard(name)
+            else:
+                del self._names[bisect_left(self._names, name)]
+
+    def _sorted(self):
+        if self._pending:
+            if len(self._pending) == 1:
+                insort(self._names, self._pending.pop())
+            else:
+                # Timsort merges the two sorted runs in one pass
+                self._names.extend(sorted(self._pending))
+                self._names.sort()
+                self._pending = set()
+        return self._names
+
+    def update(self, names):
+        # Add many names with one shift when they sort next to each other, as
+        # the files of a directory moved to a free name do
+        new = sorted(set(names) - self._members)
+        if not new:
+            return
+        self._members.update(new)
+        names = self._sorted()
+        i = bisect_left(names, new[0])
+        if i == bisect_left(names, new[-1]):
+            names[i:i] = new
+        else:
+            names.extend(new)
+            names.sort()
+
+    def difference_update(self, names):
+        # Remove many names with one shift when they are a contiguous run, as
+        # the files of a directory are
+        gone = sorted(self._members.intersection(names))
+        if not gone:
+            return
+        self._members.difference_update(gone)
+        names = self._sorted()
+        i = bisect_left(names, gone[0])
+        if names[i:i + len(gone)] == gone:
+            del names[i:i + len(gone)]
+        else:
+            self._names = [name for name in names if name in self._members]
+
+    def __contains__(self, name):
+        return name in self._members
+
+    def __len__(self):
+        return len(self._members)
+
+    def __iter__(self):
+        return iter(self._sorted())
+
+    def scan(self, after="", prefix=""):
+        # Names after `after` that start with prefix, in order. The caller
+        # must not change the set while iterating.
+        names = self._sorted()
+        i = bisect_right(names, after) if after >= prefix else bisect_left(names, prefix)
+        while i < len(names) and names[i].startswith(prefix):
+            yield names[i]
+            i += 1
+
+
+def glob_prefix(pattern):
+    # The literal start of a glob pattern, before its first wildcard
+    for i, ch in enumerate(pattern):
+        if ch in "*?[":
+            return pattern[:i]
+    return pattern
+
+
+class FileIndex:
+    def __init__(self):
+        self.node_files = {}    # node id -> set of filenames it owns
+        self.file_owners = {}   # filename -> set of owner node ids
+        self.online_count = {}  # filename -> number of online owners
+        self.online = set()     # node ids currently online
+        self.visible = SortedNames()  # filenames with at least one online owner
+
+    def is_online(self, nid):
+        return nid in self.online
+
+    def add_owner(self, fname, nid):
+        # Called once per record on restore, so avoid setdefault's throwaway sets
+        owners = self.file_owners.get(fname)
+        if owners is None:
+            owners = self.file_owners[fname] = set()
+            self.online_count[fname] = 0
+        elif nid in owners:
+            return
+        owners.add(nid)
+        files = self.node_files.get(nid)
+        if files is None:
+            files = self.node_files[nid] = set()
+        files.add(fname)
+        if nid in self.online:
+            self._inc(fname)
+
+    def remove_file(self, fname):
+        self.remove_files([fname])
+
+    def remove_files(self, fnames):
+        for fname in fnames:
+            for nid in self.file_owners.pop(fname, ()):
+                files = self.node_files.get(nid)
+                if files is not None:
+                    files.discard(fname)
+            self.online_count.pop(fname, None)
+        self.visible.difference_update(fnames)
+
+    def rename_files(self, moves):
+        # Re-key [(old, new)] files. Their offline owners are dropped, as the
+        # store forgets them on a rename.
+        for old, new in moves:
+            owners = set()
+            for nid in self.file_owners.pop(old, ()):
+                files = self.node_files[nid]
+                files.discard(old)
+                if nid in self.online:
+                    files.add(new)
+                    owners.add(nid)
+            self.file_owners[new] = owners
+            self.online_count[new] = len(owners)
+            self.online_count.pop(old, None)
+        self.visible.difference_update([old for old, _ in moves])
+        self.visible.update(new for _, new in moves if self.online_count[new])
+
+    def node_online(self, nid):
+        if nid in self.online:
+            return
+        self.online.add(nid)
+        for fname in self.node_files.get(nid, ()):
+            self._inc(fname)
+
+    def node_offline(self, nid):
+        # Returns the files that just lost their last online owner
+        if nid not in self.online:
+            return []
+        self.online.discard(nid)
+        orphaned = []
+        for fname in self.node_files.get(nid, ()):
+            self.online_count[fname] -= 1
+            if self.online_count[fname] == 0:
+                self.visible.discard(fname)
+                orphaned.append(fname)
+        return orphaned
+
+    def _inc(self, fname):
+        count = self.online_count[fname] = self.online_count[fname] + 1
+        if count == 1:
+            self.visible.add(fname)
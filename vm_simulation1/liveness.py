@@ -0,0 +1,62 @@
+# Node liveness tracking for the controller.
+#
+# Every heartbeat pushes the node's new deadline (monotonic time + timeout)
+# onto a min-heap. Expiring nodes only pops the entries that are due, so a
+# sweep costs O(k log n) for k expired entries instead of a scan over every
+# node, and the sweep loop can sleep exactly until the next deadline.
+# Entries made stale by a later heartbeat are skipped when they surface.
+
+import heapq
+import threading
+import time
+
+
+DEFAULT_NODE_TIMEOUT = 15.0  # seconds without a heartbeat before a node is offline
+
+
+class LivenessTracker:
+    def __init__(self, timeout=DEFAULT_NODE_TIMEOUT):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._deadlines = {}  # id -> current deadline
+        self._heap = []       # (deadline, id), may hold stale entries
+        self._changed = threading.Event()
+
+    def beat(self, nid):
+        # Record a heartbeat (or registration) from nid
+        deadline = time.monotonic() + self.timeout
+        with self._lock:
+            first = nid not in self._deadlines
+            self._deadlines[nid] = deadline
+            heapq.heappush(self._heap, (deadline, nid))
+            # Drop stale entries once they clearly outnumber live ones
+            if len(self._heap) > 4 * len(self._deadlines) + 64:
+                self._heap = [(d, n) for n, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+        if first:
+            self._changed.set()
+
+    def expire(self, now=None):
+        # Pop and return the ids whose deadline has passed
+        now = time.monotonic() if now is None else now
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, nid = heapq.heappop(self._heap)
+                if self._deadlines.get(nid) == deadline:
+                    del self._deadlines[nid]
+                    expired.append(nid)
+        return expired
+
+    def delay(self, max_wait=None):
+        # Seconds until the next deadline is due
+        with self._lock:
+            delay = self._heap[0][0] - time.monotonic() if self._heap else self.timeout
+        if max_wait is not None:
+            delay = min(delay, max_wait)
+        return max(0.0, delay)
+
+    def wait(self, max_wait=None):
+        # Sleep until the next deadline is due (or a new node shows up)
+        self._changed.wait(self.delay(max_wait))
+        self._changed.clear()
@@ -0,0 +1,73 @@
+# Node-side cache of file locations from the controller.
+#
+# Downloads look up where a file lives first; with the cache, repeated reads
+# of the same files skip that controller round trip. Entries expire after
+# ttl seconds, and the controller drops them sooner by sending an INVALIDATE
+# command down the node's HeartbeatStream when a file's owners change (a node
+# joins or leaves, a replica lands, the file is modified or deleted). A
+# per-file generation number keeps an answer that was in flight during an
+# invalidation from being cached.
+
+import threading
+import time
+
+from proto import storage_pb2
+
+
+DEFAULT_LOCATION_TTL = 30.0  # seconds a cached answer is trusted without an invalidation
+
+
+class LocationCache:
+    def __init__(self, stub, node_id, ttl=DEFAULT_LOCATION_TTL):
+        self.stub = stub
+        self.node_id = node_id
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}     # filename -> (expires, [NodeLocation])
+        self._generation = {}  # filename -> bumped on every invalidation
+        self.hits = 0
+        self.misses = 0
+
+    def locate(self, fnames):
+        # {filename: [NodeLocation]}: cached answers, the rest in one controller call
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for fname in fnames:
+                entry = self._entries.get(fname)
+                if entry is not None and entry[0] > now:
+                    found[fname] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(fname)
+                    self.misses += 1
+            tokens = {fname: self._generation.get(fname, 0) for fname in missing}
+        if len(missing) == 1:
+            nodes = self.stub.GetFileLocations(storage_pb2.FileName(filename=missing[0], id=self.node_id)).nodes
+            answers = {missing[0]: list(nodes)}
+        elif missing:
+            batch = self.stub.GetFileLocationsBatch(storage_pb2.FileNameBatch(id=self.node_id, filenames=missing))
+            answers = {f.filename: list(f.nodes) for f in batch.files}
+        else:
+            answers = {}
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for fname, nodes in answers.items():
+                if self._generation.get(fname, 0) == tokens.get(fname) and nodes:
+                    self._entries[fname] = (expires, nodes)
+        found.update(answers)
+        return found
+
+    def invalidate(self, fnames):
+        with self._lock:
+            for fname in fnames:
+                self._generation[fname] = self._generation.get(fname, 0) + 1
+                self._entries.pop(fname, None)
+
+    def clear(self):
+        # Forget everything, e.g. while invalidations can't reach us
+        with self._lock:
+            for fname in self._entries:
+                self._generation[fname] = self._generation.get(fname, 0) + 1
+            self._entries.clear()
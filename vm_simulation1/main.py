@@ -3,9 +3,17 @@
 
 print("[DEBUG] main.py started")
 import argparse
+import os
+import signal
+import subprocess
+import sys
 import threading
-from controller import serve_controller, start_dashboard
-from node import run_node
+from controller import serve_controller, serve_controller_async, start_dashboard, DEFAULT_DATA_DIR
+from placement import DEFAULT_REPLICATION_FACTOR, POLICIES
+from liveness import DEFAULT_NODE_TIMEOUT
+from node import run_node, DEFAULT_HEARTBEAT_INTERVAL, DEFAULT_NODE_DATA_DIR
+from read_cache import DEFAULT_CACHE_BYTES
+from location_cache import DEFAULT_LOCATION_TTL
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--controller", action="store_true")
@@ -15,13 +23,80 @@ parser.add_argument("--controller-host", type=str, default="127.0.0.1")
 parser.add_argument("--controller-port", type=int, default=6000)
 parser.add_argument("--host", type=str, default="127.0.0.1")
 parser.add_argument("--port", type=int, default=5000)
+parser.add_argument("--replication-factor", type=int, default=DEFAULT_REPLICATION_FACTOR,
+                    help="Replicas pushed for each uploaded file, besides the uploader's copy")
+parser.add_argument("--placement", choices=sorted(POLICIES), default="hash",
+                    help="How replica targets are chosen")
+parser.add_argument("--node-timeout", type=float, default=DEFAULT_NODE_TIMEOUT,
+                    help="Seconds without a heartbeat before the controller marks a node offline")
+parser.add_argument("--data-dir", default=None,
+                    help=f"Controller: where the metadata log and snapshots go (default {DEFAULT_DATA_DIR}, '' to "
+                         f"disable). Node: parent dir of its chunk store (default {DEFAULT_NODE_DATA_DIR})")
+parser.add_argument("--async", dest="use_async", action="store_true",
+                    help="Serve the controller with grpc.aio (one event loop) instead of a thread pool")
+parser.add_argument("--heartbeat-interval", type=float, default=DEFAULT_HEARTBEAT_INTERVAL,
+                    help="Seconds between node heartbeats (keep it below --node-timeout)")
+parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_BYTES / (1024 * 1024),
+                    help="Node: memory for caching hot downloads, in MB (0 disables)")
+parser.add_argument("--location-ttl", type=float, default=DEFAULT_LOCATION_TTL,
+                    help="Node: seconds cached file locations are used before asking the controller again")
+parser.add_argument("--no-compression", action="store_true",
+                    help="Node: send and accept file bytes uncompressed")
+parser.add_argument("--partitions", type=int, default=1,
+                    help="Controller: split file metadata over this many processes on ports --port, --port + 1, ...")
+parser.add_argument("--partition", type=int, default=None, help=argparse.SUPPRESS)  # set for the extra processes
+parser.add_argument("--group", default=None,
+                    help="Controller: host:port of every controller replicating the metadata, comma-separated, "
+                         "this one (--host:--port) included; start each of them with the same list")
 args = parser.parse_args()
 
 if args.controller:
     print("[DEBUG] args.controller is True")
-    start_dashboard()
-    print("[Controller] Web dashboard is running at http://127.0.0.1:8080/ (open in your browser)")
-    serve_controller(args.host, args.port)
+    serve = serve_controller_async if args.use_async else serve_controller
+    data_dir = DEFAULT_DATA_DIR if args.data_dir is None else args.data_dir
+    partitions = []
+    children = []
+    group = []
+    member = 0
+    if args.group:
+        group = [(host, int(port)) for host, _, port in (entry.strip().rpartition(":")
+                                                         for entry in args.group.split(","))]
+        if (args.host, args.port) not in group:
+            parser.error(f"--group must include this controller ({args.host}:{args.port})")
+        if len(group) < 3:
+            parser.error("--group needs at least three controllers (a majority must survive a failure)")
+        if args.use_async or args.partitions > 1:
+            parser.error("--group works with the threaded, unpartitioned controller only")
+        member = group.index((args.host, args.port))
+        if data_dir:
+            data_dir = os.path.join(data_dir, f"member{member}")
+    if args.partitions > 1:
+        # Partition 0 is this process; it starts the others, each with its own port and metadata dir
+        base_port = args.port - (args.partition or 0)
+        partitions = [(args.host, base_port + i) for i in range(args.partitions)]
+        if args.partition is None:
+            # Stopping this process (Ctrl+C or SIGTERM) stops the other partitions too
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            for i in range(1, args.partitions):
+                children.append(subprocess.Popen([sys.executable] + sys.argv + ["--partition", str(i),
+                                                                                "--port", str(base_port + i)]))
+        if data_dir:
+            data_dir = os.path.join(data_dir, f"partition{args.partition or 0}")
+    try:
+        if not args.partition and not member:
+            # The dashboard shows partition 0's files (the first member's in a group)
+            start_dashboard()
+            print("[Controller] Web dashboard is running at http://127.0.0.1:8080/ (open in your browser)")
+        if group:
+            serve(args.host, args.port, args.replication_factor, args.placement, args.node_timeout, data_dir,
+                  group=group, member=member)
+        else:
+            serve(args.host, args.port, args.replication_factor, args.placement, args.node_timeout, data_dir,
+                  partitions, args.partition or 0)
+    finally:
+        for child in children:
+            child.terminate()
 elif args.node:
     print("[DEBUG] args.node is True")
-    run_node(args.id, args.controller_host, args.controller_port, args.host, args.port)
+    run_node(args.id, args.controller_host, args.controller_port, args.host, args.port, args.heartbeat_interval,
+             args.data_dir, int(args.cache_mb * 1024 * 1024), args.location_ttl, not args.no_compression)
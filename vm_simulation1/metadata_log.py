@@ -0,0 +1,417 @@
+# Durable controller metadata: write-ahead log plus compacted snapshots.
+#
+# The MetadataStore hands every state change (node online/offline, file
+# owner added, file removed, replica targets) to MetadataLog.append() while it
+# still holds its own locks, so the log order matches the order the changes
+# were applied. Appends only go to an in-memory buffer; a background thread
+# writes and fsyncs the buffer every sync_interval seconds (group commit).
+# Heartbeats of nodes that are already online are not logged at all.
+#
+# Once enough records pile up the log is compacted (one compaction at a
+# time): the current WAL is rotated out to metadata.wal.old.<n> and the
+# store's state is copied at that same instant (the store is frozen
+# meanwhile), so the snapshot holds exactly the records up to the rotation.
+# Replaying a record twice is not safe (NODE_OFFLINE removes the files that
+# lose their last online owner). The snapshot is written as
+# metadata.snap.new, then the old WALs are deleted and the new snapshot takes
+# the old one's place; a restore that finds metadata.snap.new finishes those
+# steps first. Old WALs left by a compaction that failed before writing its
+# snapshot are replayed in order and folded into the next one. Snapshots use
+# the same record format as the WAL, so restoring is "replay snapshot, then
+# old WALs, then WAL".
+#
+# Record layout: <payload length u32><type u8><payload><crc32 of payload u32>
+# A torn or corrupt record at the end of the WAL (crash mid-write) ends replay
+# and is cut off, so new records are appended right after the last good one.
+# Snapshots and old WALs were fsynced whole, so a bad record in one of them
+# is an error rather than a tail to drop.
+
+import gc
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+SNAPSHOT_FILE = "metadata.snap"
+NEW_SNAPSHOT_FILE = "metadata.snap.new"
+WAL_FILE = "metadata.wal"
+OLD_WAL_FILE = "metadata.wal.old"  # rotated WALs are OLD_WAL_FILE.<n>
+
+SYNC_INTERVAL = 0.05      # seconds between group commits
+COMPACT_EVERY = 200000    # WAL records between snapshots
+
+NODE_ONLINE = 1   # id, address, port, last_seen
+NODE_OFFLINE = 2  # id
+FILE_OWNER = 3    # filename, id, address, port, time, upload flag
+FILE_REMOVE = 4   # filename
+FILE_TARGETS = 5  # filename, [(id, address, port)]
+FILE_SHARDS = 6   # filename, k, m, size, [(index, id, address, port)]
+FILE_SIZE = 7     # filename, size
+DIR_CREATE = 8    # path of a directory made with mkdir
+DIR_REMOVE = 9    # path: it and the directories under it are no longer mkdir'ed
+
+_HEADER = struct.Struct("<IB")
+_CRC = struct.Struct("<I")
+_U16 = struct.Struct("<H")
+_I32 = struct.Struct("<i")
+_I64 = struct.Struct("<q")
+
+
+def _str(value):
+    data = value.encode("utf-8")
+    return _U16.pack(len(data)) + data
+
+
+def _read_str(buf, pos):
+    (n,) = _U16.unpack_from(buf, pos)
+    pos += 2
+    return buf[pos:pos + n].decode("utf-8"), pos + n
+
+
+def encode(kind, *fields):
+    if kind == NODE_ONLINE:
+        nid, addr, port, last_seen = fields
+        payload = _str(nid) + _str(addr) + _I32.pack(port) + _str(last_seen)
+    elif kind == NODE_OFFLINE:
+        payload = _str(fields[0])
+    elif kind == FILE_OWNER:
+        fname, (nid, addr, port), when, upload = fields
+        payload = _str(fname) + _str(nid) + _str(addr) + _I32.pack(port) + _str(when) + bytes([upload])
+    elif kind in (FILE_REMOVE, DIR_CREATE, DIR_REMOVE):
+        payload = _str(fields[0])
+    elif kind == FILE_TARGETS:
+        fname, targets = fields
+        payload = _str(fname) + _U16.pack(len(targets))
+        for nid, addr, port in targets:
+            payload += _str(nid) + _str(addr) + _I32.pack(port)
+    elif kind == FILE_SHARDS:
+        fname, k, m, size, shards = fields
+        payload = _str(fname) + _U16.pack(k) + _U16.pack(m) + _I64.pack(size) + _U16.pack(len(shards))
+        for index, (nid, addr, port) in shards:
+            payload += _U16.pack(index) + _str(nid) + _str(addr) + _I32.pack(port)
+    elif kind == FILE_SIZE:
+        fname, size = fields
+        payload = _str(fname) + _I64.pack(size)
+    else:
+        raise ValueError(f"Unknown record type {kind}")
+    return _HEADER.pack(len(payload), kind) + payload + _CRC.pack(zlib.crc32(payload))
+
+
+def decode(buf):
+    # Yield (type, fields, end offset) for every intact record in buf. Most
+    # records are FILE_OWNER, and their owner and time repeat from file to
+    # file, so those are decoded once and shared.
+    pos = 0
+    end = len(buf)
+    tails = {}
+    while pos + _HEADER.size <= end:
+        length, kind = _HEADER.unpack_from(buf, pos)
+        start = pos + _HEADER.size
+        stop = start + length
+        if stop + _CRC.size > end:
+            return
+        payload = buf[start:stop]
+        if _CRC.unpack_from(buf, stop)[0] != zlib.crc32(payload):
+            return
+        pos = stop + _CRC.size
+        if kind == FILE_OWNER:
+            fname, i = _read_str(payload, 0)
+            tail = payload[i:]
+            owner = tails.get(tail)
+            if owner is None:
+                owner = tails[tail] = _owner(tail)
+            yield kind, (fname,) + owner, pos
+        else:
+            yield kind, _decode_payload(kind, payload), pos
+
+
+def _owner(p):
+    # (loc, time, upload flag) of a FILE_OWNER payload after its filename
+    nid, i = _read_str(p, 0)
+    addr, i = _read_str(p, i)
+    (port,) = _I32.unpack_from(p, i)
+    when, i = _read_str(p, i + 4)
+    return (nid, addr, port), when, bool(p[i])
+
+
+def _decode_payload(kind, p):
+    if kind == NODE_ONLINE:
+        nid, i = _read_str(p, 0)
+        addr, i = _read_str(p, i)
+        (port,) = _I32.unpack_from(p, i)
+        last_seen, _ = _read_str(p, i + 4)
+        return nid, addr, port, last_seen
+    if kind in (NODE_OFFLINE, FILE_REMOVE, DIR_CREATE, DIR_REMOVE):
+        return (_read_str(p, 0)[0],)
+    if kind == FILE_OWNER:
+        fname, i = _read_str(p, 0)
+        return (fname,) + _owner(p[i:])
+    if kind == FILE_TARGETS:
+        fname, i = _read_str(p, 0)
+        (count,) = _U16.unpack_from(p, i)
+        i += 2
+        targets = []
+        for _ in range(count):
+            nid, i = _read_str(p, i)
+            addr, i = _read_str(p, i)
+            (port,) = _I32.unpack_from(p, i)
+            i += 4
+            targets.append((nid, addr, port))
+        return fname, targets
+    if kind == FILE_SHARDS:
+        fname, i = _read_str(p, 0)
+        k, m = _U16.unpack_from(p, i)[0], _U16.unpack_from(p, i + 2)[0]
+        (size,) = _I64.unpack_from(p, i + 4)
+        (count,) = _U16.unpack_from(p, i + 12)
+        i += 14
+        shards = []
+        for _ in range(count):
+            (index,) = _U16.unpack_from(p, i)
+            nid, i = _read_str(p, i + 2)
+            addr, i = _read_str(p, i)
+            (port,) = _I32.unpack_from(p, i)
+            i += 4
+            shards.append((index, (nid, addr, port)))
+        return fname, k, m, size, shards
+    if kind == FILE_SIZE:
+        fname, i = _read_str(p, 0)
+        return fname, _I64.unpack_from(p, i)[0]
+    raise ValueError(f"Unknown record type {kind}")
+
+
+def apply(store, kind, fields):
+    # Re-apply one logged change to a MetadataStore
+    if kind == NODE_ONLINE:
+        nid, addr, port, last_seen = fields
+        store.set_node_online(nid, addr, port, now=last_seen)
+    elif kind == NODE_OFFLINE:
+        store.set_node_offline(fields[0])
+    elif kind == FILE_OWNER:
+        fname, loc, when, upload = fields
+        store.add_file_owner(fname, loc, when, upload=upload)
+    elif kind == FILE_REMOVE:
+        store.remove_file(fields[0])
+    elif kind == FILE_TARGETS:
+        store.set_targets(*fields)
+    elif kind == FILE_SHARDS:
+        fname, k, m, size, shards = fields
+        store.set_erasure(fname, k, m, size, dict(shards))
+    elif kind == FILE_SIZE:
+        store.set_size(*fields)
+    elif kind == DIR_CREATE:
+        store.mkdir(fields[0])
+    elif kind == DIR_REMOVE:
+        store.forget_dir(fields[0])
+
+
+def snapshot_state(store):
+    # Copies of the nodes, mkdir'ed directories and files; taken under
+    # store.frozen() they match an exact position of the log
+    return store.nodes_snapshot(), store.explicit_dirs(), store.files_snapshot()
+
+
+def snapshot_records(state):
+    # Encoded records that rebuild a snapshot_state()
+    nodes, dirs, files = state
+    for nid, (addr, port, online, last_seen) in nodes.items():
+        yield encode(NODE_ONLINE, nid, addr, port, last_seen)
+        if not online:
+            yield encode(NODE_OFFLINE, nid)
+    for path in dirs:
+        yield encode(DIR_CREATE, path)
+    for fname, info in files.items():
+        yield from file_records(fname, info)
+
+
+def file_records(fname, info):
+    # Encoded records that recreate one file record
+    for i, loc in enumerate(info['owners']):
+        yield encode(FILE_OWNER, fname, loc, info['upload_time'], i == 0)
+    if info['targets']:
+        yield encode(FILE_TARGETS, fname, info['targets'])
+    if info['erasure']:
+        ec = info['erasure']
+        yield encode(FILE_SHARDS, fname, ec['k'], ec['m'], ec['size'], sorted(ec['shards'].items()))
+    if info['size'] is not None:
+        yield encode(FILE_SIZE, fname, info['size'])
+
+
+class MetadataLog:
+    def __init__(self, data_dir, sync_interval=SYNC_INTERVAL, compact_every=COMPACT_EVERY):
+        self.data_dir = data_dir
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self._lock = threading.Lock()     # guards the in-memory buffer
+        self._io_lock = threading.Lock()  # guards the WAL file; fsync happens under this only
+        self._compact_lock = threading.Lock()  # one compaction at a time; taken before the store's locks
+        self._buffer = []
+        self._records = 0  # records in the WAL since the last snapshot
+        self._store = None
+        self._wal = None
+        self._stop = threading.Event()
+        self._flusher = None
+        os.makedirs(data_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def _old_wals(self):
+        # Rotated WALs that no snapshot holds yet, oldest first
+        rotated = []
+        for name in os.listdir(self.data_dir):
+            if name == OLD_WAL_FILE:
+                rotated.append((0, name))  # written before the WALs were numbered
+            elif name.startswith(OLD_WAL_FILE + ".") and name[len(OLD_WAL_FILE) + 1:].isdigit():
+                rotated.append((int(name[len(OLD_WAL_FILE) + 1:]), name))
+        return [name for _, name in sorted(rotated)]
+
+    def _promote_snapshot(self):
+        # metadata.snap.new holds every rotated WAL: drop them and make it the snapshot
+        for name in self._old_wals():
+            os.remove(self._path(name))
+        os.replace(self._path(NEW_SNAPSHOT_FILE), self._path(SNAPSHOT_FILE))
+
+    def restore(self, store):
+        # Rebuild store from snapshot + WAL(s), then start logging its changes.
+        # Returns the number of records replayed.
+        for name in os.listdir(self.data_dir):
+            if name.startswith(SNAPSHOT_FILE) and name.endswith(".tmp"):
+                os.remove(self._path(name))  # a snapshot that was still being written
+        if os.path.exists(self._path(NEW_SNAPSHOT_FILE)):
+            self._promote_snapshot()  # a compaction was interrupted after writing its snapshot
+        count = 0
+        # Replay builds millions of objects that all stay alive; collecting
+        # garbage meanwhile only rescans them, so it waits until the end
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            with store.frozen():
+                for name in [SNAPSHOT_FILE] + self._old_wals() + [WAL_FILE]:
+                    count += self._replay(store, name)
+        finally:
+            if collecting:
+                gc.enable()
+        self._store = store
+        self._wal = open(self._path(WAL_FILE), "ab")
+        store.log = self
+        if self._old_wals():
+            # A compaction was interrupted; fold the old WALs into a fresh snapshot
+            self.compact()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="metadata-log")
+        self._flusher.start()
+        return count
+
+    def _replay(self, store, name):
+        path = self._path(name)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            buf = f.read()
+        replayed = 0
+        end = 0
+        for kind, fields, end in decode(buf):
+            apply(store, kind, fields)
+            replayed += 1
+        if end < len(buf):
+            if name != WAL_FILE:
+                raise ValueError(f"Metadata file {name} is corrupt at byte {end}")
+            print(f"[Controller] Dropping {len(buf) - end} bytes of torn metadata log tail")
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        if name != SNAPSHOT_FILE:
+            self._records += replayed
+        return replayed
+
+    def append(self, record):
+        with self._lock:
+            self._buffer.append(record)
+
+    def flush(self):
+        # Group commit: write and fsync everything appended so far
+        with self._io_lock:
+            self._write_buffer()
+            due = self._records >= self.compact_every
+        if due:
+            with self._compact_lock:
+                if self._records >= self.compact_every:  # not compacted by another caller meanwhile
+                    self._compact()
+
+    def compact(self):
+        # Rotate the WAL, write a snapshot of the store and drop the old WALs.
+        # Safe to call from any thread; concurrent calls run one after the other.
+        with self._compact_lock:
+            self._compact()
+
+    @contextmanager
+    def replacing(self):
+        # Around rebuilding the whole store (a controller group member
+        # installing the leader's snapshot): no compaction snapshots the store
+        # half rebuilt, and the rebuilt store is compacted before any other
+        # compaction runs. Like compact(), taken before the store's locks.
+        with self._compact_lock:
+            yield
+            self._compact()
+
+    def _compact(self):
+        # Caller holds _compact_lock. The store is frozen from the rotation
+        # until its state is copied, so every change is in exactly one of the
+        # snapshot and the new WAL.
+        if os.path.exists(self._path(NEW_SNAPSHOT_FILE)):
+            self._promote_snapshot()  # left by a compaction that failed at the end
+        with self._store.frozen():
+            with self._io_lock:
+                self._write_buffer()
+                self._wal.close()
+                rotated = self._old_wals()
+                n = int(rotated[-1].rpartition(".")[2]) + 1 if rotated and rotated[-1] != OLD_WAL_FILE else 1
+                os.replace(self._path(WAL_FILE), self._path(f"{OLD_WAL_FILE}.{n}"))
+                self._wal = open(self._path(WAL_FILE), "ab")
+                self._records = 0
+            state = snapshot_state(self._store)
+        fd, tmp = tempfile.mkstemp(dir=self.data_dir, prefix=SNAPSHOT_FILE + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                batch = []
+                for record in snapshot_records(state):
+                    batch.append(record)
+                    if len(batch) >= 4096:
+                        f.write(b"".join(batch))
+                        batch = []
+                f.write(b"".join(batch))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._path(NEW_SNAPSHOT_FILE))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._promote_snapshot()
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._io_lock:
+            self._write_buffer()
+            self._wal.close()
+
+    def _write_buffer(self):
+        # Caller holds _io_lock; appenders only wait for the buffer swap
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+        if not buffer:
+            return
+        self._wal.write(b"".join(buffer))
+        self._wal.flush()
+        os.fsync(self._wal.fileno())
+        self._records += len(buffer)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.sync_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Controller] Metadata log flush failed: {e}")
@@ -0,0 +1,446 @@
+# Thread-safe metadata store for the controller.
+#
+# Node state and file state are guarded by separate locks, so the hot
+# Heartbeat path (node lock only) never waits on AnnounceFile/ListFiles (file
+# locks). Readers such as the dashboard get copies, never the live dicts, so
+# nothing iterates a dict while a handler thread resizes it.
+#
+# File records are striped: each filename maps to one of FILE_STRIPES locks
+# (hash(filename) % FILE_STRIPES), so calls about different files don't wait
+# on each other. The reverse index and the directory tree are shared by all
+# files and have their own lock, held only around their updates.
+#
+# Lock order is always node lock -> file stripes -> shared lock. A call that
+# touches one file takes its stripe only; one that touches many (a node
+# going offline, rename, remove_tree, snapshots) takes every stripe in index
+# order, never starting from a stripe it already holds.
+#
+# When a MetadataLog is attached (self.log), every change is also appended to
+# it under the same locks, so the log replays in the order changes happened.
+
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from fnmatch import fnmatchcase
+
+from file_index import FileIndex, glob_prefix
+from metadata_log import (encode, file_records, NODE_ONLINE, NODE_OFFLINE, FILE_OWNER, FILE_REMOVE, FILE_TARGETS,
+                          FILE_SHARDS, FILE_SIZE, DIR_CREATE, DIR_REMOVE)
+from namespace import Namespace, split
+
+
+LIST_PAGE_SIZE = 1000  # files per listing page when the caller doesn't say
+MAX_PAGE_SIZE = 10000
+MAX_LIST_SCAN = 10000  # names a listing page examines at most; a rare pattern ends pages early
+FILE_STRIPES = 16      # locks the file records are spread over
+
+
+_clock = (0, '')  # (whole second, formatted), shared by every caller
+
+
+def _now():
+    # Heartbeats arrive far more often than once a second per controller, so
+    # format each second only once
+    global _clock
+    second = int(time.time())
+    if _clock[0] != second:
+        _clock = (second, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second)))
+    return _clock[1]
+
+
+class MetadataStore:
+    def __init__(self):
+        self._node_lock = threading.RLock()
+        self._file_locks = [threading.RLock() for _ in range(FILE_STRIPES)]
+        self._shared_lock = threading.RLock()  # the index and the namespace
+        self._nodes = {}  # id -> (address, port, online, last_seen)
+        self._stats = {}  # id -> { 'free_disk', 'active_transfers', 'bandwidth', 'file_count': int }
+        self._codecs = {}  # id -> compression codecs the node advertised at registration (not logged)
+        self._files = {}  # filename -> { 'owners': set of (id, address, port), 'upload_time': str, 'targets': list,
+                          #               'size': bytes or None if the uploader didn't say,
+                          #               'erasure': None or { 'k', 'm', 'size', 'shards': {index: (id, address, port)} } }
+        self._index = FileIndex()
+        self._namespace = Namespace()  # directory tree over the filenames
+        self.log = None  # MetadataLog, set by MetadataLog.restore()
+        self.on_node_online = None  # callback(filenames of a node that just came online), called without locks
+
+    def _file_lock(self, fname):
+        return self._file_locks[hash(fname) % FILE_STRIPES]
+
+    @contextmanager
+    def _all_files(self):
+        # Every file stripe, in index order, then the shared lock
+        with ExitStack() as stack:
+            for lock in self._file_locks:
+                stack.enter_context(lock)
+            with self._shared_lock:
+                yield
+
+    @contextmanager
+    def frozen(self):
+        # Hold off every change, e.g. to copy the state at an exact position
+        # of the log (nothing can be logged meanwhile)
+        with self._node_lock, self._all_files():
+            yield
+
+    def reset(self):
+        # Forget every node and file (a controller group member about to load the leader's snapshot)
+        with self._node_lock, self._all_files():
+            self._nodes.clear()
+            self._stats.clear()
+            self._files.clear()
+            self._index = FileIndex()
+            self._namespace = Namespace()
+
+    # ---------------- nodes ----------------
+    def set_node_online(self, nid, address, port, stats=None, now=None):
+        now = now or _now()
+        revived = None
+        with self._node_lock:
+            old = self._nodes.get(nid)
+            if old != (address, port, True, now):
+                self._nodes[nid] = (address, port, True, now)
+            # Plain heartbeats of an online node are not worth logging
+            if self.log and (old is None or old[:3] != (address, port, True)):
+                self.log.append(encode(NODE_ONLINE, nid, address, port, now))
+            if stats is not None:
+                self._stats[nid] = stats
+            # Index online/offline changes also hold the node lock, so the
+            # node lock alone is enough to read the node's online flag here
+            if not self._index.is_online(nid):
+                with self._shared_lock:
+                    self._index.node_online(nid)
+                    revived = list(self._index.node_files.get(nid, ()))
+        if revived and self.on_node_online:
+            self.on_node_online(revived)
+        return now
+
+    def heartbeat(self, nid, stats=None):
+        # Refresh a known node; returns False for unknown ids
+        with self._node_lock:
+            node = self._nodes.get(nid)
+            if node is None:
+                return False
+            self.set_node_online(nid, node[0], node[1], stats)
+            return True
+
+    def set_node_offline(self, nid):
+        # Returns (files removed because they lost their last online owner,
+        # files of the node that still have another online owner), or None
+        with self._node_lock:
+            node = self._nodes.get(nid)
+            if node is None:
+                return None
+            addr, port, _, last_seen = node
+            self._nodes[nid] = (addr, port, False, last_seen)
+            if self.log:
+                self.log.append(encode(NODE_OFFLINE, nid))
+            with self._all_files():
+                was_online = self._index.is_online(nid)
+                orphaned = self._index.node_offline(nid)
+                degraded = self._index.node_files.get(nid, set()) - set(orphaned) if was_online else set()
+                for fname in orphaned:
+                    self._remove_file(fname)
+            return orphaned, list(degraded)
+
+    def get_node(self, nid):
+        with self._node_lock:
+            return self._nodes.get(nid)
+
+    def online_nodes(self):
+        # [(id, address, port)] of every online node
+        with self._node_lock:
+            return [(nid, addr, port) for nid, (addr, port, online, _) in self._nodes.items() if online]
+
+    def nodes_snapshot(self):
+        with self._node_lock:
+            return dict(self._nodes)
+
+    def stats_snapshot(self):
+        with self._node_lock:
+            return dict(self._stats)
+
+    def set_codecs(self, nid, codecs):
+        with self._node_lock:
+            self._codecs[nid] = list(codecs)
+
+    def codecs_snapshot(self):
+        with self._node_lock:
+            return dict(self._codecs)
+
+    # ---------------- files ----------------
+    def add_file_owner(self, fname, loc, now=None, upload=False):
+        # Record loc as an owner; upload=True creates the record if needed and
+        # stamps the upload time. Returns False if there is no such file.
+        now = now or _now()
+        with self._file_lock(fname):
+            info = self._files.get(fname)
+            if info is None and not upload:
+                return False
+            with self._shared_lock:
+                if info is None:
+                    info = self._files[fname] = {'owners': set(), 'upload_time': now, 'targets': [], 'size': None,
+                                                 'erasure': None}
+                    self._namespace.add_file(fname)
+                if self.log and (upload or loc not in info['owners']):
+                    self.log.append(encode(FILE_OWNER, fname, loc, now, upload))
+                info['owners'].add(loc)
+                if upload:
+                    info['upload_time'] = now
+                self._index.add_owner(fname, loc[0])
+            return True
+
+    def modify_file(self, fname, loc, now=None):
+        # loc changed the file, so it holds the only current copy: drop the
+        # other owners until they catch up and announce themselves again.
+        # Returns the previous owners besides loc, or None if there is no such file.
+        with self._file_lock(fname):
+            info = self._files.get(fname)
+            if info is None:
+                return None
+            previous = [owner for owner in info['owners'] if owner[0] != loc[0]]
+            with self._shared_lock:
+                self._remove_file(fname)
+                if self.log:
+                    self.log.append(encode(FILE_REMOVE, fname))
+            self.add_file_owner(fname, loc, now, upload=True)
+            return previous
+
+    def set_shards(self, fname, k, m, size, shards, now=None):
+        # Record fname as erasure-coded, replacing any earlier record; the
+        # shard holders ({index: (id, address, port)}) become its owners
+        now = now or _now()
+        with self._file_lock(fname):
+            if fname in self._files:
+                with self._shared_lock:
+                    self._remove_file(fname)
+                    if self.log:
+                        self.log.append(encode(FILE_REMOVE, fname))
+            for i, loc in enumerate(shards.values()):
+                self.add_file_owner(fname, loc, now, upload=i == 0)
+            self.set_erasure(fname, k, m, size, shards)
+
+    def set_erasure(self, fname, k, m, size, shards):
+        with self._file_lock(fname):
+            if fname in self._files:
+                self._files[fname]['erasure'] = {'k': k, 'm': m, 'size': size, 'shards': dict(shards)}
+                if self.log:
+                    self.log.append(encode(FILE_SHARDS, fname, k, m, size, sorted(shards.items())))
+
+    def online_shards(self, fname):
+        # (k, m, size, [(index, (id, address, port))] on online nodes), or None
+        # if fname is not erasure-coded
+        with self._file_lock(fname):
+            info = self._files.get(fname)
+            if info is None or info['erasure'] is None:
+                return None
+            ec = info['erasure']
+            with self._shared_lock:
+                shards = [(index, loc) for index, loc in sorted(ec['shards'].items()) if self._index.is_online(loc[0])]
+            return ec['k'], ec['m'], ec['size'], shards
+
+    def has_file(self, fname):
+        with self._file_lock(fname):
+            return fname in self._files
+
+    def set_targets(self, fname, targets):
+        with self._file_lock(fname):
+            if fname in self._files:
+                self._files[fname]['targets'] = list(targets)
+                if self.log:
+                    self.log.append(encode(FILE_TARGETS, fname, list(targets)))
+
+    def set_size(self, fname, size):
+        with self._file_lock(fname):
+            info = self._files.get(fname)
+            if info is not None and info['size'] != size:
+                info['size'] = size
+                if self.log:
+                    self.log.append(encode(FILE_SIZE, fname, size))
+
+    def get_file(self, fname):
+        # Copy of one file record, or None
+        with self._file_lock(fname):
+            info = self._files.get(fname)
+            return self._copy(info) if info is not None else None
+
+    def online_owners(self, fname):
+        with self._file_lock(fname), self._shared_lock:
+            info = self._files.get(fname)
+            if info is None:
+                return []
+            return [loc for loc in info['owners'] if self._index.is_online(loc[0])]
+
+    def visible_files(self):
+        with self._shared_lock:
+            return list(self._index.visible)
+
+    def list_files(self, after="", prefix="", pattern="", limit=LIST_PAGE_SIZE):
+        # One page of visible files in name order: names after `after` that
+        # start with prefix and match the glob pattern. Returns (names, name
+        # to continue after, or "" when the listing is complete). A page stops
+        # after MAX_LIST_SCAN names even if it is not full, so no call scans
+        # the whole namespace.
+        literal = glob_prefix(pattern)
+        if not (literal.startswith(prefix) or prefix.startswith(literal)):
+            return [], ""
+        prefix = max(prefix, literal, key=len)
+        limit = min(limit or LIST_PAGE_SIZE, MAX_PAGE_SIZE)
+        names = []
+        with self._shared_lock:
+            for scanned, fname in enumerate(self._index.visible.scan(after, prefix), 1):
+                if not pattern or fnmatchcase(fname, pattern):
+                    names.append(fname)
+                if len(names) >= limit or scanned >= MAX_LIST_SCAN:
+                    return names, fname
+        return names, ""
+
+    def file_summaries(self, fnames):
+        # [(filename, size or None, upload time, online owner ids)] of the
+        # files that still exist
+        summaries = []
+        for fname in fnames:
+            with self._file_lock(fname), self._shared_lock:
+                info = self._files.get(fname)
+                if info is None:
+                    continue
+                size = info['erasure']['size'] if info['erasure'] else info['size']
+                owners = sorted(nid for nid, _, _ in info['owners'] if self._index.is_online(nid))
+                summaries.append((fname, size, info['upload_time'], owners))
+        return summaries
+
+    def remove_file(self, fname):
+        with self._file_lock(fname), self._shared_lock:
+            if fname not in self._files:
+                return False
+            self._remove_file(fname)
+            if self.log:
+                self.log.append(encode(FILE_REMOVE, fname))
+            return True
+
+    def files_snapshot(self):
+        with self._all_files():
+            return {fname: self._copy(info) for fname, info in self._files.items()}
+
+    # ---------------- directories ----------------
+    def path_conflict(self, path):
+        # Why no new file or directory can go at path, or None
+        if not path or path.endswith("/"):
+            return f"{path!r} is not a file or directory name"
+        with self._shared_lock:
+            return self._namespace.conflict(path)
+
+    def mkdir(self, path):
+        # Make a directory (and its parents) that stays when empty. Returns
+        # why it can't be made, or None
+        with self._shared_lock:
+            if not self._namespace.is_dir(path):
+                reason = self.path_conflict(path)
+                if reason:
+                    return reason
+            self._namespace.mkdir(path)
+            if self.log:
+                self.log.append(encode(DIR_CREATE, path))
+            return None
+
+    def forget_dir(self, path):
+        with self._shared_lock:
+            self._namespace.forget_dir(path)
+            if self.log:
+                self.log.append(encode(DIR_REMOVE, path))
+
+    def explicit_dirs(self):
+        with self._shared_lock:
+            return self._namespace.explicit_dirs()
+
+    def list_dir(self, path, recursive=False):
+        # [(path, is_dir)] under a directory in name order, without the files
+        # no online node holds; None if there is no such directory
+        with self._shared_lock:
+            if not self._namespace.is_dir(path):
+                return None
+            return [(entry, is_dir) for entry, is_dir in self._namespace.walk(path, recursive)
+                    if is_dir or entry in self._index.visible]
+
+    def rename(self, path, new_path):
+        # Move a file, or a directory with everything under it, to new_path.
+        # Returns (why it can't be moved or None, [(old name, new name, online
+        # owners)] of the moved files). Offline owners are dropped: their
+        # copies keep the old name. A file left with no owner at all is
+        # removed, as the log replays it, and comes back as (old name, None, []).
+        with self._all_files():
+            is_file = path in self._files
+            if not is_file and not (split(path) and self._namespace.is_dir(path)):
+                return f"No file or directory {path}", []
+            if not is_file and (new_path + "/").startswith(path + "/"):
+                return f"Can't move {path} into itself", []
+            reason = self.path_conflict(new_path)
+            if reason:
+                return reason, []
+            if is_file:
+                olds, explicit = [path], []
+                self._namespace.remove_file(path)
+                self._namespace.add_file(new_path)
+            else:
+                olds, explicit = self._namespace.files(path), self._namespace.explicit_dirs(path)
+                # One relink in the tree; the file records are re-keyed below
+                self._namespace.move_dir(path, new_path)
+            moved = [(old, new_path + old[len(path):]) for old in olds]
+            self._index.rename_files(moved)
+            moved = [(old,) + self._rekey(old, new) for old, new in moved]
+            if self.log and explicit:
+                self.log.append(encode(DIR_REMOVE, path))
+                for dir_path in explicit:
+                    self.log.append(encode(DIR_CREATE, new_path + dir_path[len(path):]))
+            return None, moved
+
+    def _rekey(self, old, new):
+        # Move a file record to a new name (the namespace and index are
+        # already updated). Returns (new, online owners), or (None, []) if it
+        # had no online owner and was removed.
+        info = self._files.pop(old)
+        info['owners'] = {loc for loc in info['owners'] if self._index.is_online(loc[0])}
+        if not info['owners']:
+            self._index.remove_file(new)
+            self._namespace.remove_file(new)
+            if self.log:
+                self.log.append(encode(FILE_REMOVE, old))
+            return None, []
+        if info['erasure']:
+            shards = info['erasure']['shards']
+            info['erasure']['shards'] = {i: loc for i, loc in shards.items() if loc in info['owners']}
+        self._files[new] = info
+        if self.log:
+            self.log.append(encode(FILE_REMOVE, old))
+            for record in file_records(new, info):
+                self.log.append(record)
+        return new, sorted(info['owners'])
+
+    def remove_tree(self, path):
+        # Delete a directory and everything under it. Returns {filename:
+        # owners} of the removed files, or None if there is no such directory
+        with self._all_files():
+            if not split(path) or not self._namespace.is_dir(path):
+                return None
+            removed = {}
+            fnames = self._namespace.files(path)
+            for fname in fnames:
+                removed[fname] = self._files.pop(fname)['owners']
+                self._namespace.remove_file(fname)
+                if self.log:
+                    self.log.append(encode(FILE_REMOVE, fname))
+            self._index.remove_files(fnames)
+            self.forget_dir(path)
+            return removed
+
+    def _remove_file(self, fname):
+        # Caller holds the file's stripe and the shared lock
+        del self._files[fname]
+        self._index.remove_file(fname)
+        self._namespace.remove_file(fname)
+
+    @staticmethod
+    def _copy(info):
+        erasure = info['erasure'] and dict(info['erasure'], shards=dict(info['erasure']['shards']))
+        return {'owners': set(info['owners']), 'upload_time': info['upload_time'], 'targets': list(info['targets']),
+                'size': info['size'], 'erasure': erasure}
@@ -0,0 +1,156 @@
+# Directory tree over the controller's filenames.
+#
+# Filenames are paths: "proj1/data/a.csv" is file a.csv in directory
+# proj1/data. The tree (a trie with one level per path component) holds every
+# file the controller knows plus the directories made with mkdir, so listing
+# a directory, or walking, moving or deleting a subtree, touches only that
+# subtree instead of every filename. Directories that only exist because
+# files are in them disappear with their last file; mkdir'ed ones stay until
+# removed. Names are split on every "/" as they are, so each filename maps to
+# exactly one place in the tree and back ("/abs/path" starts with a directory
+# named "").
+
+
+class _Dir:
+    __slots__ = ("dirs", "files", "explicit")
+
+    def __init__(self):
+        self.dirs = {}        # name -> _Dir
+        self.files = set()    # names of the files directly in this directory
+        self.explicit = False  # made with mkdir: kept when empty
+
+
+def split(path):
+    return path.split("/") if path else []
+
+
+def join(parts):
+    return "/".join(parts)
+
+
+class Namespace:
+    def __init__(self):
+        self.root = _Dir()
+
+    def _find(self, parts):
+        node = self.root
+        for part in parts:
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        return node
+
+    def _make(self, parts):
+        node = self.root
+        for part in parts:
+            child = node.dirs.get(part)
+            if child is None:
+                child = node.dirs[part] = _Dir()
+            node = child
+        return node
+
+    def _prune(self, parts):
+        # Drop the empty, implicit directories at the end of the path
+        while parts:
+            parent = self._find(parts[:-1])
+            node = parent.dirs.get(parts[-1]) if parent is not None else None
+            if node is None or node.explicit or node.dirs or node.files:
+                return
+            del parent.dirs[parts[-1]]
+            parts = parts[:-1]
+
+    def is_dir(self, path):
+        return self._find(split(path)) is not None
+
+    def is_file(self, path):
+        parts = split(path)
+        if not parts:
+            return False
+        parent = self._find(parts[:-1])
+        return parent is not None and parts[-1] in parent.files
+
+    def conflict(self, path):
+        # Why nothing new can be created at path, or None
+        parts = split(path)
+        if not parts:
+            return "the root directory already exists"
+        node = self.root
+        for i, part in enumerate(parts[:-1]):
+            if part in node.files:
+                return f"{join(parts[:i + 1])} is a file"
+            node = node.dirs.get(part)
+            if node is None:
+                return None
+        if parts[-1] in node.dirs:
+            return f"{path} is a directory"
+        if parts[-1] in node.files:
+            return f"{path} already exists"
+        return None
+
+    def add_file(self, path):
+        parts = split(path)
+        self._make(parts[:-1]).files.add(parts[-1])
+
+    def remove_file(self, path):
+        parts = split(path)
+        parent = self._find(parts[:-1])
+        if parent is not None:
+            parent.files.discard(parts[-1])
+            self._prune(parts[:-1])
+
+    def mkdir(self, path):
+        self._make(split(path)).explicit = True
+
+    def forget_dir(self, path):
+        # Unmark path and the directories under it as mkdir'ed; the empty ones go
+        parts = split(path)
+        node = self._find(parts)
+        if node is None:
+            return
+        node.explicit = False
+        subdirs = self.dirs(path)
+        for dir_path in subdirs:
+            self._find(split(dir_path)).explicit = False
+        # Deepest first, so a directory is empty by the time it is checked
+        for dir_path in reversed(subdirs):
+            self._prune(split(dir_path))
+        self._prune(parts)
+
+    def move_dir(self, path, new_path):
+        # Re-attach the subtree at path under new_path (which must be free)
+        parts, new_parts = split(path), split(new_path)
+        node = self._find(parts)
+        del self._find(parts[:-1]).dirs[parts[-1]]
+        self._make(new_parts[:-1]).dirs[new_parts[-1]] = node
+        self._prune(parts[:-1])
+
+    def walk(self, path, recursive=True):
+        # (path, is_dir) of the entries under path in name order, directories
+        # before the files at each level; only the first level unless recursive
+        parts = split(path)
+        node = self._find(parts)
+        if node is not None:
+            yield from self._walk(parts, node, recursive)
+
+    def _walk(self, parts, node, recursive):
+        for name in sorted(node.dirs):
+            yield join(parts + [name]), True
+            if recursive:
+                yield from self._walk(parts + [name], node.dirs[name], recursive)
+        for name in sorted(node.files):
+            yield join(parts + [name]), False
+
+    def files(self, path):
+        # Every file under path
+        return [entry for entry, is_dir in self.walk(path) if not is_dir]
+
+    def dirs(self, path):
+        return [entry for entry, is_dir in self.walk(path) if is_dir]
+
+    def explicit_dirs(self, path=""):
+        # The mkdir'ed directories under path (path itself included)
+        node = self._find(split(path))
+        if node is None:
+            return []
+        found = [path] if node.explicit else []
+        return found + [entry for entry in self.dirs(path) if self._find(split(entry)).explicit]
@@ -1,12 +1,29 @@
+import io
 import os
 import sys
 import time
 import threading
-import random
+import itertools
+import hashlib
+import mmap
+import shutil
+import tempfile
 from datetime import datetime
 import grpc
 from concurrent import futures
 from proto import storage_pb2, storage_pb2_grpc
+from swarm import SwarmDownloader, ShardDownloader, SwarmDownloadError
+from channel_pool import pool, SERVER_OPTIONS
+from chunk_store import ChunkStore, MissingChunkError, to_proto, from_proto
+from zero_copy import PreEncodedInterceptor, encode_file_chunk, encode_file_content
+from read_cache import ReadCache, DEFAULT_CACHE_BYTES
+from location_cache import LocationCache, DEFAULT_LOCATION_TTL
+from peer_selector import selector
+from partition import connect, PartitionedStub
+from raft import GroupStub
+import delta
+import erasure
+import transfer_codec
 
 # Optional: colorized output
 try:
@@ -18,58 +35,613 @@ except ImportError:
     Fore = Style = Dummy()
 
 
+# Size of each FileChunk sent over the wire; keeps memory bounded on both peers
+CHUNK_SIZE = 256 * 1024
+
+DEFAULT_HEARTBEAT_INTERVAL = 5.0  # seconds between heartbeats to the controller
+DEFAULT_NODE_DATA_DIR = "node_data"  # each node keeps its chunk store in <dir>/<node id>
+LIST_PAGE_SIZE = 50  # files the list command shows before asking whether to go on
+UPLOAD_BATCH = 500  # announcements per AnnounceFiles message (upload-dir)
+PUSH_WORKERS = 4  # replica pushes upload-dir runs at once
+
+
+def free_disk(path="."):
+    # Free bytes where this node keeps its files, reported to the controller
+    return shutil.disk_usage(path).free
+
+
+def local_path(fname):
+    # Plain file served when fname is not in the chunk store
+    return fname if os.path.exists(fname) else None
+
+
+def iter_file_chunks(path, fname=None, offset=0, length=None, chunk_size=CHUNK_SIZE):
+    # Yield FileChunk messages for a local file (or a byte range of it),
+    # one chunk in memory at a time
+    with open(path, "rb") as f:
+        yield from iter_chunks(f, os.path.getsize(path), fname or path, offset, length, chunk_size)
+
+
+def iter_chunks(f, total_size, fname, offset=0, length=None, chunk_size=CHUNK_SIZE):
+    # Same for an open file object (a plain file or a ChunkReader)
+    end = total_size if length is None else min(total_size, offset + length)
+    f.seek(offset)
+    while offset < end:
+        data = f.read(min(chunk_size, end - offset))
+        if not data:
+            break
+        yield storage_pb2.FileChunk(filename=fname, content=data, offset=offset, total_size=total_size)
+        offset += len(data)
+
+
+class TransferStats:
+    # Transfers in flight and bytes moved by this node, reported with heartbeats
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+        self.total_bytes = 0
+        self.saved_bytes = 0  # bytes not sent or fetched because the receiver already had the chunks
+        self.compressed_bytes = 0  # bytes compression kept off the wire on transfers this node sent
+        self._last = (time.monotonic(), 0)  # (time, total_bytes) at the last bandwidth() call
+
+    def count(self, chunks):
+        # Pass FileChunks through, counting them as one transfer
+        with self._lock:
+            self.active += 1
+        try:
+            for chunk in chunks:
+                with self._lock:
+                    self.total_bytes += len(chunk.content)
+                yield chunk
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def bandwidth(self):
+        # Bytes/sec since the previous call
+        now = time.monotonic()
+        with self._lock:
+            then, before = self._last
+            self._last = (now, self.total_bytes)
+            moved = self.total_bytes - before
+        return int(moved / (now - then)) if now > then else 0
+
+    def add_saved(self, n):
+        with self._lock:
+            self.saved_bytes += n
+
+    def add_compressed(self, n):
+        with self._lock:
+            self.compressed_bytes += n
+
+
+def push_replica(store, fname, target, transfers=None, compress=True):
+    # Send target the manifest of fname and only the chunks it does not have,
+    # compressed with a codec target decodes. Returns (response, bytes sent
+    # before compression).
+    manifest = store.get_manifest(fname)
+    message = to_proto(manifest)
+    stub = pool.node_stub(target.address, target.port)
+    missing = stub.MissingChunks(message, compression=transfer_codec.GZIP).hashes
+    sizes = dict(manifest['chunks'])
+    codec = transfer_codec.choose(target.codecs) if compress else ""
+    saved = [0]
+
+    def messages():
+        yield storage_pb2.ChunkData(manifest=message)
+        for h in missing:
+            data = store.read_chunk(h)
+            used, content = transfer_codec.encode(data, codec)
+            saved[0] += len(data) - len(content)
+            yield storage_pb2.ChunkData(hash=h, content=content, codec=used)
+
+    chunks = messages() if transfers is None else transfers.count(messages())
+    response = stub.PushChunks(chunks)
+    sent = sum(sizes[h] for h in missing)
+    if transfers is not None:
+        transfers.add_saved(manifest['size'] - sent)
+        transfers.add_compressed(saved[0])
+    return response, sent
+
+
+def push_delta(path, fname, target, transfers=None, compress=True):
+    # Bring target's copy of fname up to date with the local file at path: get
+    # its block signature and send only copy instructions plus the bytes that
+    # changed, compressed with a codec target decodes. Returns (response,
+    # literal bytes sent before compression).
+    stub = pool.node_stub(target.address, target.port)
+    sig = stub.GetSignature(storage_pb2.FileDownloadRequest(filename=fname))
+    blocks = [(b.weak, b.strong) for b in sig.blocks]
+    codec = transfer_codec.choose(target.codecs) if compress else ""
+    sent = [0]
+    saved = [0]
+    with open(path, "rb") as f:
+        size = os.path.getsize(path)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        try:
+            def messages():
+                yield storage_pb2.FileDelta(filename=fname, size=size, digest=hashlib.sha256(data).hexdigest(),
+                                            block_size=sig.block_size)
+                for copy_block, copy_count, literal in delta.delta(data, sig.block_size, blocks, sig.size):
+                    sent[0] += len(literal)
+                    used, content = transfer_codec.encode(literal, codec)
+                    saved[0] += len(literal) - len(content)
+                    yield storage_pb2.FileDelta(copy_block=copy_block, copy_count=copy_count, content=content,
+                                                codec=used)
+
+            chunks = messages() if transfers is None else transfers.count(messages())
+            response = stub.ApplyDelta(chunks)
+        finally:
+            if size:
+                data.close()
+    if transfers is not None:
+        transfers.add_saved(size - sent[0])
+        transfers.add_compressed(saved[0])
+    return response, sent[0]
+
+
+def push_shards(store, path, layout, transfers=None, compress=True, node_id=None):
+    # Erasure-code the file at path into the layout's k + m shards and send
+    # each to the node the controller placed it on, all at once; the shard
+    # placed on node_id stays in the local store. Returns the ShardLocations
+    # that were stored.
+    with open(path, "rb") as f:
+        shards = erasure.encode(f.read(), layout.k, layout.m)
+    stored = []
+    lock = threading.Lock()
+
+    def send(placed):
+        name = erasure.shard_name(layout.filename, placed.index)
+        store.ingest_stream(io.BytesIO(shards[placed.index]), name)
+        if placed.node.id != node_id:
+            try:
+                push_replica(store, name, placed.node, transfers, compress)
+            except grpc.RpcError as e:
+                print(f"Shard {placed.index} to {placed.node.id} failed: {e.details()}")
+                return
+            finally:
+                store.remove(name)
+        with lock:
+            stored.append(placed)
+
+    threads = [threading.Thread(target=send, args=(placed,)) for placed in layout.shards]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(stored, key=lambda placed: placed.index)
+
+
+def remove_shards(store, fname):
+    # Drop the shards of an erasure-coded fname held here; returns how many
+    removed = 0
+    for name in store.files():
+        shard = erasure.shard_of(name)
+        if shard and shard[0] == fname and store.remove(name):
+            removed += 1
+    return removed
+
+
+def rename_shards(store, fname, new_fname):
+    # Give the shards of an erasure-coded fname held here its new name
+    renamed = 0
+    for name in store.files():
+        shard = erasure.shard_of(name)
+        if shard and shard[0] == fname and store.rename(name, erasure.shard_name(new_fname, shard[1])):
+            renamed += 1
+    return renamed
+
+
+def upload_dir(stub, store, path, node, replicas=0, transfers=None, compress=True, batch_size=UPLOAD_BATCH):
+    # Upload every file under a local directory: chunk each into the store,
+    # announce them over one AnnounceFiles stream in batches and push the
+    # replicas to the targets the controller returns. node is (id, address,
+    # port). Returns (announced filenames, [(filename, reason)] refused,
+    # replica pushes done, pushes failed).
+    fnames = sorted(os.path.join(root, name).replace(os.sep, "/")
+                    for root, _, names in os.walk(path) for name in names)
+
+    def batches():
+        # Ingested while the controller handles the previous batch
+        for start in range(0, len(fnames), batch_size):
+            batch = storage_pb2.FileAnnouncementBatch()
+            for fname in fnames[start:start + batch_size]:
+                store.ingest(fname, fname)
+                batch.files.add(id=node[0], address=node[1], port=node[2], filename=fname,
+                                replication_factor=replicas, size=os.path.getsize(fname))
+            yield batch
+
+    announced, refused, pushes = [], [], []
+    with futures.ThreadPoolExecutor(max_workers=PUSH_WORKERS) as executor:
+        for results in stub.AnnounceFiles(batches()):
+            for result in results.results:
+                if not result.ok:
+                    refused.append((result.filename, result.message))
+                    continue
+                announced.append(result.filename)
+                pushes += [executor.submit(push_replica, store, result.filename, target, transfers, compress)
+                           for target in result.targets]
+        failed = sum(1 for push in pushes if push.exception() is not None)
+    return announced, refused, len(pushes) - failed, failed
+
+
+def list_directory(stub, path="", recursive=False):
+    # Print a directory of the cloud, directories with a trailing "/";
+    # returns how many entries were shown
+    shown = 0
+    for listing in stub.ListDirectory(storage_pb2.PathRequest(path=path, recursive=recursive)):
+        for entry in listing.entries:
+            print(entry.path + ("/" if entry.is_dir else ""))
+        shown += len(listing.entries)
+    return shown
+
+
+def list_files(stub, pattern="", detailed=False, page_size=LIST_PAGE_SIZE):
+    # Page through the cloud's files, fetching a page only once the user asks
+    # for it; detailed adds size, online owners and upload time (streamed).
+    # Returns how many files were shown.
+    request = storage_pb2.ListRequest(pattern=pattern, page_size=page_size)
+    more = lambda: input("-- more (Enter to continue, q to stop) -- ").strip().lower() != "q"
+    shown = 0
+    if detailed:
+        batches = stub.ListFilesStream(request)
+        try:
+            for batch in batches:
+                for f in batch.files:
+                    size = f"{f.size} bytes" if f.size >= 0 else "size unknown"
+                    owners = ", ".join(f.owners) or "no online node"
+                    print(f"{f.filename}  {size}  uploaded {f.upload_time}  on {owners}")
+                shown += len(batch.files)
+                if batch.files and batch.next_page_token and not more():
+                    break
+        finally:
+            # A gRPC call is cancelled, a merged listing (partitions, group) closed
+            (batches.cancel if hasattr(batches, "cancel") else batches.close)()
+        return shown
+    while True:
+        page = stub.ListFilesPage(request)
+        if page.filenames:
+            print(("Files on cloud: " if not shown else "") + ", ".join(page.filenames))
+        shown += len(page.filenames)
+        if not page.next_page_token:
+            return shown
+        request.page_token = page.next_page_token
+        if page.filenames and not more():
+            return shown
+
+
+def write_chunks(chunks, local_name):
+    # Write streamed chunks to disk as they arrive; returns bytes written.
+    # Goes through a .part file so a failed transfer never clobbers local_name.
+    tmp_name = f"{local_name}.part"
+    written = 0
+    try:
+        os.makedirs(os.path.dirname(local_name) or ".", exist_ok=True)
+        with open(tmp_name, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk.content)
+                written += len(chunk.content)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    os.replace(tmp_name, local_name)
+    return written
+
+
 # ---------------- gRPC File Service (for peer-to-peer downloads) ----------------
 class NodeFileService(storage_pb2_grpc.NodeFileServiceServicer):
+    def __init__(self, node_id=None, host=None, port=None, controller=None, transfers=None, store=None,
+                 zero_copy=True, cache=None):
+        # Identity and controller stub are used to report received replicas
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.controller = controller
+        self.transfers = transfers or TransferStats()
+        self.store = store  # ChunkStore; without one only plain local files are served
+        self.zero_copy = zero_copy  # serve stored files from mapped chunks as pre-encoded messages
+        # ReadCache of pre-encoded responses; needs the store and the zero-copy path
+        self.cache = cache if store and zero_copy else None
+        if self.cache is not None:
+            store.on_change = self.cache.invalidate
+
+    def _open(self, fname):
+        # (file object, size) for fname: the chunk store's copy, else a plain local file
+        manifest = self.store.get_manifest(fname) if self.store else None
+        if manifest:
+            return self.store.open(manifest), manifest['size']
+        path = local_path(fname)
+        if path:
+            return open(path, "rb"), os.path.getsize(path)
+        return None, 0
+
+    def _mapped(self, fname):
+        # Manifest of fname if it can take the zero-copy path, else None
+        if not (self.zero_copy and self.store):
+            return None
+        return self.store.get_manifest(fname)
+
+    def _views(self, manifest, offset=0, length=None):
+        # (file offset, memoryview) pieces of mapped chunks covering the range
+        end = manifest['size'] if length is None else min(manifest['size'], offset + length)
+        pos = 0
+        for h, size in manifest['chunks']:
+            if pos >= end:
+                break
+            if pos + size > offset:
+                view = self.store.view(h, size)
+                for i in range(max(offset, pos) - pos, min(end, pos + size) - pos, CHUNK_SIZE):
+                    yield pos + i, view[i:min(end - pos, i + CHUNK_SIZE)]
+            pos += size
+
+    def _encoded(self, kind, fname, offset=0, length=None):
+        # Pre-encoded messages of a stored file ("file": one FileContent,
+        # "chunks": FileChunks of the range), through the read cache; None if
+        # fname is not in the store
+        key = (kind, fname, offset, length)
+        if self.cache is not None:
+            messages = self.cache.get(key)
+            if messages is not None:
+                return iter(messages)
+            token = self.cache.token(fname)
+        manifest = self._mapped(fname)
+        if not manifest:
+            return None
+        if kind == "file":
+            messages = iter([encode_file_content(fname, [view for _, view in self._views(manifest)])])
+        else:
+            messages = self._encoded_chunks(fname, manifest, offset, length)
+        return messages if self.cache is None else self._caching(key, messages, token)
+
+    def _caching(self, key, messages, token):
+        # Pass messages through and cache them once all were sent
+        sent = []
+        size = 0
+        for message in messages:
+            if sent is not None:
+                sent.append(message)
+                size += len(message.wire)
+                if size > self.cache.max_entry:
+                    sent = None
+            yield message
+        if sent is not None:
+            self.cache.put(key, sent, size, token)
+
+    def _encoded_chunks(self, fname, manifest, offset=0, length=None):
+        # Stored chunks average well under CHUNK_SIZE, so pack consecutive
+        # ones into one message; the join copies them once either way
+        batch = []
+        start = batched = 0
+        for pos, view in self._views(manifest, offset, length):
+            if batch and batched + len(view) > CHUNK_SIZE:
+                yield encode_file_chunk(fname, batch, start, manifest['size'])
+                batch = []
+            if not batch:
+                start, batched = pos, 0
+            batch.append(view)
+            batched += len(view)
+        if batch:
+            yield encode_file_chunk(fname, batch, start, manifest['size'])
+
+    def _need_store(self, context):
+        if self.store is None:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Node has no chunk store")
+
+    def _replica_stored(self, fname):
+        # Tell the controller this node can now serve fname. Shards of an
+        # erasure-coded file are recorded by the uploader (CommitShards).
+        if self.controller is not None and not erasure.shard_of(fname):
+            try:
+                self.controller.AnnounceFile(storage_pb2.FileAnnouncement(
+                    id=self.node_id, address=self.host, port=self.port, filename=fname, replica=True))
+            except grpc.RpcError as e:
+                print(f"Could not report replica of {fname} to controller: {e.details()}")
+
+    # Handle notification from controller that a replica will be pushed to us
     def NotifyDuplicate(self, request, context):
         fname = request.filename
-        # Mark as replicated (not accessible until uploader is online)
-        with open(f"replicated_{fname}", "w") as f:
-            f.write(f"Replicated file: {fname} from {request.id}\n")
-        print(f"{Fore.MAGENTA}File '{fname}' replicated by controller. It will be accessible if uploader is online.{Style.RESET_ALL}")
-        return storage_pb2.Response(message=f"Replicated file {fname} stored.")
-    # Handle notification from controller to store a ghosted file
-    def NotifyDuplicate(self, request, context):
-        fname = request.filename
-        # Mark as ghosted (not accessible until uploader is online)
-        with open(f"Replicated_{fname}", "w") as f:
-            f.write(f"Replicate file: {fname} from {request.id}\n")
-        print(f"{Fore.MAGENTA}File '{fname}' Replicated by controller. It will be accessible if uploader is online.{Style.RESET_ALL}")
-        return storage_pb2.Response(message=f"Replicated file {fname} stored.")
+        print(f"{Fore.MAGENTA}File '{fname}' will be replicated here from {request.id}.{Style.RESET_ALL}")
+        return storage_pb2.Response(message=f"Ready to receive replica of {fname}.")
+    def NotifyDuplicates(self, request, context):
+        senders = ", ".join(sorted({f.id for f in request.files}))
+        print(f"{Fore.MAGENTA}{len(request.files)} files will be replicated here from {senders}.{Style.RESET_ALL}")
+        return storage_pb2.Response(message=f"Ready to receive replicas of {len(request.files)} files.")
+    def PushReplica(self, request_iterator, context):
+        # Full-copy push: spool the stream to a temp file, then chunk it into the store
+        self._need_store(context)
+        first = next(request_iterator, None)
+        if first is None:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Empty replica stream")
+        fname = first.filename
+        fd, spool = tempfile.mkstemp(dir=self.store.root, suffix=".part")  # one per concurrent push
+        os.close(fd)
+        try:
+            size = write_chunks(self.transfers.count(itertools.chain([first], request_iterator)), spool)
+            self.store.ingest(spool, fname)
+        finally:
+            os.remove(spool)
+        print(f"{Fore.MAGENTA}File '{fname}' replicated here ({size} bytes).{Style.RESET_ALL}")
+        self._replica_stored(fname)
+        return storage_pb2.Response(message=f"Replicated file {fname} stored ({size} bytes).")
+    def MissingChunks(self, request, context):
+        self._need_store(context)
+        context.set_compression(transfer_codec.GZIP)  # hex hashes
+        return storage_pb2.ChunkHashes(hashes=self.store.missing(c.hash for c in request.chunks))
+    def PushChunks(self, request_iterator, context):
+        # Dedup push: the manifest first, then only the chunks MissingChunks asked for
+        self._need_store(context)
+        first = next(request_iterator, None)
+        if first is None or not first.HasField("manifest"):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Replica stream must start with the manifest")
+        manifest = from_proto(first.manifest)
+        fname = manifest['filename']
+        received = 0
+        for message in self.transfers.count(request_iterator):
+            try:
+                self.store.write_chunk(message.hash, transfer_codec.decode(message.codec, message.content))
+            except ValueError as e:
+                context.abort(grpc.StatusCode.DATA_LOSS, str(e))
+            received += len(message.content)
+        try:
+            self.store.put_manifest(manifest)
+        except MissingChunkError as e:
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, str(e))
+        print(f"{Fore.MAGENTA}File '{fname}' replicated here ({received} of {manifest['size']} bytes "
+              f"transferred).{Style.RESET_ALL}")
+        self._replica_stored(fname)
+        return storage_pb2.Response(message=f"Replicated file {fname} stored "
+                                            f"({received} of {manifest['size']} bytes transferred).")
+    def GetSignature(self, request, context):
+        self._need_store(context)
+        manifest = self.store.get_manifest(request.filename)
+        if manifest is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "File not found on node")
+        block_size = delta.block_size_for(manifest['size'])
+        with self.store.open(manifest) as f:
+            blocks = delta.signature(f, block_size)
+        return storage_pb2.FileSignature(
+            filename=request.filename, size=manifest['size'], block_size=block_size,
+            blocks=[storage_pb2.BlockSignature(weak=weak, strong=strong) for weak, strong in blocks])
+    def ApplyDelta(self, request_iterator, context):
+        # Rebuild the new version from our old copy and the streamed ops, check
+        # it against the sender's digest, then chunk it into the store
+        self._need_store(context)
+        first = next(request_iterator, None)
+        if first is None or not first.filename:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Delta stream must start with the file header")
+        fname = first.filename
+        manifest = self.store.get_manifest(fname)
+        if manifest is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "File not found on node")
+        fd, spool = tempfile.mkstemp(dir=self.store.root, suffix=".part")
+        try:
+            messages = self.transfers.count(itertools.chain([first], request_iterator))
+            ops = ((m.copy_block, m.copy_count, transfer_codec.decode(m.codec, m.content)) for m in messages)
+            with os.fdopen(fd, "wb") as out, self.store.open(manifest) as old:
+                size, digest = delta.apply(old, ops, out, first.block_size)
+            if (size, digest) != (first.size, first.digest):
+                context.abort(grpc.StatusCode.DATA_LOSS, f"Delta for {fname} does not rebuild the new version")
+            self.store.ingest(spool, fname)
+        finally:
+            os.remove(spool)
+        print(f"{Fore.MAGENTA}File '{fname}' updated here from a delta ({size} bytes).{Style.RESET_ALL}")
+        self._replica_stored(fname)
+        return storage_pb2.Response(message=f"Applied delta to {fname} ({size} bytes).")
+    def GetCacheStats(self, request, context):
+        if self.cache is None:
+            return storage_pb2.CacheStats()
+        return storage_pb2.CacheStats(**self.cache.stats(request.reset))
+    def GetManifest(self, request, context):
+        self._need_store(context)
+        manifest = self.store.get_manifest(request.filename)
+        if manifest is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, "File not found on node")
+        context.set_compression(transfer_codec.GZIP)  # hex hashes
+        return to_proto(manifest)
+    def GetChunks(self, request, context):
+        self._need_store(context)
+        codec = transfer_codec.choose(request.accept_codecs)
+        def chunks():
+            for h in request.hashes:
+                try:
+                    data = self.store.read_chunk(h)
+                except FileNotFoundError:
+                    context.abort(grpc.StatusCode.NOT_FOUND, f"Chunk {h[:12]} not found on node")
+                used, content = transfer_codec.encode(data, codec)
+                self.transfers.add_compressed(len(data) - len(content))
+                yield storage_pb2.ChunkData(hash=h, content=content, codec=used)
+        yield from self.transfers.count(chunks())
     def DownloadFile(self, request, context):
         fname = request.filename
-        if os.path.exists(fname):
-            with open(fname, "rb") as f:
+        messages = self._encoded("file", fname)
+        if messages is not None:
+            [message] = messages
+            return message
+        f, size = self._open(fname)
+        if f:
+            with f:
                 data = f.read()
             return storage_pb2.FileContent(filename=fname, content=data)
         context.set_code(grpc.StatusCode.NOT_FOUND)
         context.set_details("File not found on node")
         return storage_pb2.FileContent()
+    def DownloadFileStream(self, request, context):
+        fname = request.filename
+        messages = self._encoded("chunks", fname)
+        if messages is not None:
+            yield from self.transfers.count(messages)
+            return
+        f, size = self._open(fname)
+        if not f:
+            context.abort(grpc.StatusCode.NOT_FOUND, "File not found on node")
+        with f:
+            yield from self.transfers.count(iter_chunks(f, size, fname))
+    def StatFile(self, request, context):
+        f, size = self._open(request.filename)
+        if not f:
+            context.abort(grpc.StatusCode.NOT_FOUND, "File not found on node")
+        f.close()
+        return storage_pb2.FileStat(filename=request.filename, size=size)
+    def ReadRange(self, request, context):
+        messages = self._encoded("chunks", request.filename, request.offset, request.length)
+        if messages is not None:
+            yield from self.transfers.count(messages)
+            return
+        f, size = self._open(request.filename)
+        if not f:
+            context.abort(grpc.StatusCode.NOT_FOUND, "File not found on node")
+        with f:
+            yield from self.transfers.count(iter_chunks(f, size, request.filename, request.offset, request.length))
 
 
-def serve_node_file_service(host, port):
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=5))
-    storage_pb2_grpc.add_NodeFileServiceServicer_to_server(NodeFileService(), server)
+def serve_node_file_service(host, port, node_id=None, controller=None, transfers=None, store=None, zero_copy=True,
+                            cache=None):
+    # The interceptor lets the download methods return pre-encoded messages
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=5), options=SERVER_OPTIONS,
+                         interceptors=[PreEncodedInterceptor()])
+    service = NodeFileService(node_id, host, port, controller, transfers, store, zero_copy, cache)
+    storage_pb2_grpc.add_NodeFileServiceServicer_to_server(service, server)
     server.add_insecure_port(f"{host}:{port}")
     server.start()
     return server
 
 
 # ---------------- Main Node Terminal ----------------
-def run_node(node_id, controller_host, controller_port, host="127.0.0.1", port=5000):
+def run_node(node_id, controller_host, controller_port, host="127.0.0.1", port=5000,
+             heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, data_dir=None, cache_bytes=DEFAULT_CACHE_BYTES,
+             location_ttl=DEFAULT_LOCATION_TTL, compression=True):
+    # Connect to controller; with partitioned metadata, to every partition;
+    # with a replicated controller, to the whole group
+    stub = connect(controller_host, controller_port)
+    if isinstance(stub, PartitionedStub):
+        print(f"[Node {node_id}] Controller metadata is split over {len(stub.stubs)} partitions")
+    elif isinstance(stub, GroupStub):
+        print(f"[Node {node_id}] Controller is a group of {len(stub.stubs)} replicas")
+    # Where files live, cached between downloads; the controller invalidates
+    # entries through the heartbeat stream
+    locations = LocationCache(stub, node_id, location_ttl)
+
+    # Load figures sent with heartbeats, shared with the file service
+    transfers = TransferStats()
+    # Uploaded, downloaded and replicated files live in the node's chunk store
+    store = ChunkStore(os.path.join(data_dir or DEFAULT_NODE_DATA_DIR, node_id))
+    # Hot files are served from memory; 0 disables the cache
+    cache = ReadCache(cache_bytes) if cache_bytes > 0 else None
+
     # Start file service for this node
     try:
-        file_server = serve_node_file_service(host, port)
+        file_server = serve_node_file_service(host, port, node_id, stub, transfers, store, cache=cache)
     except Exception as e:
         print(f"\n{Fore.RED}Failed to bind to {host}:{port}. Is another node using this port?{Style.RESET_ALL}")
         print(f"Error: {e}")
         return
 
-    # Connect to controller
-    channel = grpc.insecure_channel(f"{controller_host}:{controller_port}")
-    stub = storage_pb2_grpc.StorageControllerStub(channel)
-
     # Register node
-    response = stub.RegisterNode(storage_pb2.NodeInfo(id=node_id, address=host, port=port))
+    # Compression codecs this node decodes; senders pick one of them
+    codecs = transfer_codec.available() if compression else []
+    response = stub.RegisterNode(storage_pb2.NodeInfo(id=node_id, address=host, port=port,
+                                                      free_disk=free_disk(store.root), codecs=codecs))
     print(f"[Node {node_id}] {response.message}")
     print(f"{Fore.GREEN}[Node {node_id}] Node is online!{Style.RESET_ALL}")
 
@@ -80,11 +652,75 @@ def run_node(node_id, controller_host, controller_port, host="127.0.0.1", port=5
     try:
         import threading
         stop_flag = threading.Event()
+
+        def node_stats():
+            held = created_files | downloaded_files | uploaded_files | set(store.files())
+            return storage_pb2.NodeStats(id=node_id, free_disk=free_disk(store.root), active_transfers=transfers.active,
+                                         bandwidth=transfers.bandwidth(), file_count=len(held))
+
+        def stats_stream():
+            while True:
+                yield node_stats()
+                if stop_flag.wait(heartbeat_interval):
+                    return
+
+        def run_command(command):
+            # Work pushed by the controller down the heartbeat stream
+            fname = command.filename
+            if command.action == "replicate":
+                if store.get_manifest(fname) is None:
+                    print(f"\n[Node {node_id}] Asked to re-replicate {fname}, but it is not stored here")
+                    return
+                for target in command.targets:
+                    try:
+                        _, sent = push_replica(store, fname, target, transfers, compression)
+                        print(f"\n[Node {node_id}] Re-replicated {fname} to {target.id} ({sent} bytes sent, "
+                              f"controller request)")
+                    except grpc.RpcError as e:
+                        print(f"\n[Node {node_id}] Re-replicating {fname} to {target.id} failed: {e.details()}")
+            elif command.action == "delete":
+                # One file, or every file of a deleted directory held here
+                for fname in command.filenames or [fname]:
+                    store.remove(fname)
+                    remove_shards(store, fname)
+                    for files in (created_files, downloaded_files, uploaded_files):
+                        files.discard(fname)
+                    if os.path.exists(fname):
+                        os.remove(fname)
+                    print(f"\n[Node {node_id}] Deleted {fname} (removed from the cloud)")
+            elif command.action == "rename":
+                # A file or directory was moved; all of its files held here at once
+                for fname, new_fname in zip(command.filenames, command.new_filenames):
+                    store.rename(fname, new_fname)
+                    rename_shards(store, fname, new_fname)
+                    for files in (created_files, downloaded_files, uploaded_files):
+                        if fname in files:
+                            files.discard(fname)
+                            files.add(new_fname)
+                    if os.path.exists(fname):
+                        os.renames(fname, new_fname)
+                print(f"\n[Node {node_id}] Renamed {len(command.filenames)} files on request of the controller")
+
         def heartbeat_loop():
+            # One long-lived HeartbeatStream carries the stats up and commands
+            # down; while the controller refuses or drops it, send unary
+            # heartbeats and retry the stream every interval
             while not stop_flag.is_set():
-                hb = stub.Heartbeat(storage_pb2.NodeInfo(id=node_id, address=host, port=port))
-                # Only print once at start
-                stop_flag.wait(5)
+                try:
+                    for command in stub.HeartbeatStream(stats_stream()):
+                        if command.action == "invalidate":
+                            locations.invalidate(command.filenames)
+                        else:
+                            threading.Thread(target=run_command, args=(command,), daemon=True).start()
+                except grpc.RpcError:
+                    try:
+                        stub.Heartbeat(storage_pb2.NodeInfo(id=node_id, address=host, port=port,
+                                                            free_disk=free_disk(store.root)))
+                    except grpc.RpcError:
+                        pass
+                # Invalidations can't reach us without the stream
+                locations.clear()
+                stop_flag.wait(heartbeat_interval)
 
         hb_thread = threading.Thread(target=heartbeat_loop, daemon=True)
         hb_thread.start()
@@ -104,17 +740,28 @@ def run_node(node_id, controller_host, controller_port, host="127.0.0.1", port=5
                 except Exception:
                     pass
                 stop_flag.set()
+                file_server.stop(0)
+                pool.close()
                 print(f"{Fore.RED}[Node {node_id}] Node is offline! ({now}){Style.RESET_ALL}")
                 break
 
             elif action == "help":
                 print(f"""
 {Fore.CYAN}create <filename>{Style.RESET_ALL}      - Create a new text file
-{Fore.CYAN}modify <filename>{Style.RESET_ALL}      - Modify an existing text file
+{Fore.CYAN}modify <filename> [src]{Style.RESET_ALL} - Modify a file (typed text, or the content of src) and sync its copies
 {Fore.CYAN}delete <filename>{Style.RESET_ALL}      - Delete a text file
-{Fore.CYAN}upload <filename>{Style.RESET_ALL}      - Upload (announce) a file to the controller
-{Fore.CYAN}download <filename>{Style.RESET_ALL}    - Download a file from another node
-{Fore.CYAN}list{Style.RESET_ALL}                   - List files on the cloud/controller
+{Fore.CYAN}upload <filename> [n]{Style.RESET_ALL}  - Upload (announce) a file, optionally with n replicas
+{Fore.CYAN}upload <filename> ec [k m]{Style.RESET_ALL} - Upload erasure-coded: k data + m parity shards on k + m nodes
+{Fore.CYAN}upload-dir <dir> [n]{Style.RESET_ALL}   - Upload every file under a local directory, announced in batches
+{Fore.CYAN}download <file> ...{Style.RESET_ALL}    - Download one or more files from other nodes
+{Fore.CYAN}status <filename>{Style.RESET_ALL}      - Show replication progress of an uploaded file
+{Fore.CYAN}list [-l] [pattern]{Style.RESET_ALL}    - List files on the cloud page by page, optionally matching a glob
+                         pattern; -l adds size, owners and upload time
+{Fore.CYAN}mkdir <dir>{Style.RESET_ALL}            - Make a directory on the cloud (filenames are paths: dir/file)
+{Fore.CYAN}lsdir [-r] [dir]{Style.RESET_ALL}       - List a directory of the cloud, -r with everything under it
+{Fore.CYAN}mv <path> <new path>{Style.RESET_ALL}   - Rename a file or move a directory with everything in it
+{Fore.CYAN}rmtree <path>{Style.RESET_ALL}          - Delete a file or a directory with everything in it from the cloud
+{Fore.CYAN}stats{Style.RESET_ALL}                  - Show chunk store dedup, transfer savings and read cache hits
 {Fore.CYAN}ls{Style.RESET_ALL}                     - List files created in this VM
 {Fore.CYAN}cat <filename>{Style.RESET_ALL}         - Show content of a local file
 {Fore.CYAN}exit{Style.RESET_ALL}                   - Exit node terminal
@@ -147,71 +794,243 @@ def run_node(node_id, controller_host, controller_port, host="127.0.0.1", port=5
 
             elif action == "modify" and len(cmd) > 1:
                 fname = cmd[1]
-                if not os.path.exists(fname):
+                if not os.path.exists(fname) and store.get_manifest(fname) is None:
                     print("File does not exist.")
+                elif len(cmd) > 2 and not os.path.exists(cmd[2]):
+                    print(f"File '{cmd[2]}' does not exist.")
                 else:
-                    content = input("Enter new text (will overwrite): ")
-                    with open(fname, "w", encoding="utf-8") as f:
-                        f.write(content)
+                    if len(cmd) > 2:
+                        # New content from another local file, e.g. a copy edited elsewhere
+                        shutil.copyfile(cmd[2], fname)
+                    else:
+                        content = input("Enter new text (will overwrite): ")
+                        with open(fname, "w", encoding="utf-8") as f:
+                            f.write(content)
                     print(f"Modified file {fname} at {now}.")
+                    # Bring the other copies in the cloud up to date with rsync-style deltas
+                    try:
+                        owners = stub.ModifyFile(storage_pb2.FileAnnouncement(id=node_id, address=host, port=port,
+                                                                              filename=fname,
+                                                                              size=os.path.getsize(fname))).nodes
+                    except grpc.RpcError as e:
+                        if e.code() != grpc.StatusCode.NOT_FOUND:
+                            print(f"Could not report the change to the controller: {e.details()}")
+                        owners = None
+                    if owners is not None or store.get_manifest(fname) is not None:
+                        store.ingest(fname, fname)
+                    for target in owners or []:
+                        try:
+                            push_resp, sent = push_delta(fname, fname, target, transfers, compression)
+                            print(f"Delta sent to {target.id} ({sent} bytes of changes): {push_resp.message}")
+                        except grpc.RpcError as e:
+                            # No usable old copy there: fall back to a chunk push
+                            try:
+                                push_resp, sent = push_replica(store, fname, target, transfers, compression)
+                                print(f"Delta to {target.id} failed ({e.details()}); pushed {sent} bytes of "
+                                      f"chunks instead: {push_resp.message}")
+                            except grpc.RpcError as e:
+                                print(f"Updating {target.id} failed: {e.details()}")
 
             elif action == "delete" and len(cmd) > 1:
                 fname = cmd[1]
-                if not os.path.exists(fname):
+                stored = store.remove(fname)  # stop serving it; also drops it from the read cache
+                stored = remove_shards(store, fname) > 0 or stored
+                if not os.path.exists(fname) and not stored:
                     print("File does not exist.")
                 else:
-                    os.remove(fname)
+                    if os.path.exists(fname):
+                        os.remove(fname)
                     created_files.discard(fname)
                     print(f"Deleted file {fname} at {now}.")
 
+            elif action == "upload" and len(cmd) > 2 and cmd[2] == "ec":
+                # Erasure-coded: k data + m parity shards on k + m nodes
+                fname = cmd[1]
+                k = int(cmd[3]) if len(cmd) > 3 and cmd[3].isdigit() else erasure.DEFAULT_DATA_SHARDS
+                m = int(cmd[4]) if len(cmd) > 4 and cmd[4].isdigit() else erasure.DEFAULT_PARITY_SHARDS
+                if os.path.exists(fname):
+                    print(f"{Fore.YELLOW}Uploading {fname} as {k}+{m} shards...{Style.RESET_ALL}", end=" ")
+                    start_time = time.time()
+                    try:
+                        layout = stub.PlaceShards(storage_pb2.ShardLayout(id=node_id, filename=fname, k=k, m=m,
+                                                                          size=os.path.getsize(fname)))
+                        stored = push_shards(store, fname, layout, transfers, compression, node_id)
+                        layout.id = node_id
+                        del layout.shards[:]
+                        layout.shards.extend(stored)
+                        resp = stub.CommitShards(layout)
+                        uploaded_files.add(fname)
+                        print(f"Done in {time.time() - start_time:.2f} seconds at {now}.")
+                        print(resp.message)
+                        for placed in stored:
+                            print(f"  shard {placed.index} on {placed.node.id}")
+                    except grpc.RpcError as e:
+                        print("Upload failed:", e.details())
+                else:
+                    print("File not found locally")
+
             elif action == "upload" and len(cmd) > 1:
                 fname = cmd[1]
+                # Optional replica count; 0 lets the controller use its default
+                replicas = int(cmd[2]) if len(cmd) > 2 and cmd[2].isdigit() else 0
                 if os.path.exists(fname):
                     print(f"{Fore.YELLOW}Uploading {fname}...{Style.RESET_ALL}", end=" ")
                     start_time = time.time()
+                    # Chunk the file into the store first; peers are served from there
+                    store.ingest(fname, fname)
                     resp = stub.AnnounceFile(
-                        storage_pb2.FileAnnouncement(id=node_id, address=host, port=port, filename=fname)
+                        storage_pb2.FileAnnouncement(id=node_id, address=host, port=port, filename=fname,
+                                                     replication_factor=replicas, size=os.path.getsize(fname))
                     )
                     elapsed = time.time() - start_time
                     uploaded_files.add(fname)
                     print(f"Done in {elapsed:.2f} seconds at {now}.")
                     print(resp.message)
+                    # Stream the content to every replica target chosen by the controller
+                    targets = stub.GetReplicaTargets(storage_pb2.FileName(filename=fname))
+                    for target in targets.nodes:
+                        try:
+                            push_resp, _ = push_replica(store, fname, target, transfers, compression)
+                            print(f"Replica pushed to {target.id}: {push_resp.message}")
+                        except grpc.RpcError as e:
+                            print(f"Replica push to {target.id} failed: {e.details()}")
                 else:
                     print("File not found locally")
 
+            elif action == "upload-dir" and len(cmd) > 1:
+                path = os.path.normpath(cmd[1])
+                replicas = int(cmd[2]) if len(cmd) > 2 and cmd[2].isdigit() else 0
+                if os.path.isdir(path):
+                    print(f"{Fore.YELLOW}Uploading {path}...{Style.RESET_ALL}")
+                    start_time = time.time()
+                    try:
+                        announced, refused, pushed, failed = upload_dir(stub, store, path, (node_id, host, port),
+                                                                        replicas, transfers, compression)
+                        uploaded_files.update(announced)
+                        print(f"Uploaded {len(announced)} files in {time.time() - start_time:.2f} seconds at {now}; "
+                              f"{pushed} replicas pushed, {failed} pushes failed.")
+                        for fname, reason in refused[:10]:
+                            print(f"Not uploaded: {fname} ({reason})")
+                        if len(refused) > 10:
+                            print(f"... and {len(refused) - 10} more not uploaded")
+                    except grpc.RpcError as e:
+                        print(f"Upload of {path} failed: {e.details()}")
+                else:
+                    print("Directory not found locally")
+
             elif action == "download" and len(cmd) > 1:
+                # Locations of all the files come from the cache or one batched lookup
+                try:
+                    found = locations.locate(cmd[1:])
+                except grpc.RpcError as e:
+                    print(f"Could not look up {', '.join(cmd[1:])}: {e.details()}")
+                else:
+                    for fname in cmd[1:]:
+                        print(f"{Fore.YELLOW}Downloading {fname}...{Style.RESET_ALL}", end=" ")
+                        start_time = time.time()
+                        nodes = found.get(fname)
+                        for attempt in range(2):
+                            if not nodes:
+                                print("No node has this file.")
+                                break
+                            try:
+                                if any(n.shards for n in nodes):
+                                    # Erasure-coded: any k shards rebuild the file
+                                    layout = stub.GetShardLayout(storage_pb2.FileName(filename=fname))
+                                    downloader = ShardDownloader(layout, store=store)
+                                else:
+                                    # Fetch from the least loaded locations, failing over to the others
+                                    downloader = SwarmDownloader(nodes, store=store, codecs=codecs)
+                                size = downloader.download(fname, fname)
+                                elapsed = time.time() - start_time
+                                created_files.add(fname)
+                                print(f"Done in {elapsed:.2f} seconds at {now}.")
+                                print(f"Downloaded {fname} ({size} bytes, "
+                                      f"{downloader.bytes_saved} already stored locally)")
+                                for pid, nbytes in downloader.bytes_per_peer.items():
+                                    print(f"  {pid}: {downloader.ranges_per_peer[pid]} ranges, {nbytes} bytes")
+                                break
+                            except (grpc.RpcError, SwarmDownloadError) as e:
+                                if attempt == 0:
+                                    # The cached owners may be stale: ask the controller again
+                                    locations.invalidate([fname])
+                                    try:
+                                        nodes = locations.locate([fname]).get(fname)
+                                        continue
+                                    except grpc.RpcError as lookup_error:
+                                        e = lookup_error
+                                elapsed = time.time() - start_time
+                                print(f"Failed in {elapsed:.2f} seconds.")
+                                print("Download failed:", e.details() if isinstance(e, grpc.RpcError) else e)
+                            except OSError as e:
+                                # Writing the local copy failed; other owners wouldn't help
+                                print(f"Failed in {time.time() - start_time:.2f} seconds.")
+                                print(f"Download failed: can't write {fname}: {e.strerror or e}")
+                                break
+
+            elif action == "status" and len(cmd) > 1:
                 fname = cmd[1]
-                print(f"{Fore.YELLOW}Downloading {fname}...{Style.RESET_ALL}", end=" ")
-                start_time = time.time()
-                locs = stub.GetFileLocations(storage_pb2.FileName(filename=fname))
-                if not locs.nodes:
-                    print("No node has this file.")
+                st = stub.GetReplicationStatus(storage_pb2.FileName(filename=fname))
+                if not st.targets:
+                    print(f"No replication in progress for {fname}.")
                 else:
-                    node = random.choice(locs.nodes)
-                    peer_channel = grpc.insecure_channel(f"{node.address}:{node.port}")
-                    peer_stub = storage_pb2_grpc.NodeFileServiceStub(peer_channel)
-                    try:
-                        file_content = peer_stub.DownloadFile(storage_pb2.FileDownloadRequest(filename=fname))
-                        elapsed = time.time() - start_time
-                        if file_content.filename:
-                            local_name = file_content.filename
-                            with open(local_name, "wb") as f:
-                                f.write(file_content.content)
-                            created_files.add(local_name)
-                            print(f"Done in {elapsed:.2f} seconds at {now}.")
-                            print(f"Downloaded {fname}")
-                        else:
-                            print(f"Failed in {elapsed:.2f} seconds.")
-                            print("File not found on peer node.")
-                    except grpc.RpcError as e:
-                        elapsed = time.time() - start_time
-                        print(f"Failed in {elapsed:.2f} seconds.")
-                        print("Download failed:", e.details())
+                    print(f"{fname}: {st.replicas}/{st.targets} replicas stored, "
+                          f"{st.notified} notified, {st.pending} pending, {st.failed} failed")
 
             elif action == "list":
-                # List files on the cloud/controller
-                file_list = stub.ListFiles(storage_pb2.NodeInfo(id=node_id, address=host, port=port))
-                print("Files on cloud:", ", ".join(file_list.filenames) if file_list.filenames else "None")
+                # List files on the cloud/controller, one page at a time
+                detailed = "-l" in cmd[1:]
+                patterns = [arg for arg in cmd[1:] if arg != "-l"]
+                try:
+                    if not list_files(stub, patterns[0] if patterns else "", detailed):
+                        print("Files on cloud: None")
+                except grpc.RpcError as e:
+                    print(f"Could not list files: {e.details()}")
+
+            elif action == "mkdir" and len(cmd) > 1:
+                try:
+                    print(stub.MakeDirectory(storage_pb2.PathRequest(path=cmd[1])).message)
+                except grpc.RpcError as e:
+                    print(f"Could not make {cmd[1]}: {e.details()}")
+
+            elif action == "lsdir":
+                recursive = "-r" in cmd[1:]
+                paths = [arg for arg in cmd[1:] if arg != "-r"]
+                try:
+                    if not list_directory(stub, paths[0] if paths else "", recursive):
+                        print("Empty directory")
+                except grpc.RpcError as e:
+                    print(f"Could not list directory: {e.details()}")
+
+            elif action == "mv" and len(cmd) > 2:
+                try:
+                    print(stub.RenamePath(storage_pb2.RenameRequest(path=cmd[1], new_path=cmd[2])).message)
+                except grpc.RpcError as e:
+                    print(f"Could not move {cmd[1]}: {e.details()}")
+
+            elif action == "rmtree" and len(cmd) > 1:
+                try:
+                    print(stub.DeletePath(storage_pb2.PathRequest(path=cmd[1])).message)
+                except grpc.RpcError as e:
+                    print(f"Could not delete {cmd[1]}: {e.details()}")
+
+            elif action == "stats":
+                st = store.stats()
+                print(f"Chunk store: {st['files']} files, {st['logical']} bytes in {st['chunks']} chunks, "
+                      f"{st['stored']} bytes on disk (dedup ratio {st['dedup_ratio']:.2f})")
+                print(f"Transfers: {transfers.total_bytes} bytes moved, {transfers.saved_bytes} bytes skipped "
+                      f"(already on the receiver), {transfers.compressed_bytes} bytes saved by compression "
+                      f"(codecs: {', '.join(codecs) or 'none'})")
+                print(f"Location cache: {locations.hits} hits / {locations.misses} misses")
+                for pid, (latency, failures) in sorted(selector.stats().items()):
+                    latency = f"{latency * 1000:.1f} ms" if latency is not None else "not measured"
+                    print(f"Peer {pid}: latency {latency}, {failures} recent failures")
+                if cache is not None:
+                    cs = cache.stats()
+                    lookups = cs['hits'] + cs['misses']
+                    print(f"Read cache: {cs['bytes']}/{cs['capacity']} bytes in {cs['entries']} responses, "
+                          f"{cs['hits']} hits / {cs['misses']} misses "
+                          f"({cs['hits'] / lookups if lookups else 0:.0%}), {cs['evictions']} evicted")
 
             else:
                 print("Unknown command. Type 'help' for available commands.")
@@ -222,3 +1041,4 @@ def run_node(node_id, controller_host, controller_port, host="127.0.0.1", port=5
         print(f"\n[Node {node_id}] Shutting down...")
         print(f"{Fore.RED}[Node {node_id}] Node is offline!{Style.RESET_ALL}")
         file_server.stop(0)
+        pool.close()
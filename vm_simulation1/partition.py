@@ -0,0 +1,291 @@
+# Hash partitioning of the controller's metadata over several processes.
+#
+# With --partitions N the controller runs as N processes on consecutive
+# ports. A file's records live only in partition hash(filename) % N, so
+# announcing, locating and deleting files spreads over N cores.
+#
+# Nodes are known to every partition, so each can place replicas and drop a
+# node's copies of its own files, but partition 0 alone owns liveness: nodes
+# register and heartbeat with it only, and only it expires nodes. It passes
+# registrations (before answering, so the node's streams to the others find
+# it) and nodes going offline on to the other partitions with their own
+# RegisterNode and SetOffline calls, and every NODE_SYNC_INTERVAL pushes its
+# whole node table, online state and load figures, with one SyncNodes call per
+# partition (NodeSync). Heartbeats therefore cost one RPC whatever N is, and
+# the other partitions see load figures and revived nodes up to a second late.
+# A node still opens a HeartbeatStream to every partition to receive its
+# commands, but sends its stats up partition 0's only.
+#
+# Each partition only sees its own files' names, so a file a and a file a/b
+# on different partitions are both accepted. Filenames are therefore flat
+# keys here: the directory calls (MakeDirectory, ListDirectory, RenamePath,
+# DeletePath on a directory) need an unpartitioned controller.
+#
+# Nodes ask the controller they were pointed at for the PartitionTable and
+# talk to the partitions through PartitionedStub, a drop-in for the
+# StorageControllerStub that routes each call.
+
+import hashlib
+import heapq
+import queue
+import threading
+import time
+from concurrent import futures
+
+import grpc
+
+from channel_pool import pool
+from metadata_store import LIST_PAGE_SIZE, MAX_PAGE_SIZE
+from proto import storage_pb2
+from raft import GroupStub
+
+
+# Calls that concern one file go to its partition (request.filename)
+BY_FILENAME = {"AnnounceFile", "GetFileLocations", "GetReplicaTargets", "GetReplicationStatus", "CreateFile",
+               "DeleteFile", "ModifyFile", "PlaceShards", "CommitShards", "GetShardLayout"}
+# Calls about the node itself go to partition 0, which owns liveness
+LIVENESS = {"RegisterNode", "Heartbeat", "SetOffline"}
+
+NODE_SYNC_INTERVAL = 1.0  # seconds between partition 0's node table pushes
+SYNC_TIMEOUT = 5.0        # per forwarded call
+
+
+def partition_of(fname, count):
+    # Stable across processes and runs, unlike hash()
+    return int.from_bytes(hashlib.md5(fname.encode("utf-8")).digest()[:8], "big") % count
+
+
+def connect(host, port):
+    # Stub for the controller at host:port: a GroupStub if it is a member of
+    # a replicated group, a PartitionedStub if it is one of several
+    # partitions, else the plain stub
+    stub = pool.controller_stub(host, port)
+    try:
+        group = stub.GetGroup(storage_pb2.NodeInfo(), timeout=5)
+        if len(group.members) > 1:
+            return GroupStub([(c.address, c.port) for c in group.members], group.leader)
+        table = stub.GetPartitions(storage_pb2.NodeInfo(), timeout=5)
+    except grpc.RpcError:
+        return stub  # not up yet or an older controller; the first real call reports it
+    if len(table.controllers) <= 1:
+        return stub
+    return PartitionedStub([pool.controller_stub(c.address, c.port) for c in table.controllers])
+
+
+class PartitionedStub:
+    def __init__(self, stubs):
+        self.stubs = stubs
+        self._executor = futures.ThreadPoolExecutor(max_workers=len(stubs))
+
+    def for_file(self, fname):
+        return self.stubs[partition_of(fname, len(self.stubs))]
+
+    def __getattr__(self, name):
+        if name in BY_FILENAME:
+            return lambda request, **kwargs: getattr(self.for_file(request.filename), name)(request, **kwargs)
+        if name in LIVENESS:
+            return getattr(self.stubs[0], name)
+        raise AttributeError(name)
+
+    def _all(self, fn):
+        # fn(stub) on every partition at once, results in partition order
+        return [f.result() for f in [self._executor.submit(fn, stub) for stub in self.stubs]]
+
+    def GetFileLocationsBatch(self, request, **kwargs):
+        # One batch per partition that owns some of the names, answers put
+        # back in request order
+        groups = {}
+        for fname in request.filenames:
+            groups.setdefault(partition_of(fname, len(self.stubs)), []).append(fname)
+        calls = [self._executor.submit(self.stubs[p].GetFileLocationsBatch,
+                                       storage_pb2.FileNameBatch(id=request.id, filenames=names), **kwargs)
+                 for p, names in groups.items()]
+        found = {}
+        for call in calls:
+            for entry in call.result().files:
+                found[entry.filename] = entry
+        return storage_pb2.FileLocationsBatch(files=[found[fname] for fname in request.filenames if fname in found])
+
+    def ListFiles(self, request, **kwargs):
+        lists = self._all(lambda stub: stub.ListFiles(request, **kwargs))
+        return storage_pb2.FileList(filenames=[fname for part in lists for fname in part.filenames])
+
+    def ListFilesPage(self, request, **kwargs):
+        # Page tokens are filenames, so every partition can continue after the
+        # same one. A partition whose page ended early has only been read up
+        # to its token; names past the smallest such token wait for the next page.
+        pages = self._all(lambda stub: stub.ListFilesPage(request, **kwargs))
+        unfinished = [page.next_page_token for page in pages if page.next_page_token]
+        bound = min(unfinished) if unfinished else None
+        names = [fname for fname in heapq.merge(*(page.filenames for page in pages)) if bound is None or fname <= bound]
+        limit = min(request.page_size or LIST_PAGE_SIZE, MAX_PAGE_SIZE)
+        if len(names) > limit:
+            del names[limit:]
+            bound = names[-1]
+        return storage_pb2.FileList(filenames=names, next_page_token=bound or "")
+
+    def ListFilesStream(self, request, **kwargs):
+        # The partitions' streams merged by filename and re-batched
+        calls = [stub.ListFilesStream(request, **kwargs) for stub in self.stubs]
+        files = heapq.merge(*((summary for batch in call for summary in batch.files) for call in calls),
+                            key=lambda summary: summary.filename)
+        limit = min(request.page_size or LIST_PAGE_SIZE, MAX_PAGE_SIZE)
+        batch = []
+        try:
+            for summary in files:
+                batch.append(summary)
+                if len(batch) == limit:
+                    yield storage_pb2.FileSummaryBatch(files=batch, next_page_token=summary.filename)
+                    batch = []
+            yield storage_pb2.FileSummaryBatch(files=batch)
+        finally:
+            for call in calls:
+                call.cancel()
+
+    def MakeDirectory(self, request, **kwargs):
+        # The directory calls are refused by a partitioned controller (a file
+        # and a directory of the same name can be on different partitions);
+        # the first partition says why
+        return self.stubs[0].MakeDirectory(request, **kwargs)
+
+    def ListDirectory(self, request, **kwargs):
+        return self.stubs[0].ListDirectory(request, **kwargs)
+
+    def RenamePath(self, request, **kwargs):
+        return self.stubs[0].RenamePath(request, **kwargs)
+
+    def DeletePath(self, request, **kwargs):
+        # Deletes a file on its partition; a directory is refused there
+        return self.for_file(request.path.rstrip("/")).DeletePath(request, **kwargs)
+
+    def AnnounceFiles(self, request_iterator, **kwargs):
+        # One stream per partition: each batch is split by partition and the
+        # results put back in the batch's order
+        inboxes = [queue.Queue() for _ in self.stubs]
+        calls = [stub.AnnounceFiles(iter(inbox.get, None), **kwargs) for stub, inbox in zip(self.stubs, inboxes)]
+        try:
+            for batch in request_iterator:
+                parts = {}
+                for announcement in batch.files:
+                    parts.setdefault(partition_of(announcement.filename, len(self.stubs)), []).append(announcement)
+                for p, files in parts.items():
+                    inboxes[p].put(storage_pb2.FileAnnouncementBatch(files=files))
+                results = {p: iter(next(calls[p]).results) for p in parts}
+                yield storage_pb2.AnnounceResultBatch(results=[
+                    next(results[partition_of(announcement.filename, len(self.stubs))])
+                    for announcement in batch.files])
+        finally:
+            for inbox in inboxes:
+                inbox.put(None)
+            for call in calls:
+                call.cancel()
+
+    def GetPartitions(self, request, **kwargs):
+        return self.stubs[0].GetPartitions(request, **kwargs)
+
+    def HeartbeatStream(self, request_iterator, **kwargs):
+        return MergedStream(self.stubs, request_iterator, **kwargs)
+
+
+class MergedStream:
+    # One HeartbeatStream per partition behind a single iterator: the first
+    # NodeStats, which names the node, goes up all of them and the rest up
+    # partition 0's only; the NodeCommands of all of them come out here. When
+    # any of them ends or fails all are cancelled, so the node reconnects them
+    # together.
+    _END = object()
+
+    def __init__(self, stubs, request_iterator, **kwargs):
+        self._inboxes = [queue.Queue() for _ in stubs]
+        self._outbox = queue.Queue()
+        self._done = threading.Event()
+        self._calls = [stub.HeartbeatStream(iter(inbox.get, None), **kwargs)
+                       for stub, inbox in zip(stubs, self._inboxes)]
+        threading.Thread(target=self._send, args=(request_iterator,), daemon=True).start()
+        for call in self._calls:
+            threading.Thread(target=self._receive, args=(call,), daemon=True).start()
+
+    def _send(self, request_iterator):
+        inboxes = self._inboxes
+        for request in request_iterator:
+            if self._done.is_set():
+                break
+            for inbox in inboxes:
+                inbox.put(request)
+            inboxes = self._inboxes[:1]
+        for inbox in self._inboxes:
+            inbox.put(None)
+
+    def _receive(self, call):
+        try:
+            for command in call:
+                self._outbox.put(command)
+            self._outbox.put(self._END)
+        except grpc.RpcError as e:
+            self._outbox.put(e)
+
+    def cancel(self):
+        self._done.set()
+        for call in self._calls:
+            call.cancel()
+        for inbox in self._inboxes:
+            inbox.put(None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._outbox.get()
+        if item is self._END or isinstance(item, grpc.RpcError):
+            self.cancel()
+            if item is self._END:
+                raise StopIteration
+            raise item
+        return item
+
+
+class NodeSync:
+    # Partition 0's side of the liveness ownership (see the top of the file).
+    # Each other partition gets its calls from one worker, in the order they
+    # were made, so a node table taken before a node went offline can't land
+    # after the SetOffline and bring the node back.
+    def __init__(self, partitions, node_table):
+        self.node_table = node_table  # callable returning the NodeTable to push
+        self._targets = [(i, pool.controller_stub(host, port), futures.ThreadPoolExecutor(max_workers=1))
+                         for i, (host, port) in enumerate(partitions) if i]
+        self._order = threading.Lock()
+        self._tables = {}      # partition -> its last node table push, skipped while one is pending
+        self._failing = set()  # partitions whose last call failed, reported once
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(NODE_SYNC_INTERVAL)
+            with self._order:
+                table = self.node_table()
+                for i, stub, worker in self._targets:
+                    if i not in self._tables or self._tables[i].done():
+                        self._tables[i] = worker.submit(self._call, i, stub, "SyncNodes", table)
+
+    def forward(self, name, request, wait=False):
+        # name(request) on every other partition; wait=True returns once all
+        # have answered or failed. A partition that misses it catches up from
+        # the next node table.
+        with self._order:
+            calls = [worker.submit(self._call, i, stub, name, request) for i, stub, worker in self._targets]
+        if wait:
+            futures.wait(calls)
+
+    def _call(self, i, stub, name, request):
+        try:
+            getattr(stub, name)(request, timeout=SYNC_TIMEOUT)
+        except grpc.RpcError as e:
+            if i not in self._failing:
+                self._failing.add(i)
+                print(f"[Controller] Partition {i} unreachable ({e.code().name}), its node table is behind")
+            return
+        if i in self._failing:
+            self._failing.discard(i)
+            print(f"[Controller] Partition {i} reachable again")
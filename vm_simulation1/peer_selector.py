@@ -0,0 +1,95 @@
+# Choosing which copies of a file to download from.
+#
+# Two sources of information are combined. The controller sends each owner's
+# transfers in flight with GetFileLocations (from its heartbeats). The node
+# adds what it has seen itself: an EWMA of each peer's response time, the
+# requests it has in flight to the peer and its recent failures.
+#
+# Peers are ranked with power-of-two-choices: each place goes to the cheaper
+# of two randomly sampled remaining peers. Compared with always taking the
+# single best peer, this stops every node from piling onto the same one, and
+# an overloaded peer still almost never comes first. Peers that failed
+# recently are left out of the sampling and ranked last, so a dead peer can't
+# hand a pair to the overloaded one. The ranking is also the failover order.
+
+import random
+import threading
+import time
+
+
+EWMA_ALPHA = 0.3          # weight of the newest latency sample
+DEFAULT_LATENCY = 0.005   # seconds assumed when no peer has been measured yet
+FAILURE_PENALTY = 10      # cost multiplier per recent failure
+FAILURE_MEMORY = 30       # seconds after the last failure before a peer is forgiven
+
+
+class PeerSelector:
+    def __init__(self, alpha=EWMA_ALPHA, rng=None):
+        self.alpha = alpha
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._latency = {}   # peer id -> EWMA of response time, seconds
+        self._inflight = {}  # peer id -> requests this node has in flight to it
+        self._failures = {}  # peer id -> (consecutive failures, monotonic time of the last)
+
+    def failures(self, peer):
+        # Consecutive failures of peer, 0 once FAILURE_MEMORY has passed
+        with self._lock:
+            failures, last = self._failures.get(peer.id, (0, 0))
+        return failures if time.monotonic() - last <= FAILURE_MEMORY else 0
+
+    def cost(self, peer):
+        # Expected wait at this peer; lower is better. Peers never measured
+        # are assumed to be average, so they get tried.
+        with self._lock:
+            known = self._latency.values()
+            default = sum(known) / len(known) if known else DEFAULT_LATENCY
+            latency = self._latency.get(peer.id, default)
+            load = peer.active_transfers + self._inflight.get(peer.id, 0)
+        return latency * (1 + load) * FAILURE_PENALTY ** self.failures(peer)
+
+    def order(self, peers):
+        # peers (NodeLocation messages) best-first: healthy ones by
+        # power-of-two-choices, then the failing ones, cheapest first
+        remaining = [peer for peer in peers if not self.failures(peer)]
+        failing = sorted((peer for peer in peers if self.failures(peer)), key=self.cost)
+        costs = {peer.id: self.cost(peer) for peer in remaining}
+        ordered = []
+        while len(remaining) > 1:
+            a, b = self._rng.sample(range(len(remaining)), 2)
+            ordered.append(remaining.pop(a if costs[remaining[a].id] <= costs[remaining[b].id] else b))
+        return ordered + remaining + failing
+
+    def call(self, peer, fn, timed=True):
+        # Run fn() against peer, counting it in flight. Failures (exceptions)
+        # are remembered; timed=False for calls whose duration depends on how
+        # much they transfer rather than on the peer
+        with self._lock:
+            self._inflight[peer.id] = self._inflight.get(peer.id, 0) + 1
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception:
+            with self._lock:
+                failures, _ = self._failures.get(peer.id, (0, 0))
+                self._failures[peer.id] = (failures + 1, time.monotonic())
+            raise
+        finally:
+            with self._lock:
+                self._inflight[peer.id] -= 1
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._failures.pop(peer.id, None)
+            if timed:
+                old = self._latency.get(peer.id)
+                self._latency[peer.id] = elapsed if old is None else old + self.alpha * (elapsed - old)
+        return result
+
+    def stats(self):
+        # {peer id: (EWMA latency in seconds or None, consecutive failures)}
+        with self._lock:
+            ids = set(self._latency) | set(self._failures)
+            return {pid: (self._latency.get(pid), self._failures.get(pid, (0, 0))[0]) for pid in ids}
+
+
+selector = PeerSelector()  # shared by every download of this process
@@ -0,0 +1,102 @@
+# Replica placement policies for the controller.
+#
+# A policy picks which nodes receive the replicas of a newly announced file.
+# Nodes are (id, address, port) tuples of the online nodes; ids in `exclude`
+# (the uploader) are never picked. Every policy returns at most `count` nodes.
+
+import bisect
+import hashlib
+
+
+DEFAULT_REPLICATION_FACTOR = 2  # replicas pushed in addition to the uploader's copy
+VIRTUAL_NODES = 64              # ring points per node, evens out the hash ring
+BUSY_TRANSFERS = 4              # nodes with this many transfers in flight are picked last
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ConsistentHashPlacement:
+    # Walks a hash ring clockwise from the filename's position. Adding or
+    # removing a node only moves the files whose ring segment it owned.
+    name = "hash"
+
+    def __init__(self, virtual_nodes=VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self._ring = (frozenset(), [], [])  # (node ids, sorted hashes, node id at each hash)
+
+    def choose(self, fname, nodes, count, exclude=(), stats=None):
+        by_id = {n[0]: n for n in nodes}
+        _, points, owners = self._ring_for(by_id)
+        chosen = []
+        if not points or count <= 0:
+            return chosen
+        start = bisect.bisect(points, _hash(fname))
+        for i in range(len(points)):
+            nid = owners[(start + i) % len(points)]
+            if nid not in chosen and nid not in exclude:
+                chosen.append(nid)
+                if len(chosen) == count:
+                    break
+        return [by_id[nid] for nid in chosen]
+
+    def _ring_for(self, by_id):
+        # The ring only changes when the set of candidates does. It is swapped
+        # in as one tuple so concurrent handlers never see a half-built ring.
+        ring = self._ring
+        ids = frozenset(by_id)
+        if ids != ring[0]:
+            ring = self._rebuild(ring, ids)
+            self._ring = ring
+        return ring
+
+    def _rebuild(self, ring, ids):
+        # Nodes mostly join and leave a few at a time, so patch the previous
+        # ring (drop the points of nodes that left, bisect in the points of
+        # nodes that joined) instead of rehashing and sorting every node
+        old_ids, points, owners = ring
+        gone, joined = old_ids - ids, ids - old_ids
+        if len(joined) > 8:
+            pairs = sorted((_hash(f"{nid}#{v}"), nid) for nid in ids for v in range(self.virtual_nodes))
+            return (ids, [p for p, _ in pairs], [nid for _, nid in pairs])
+        if gone:
+            keep = [i for i, nid in enumerate(owners) if nid not in gone]
+            points, owners = [points[i] for i in keep], [owners[i] for i in keep]
+        else:
+            points, owners = list(points), list(owners)
+        for nid in joined:
+            for v in range(self.virtual_nodes):
+                p = _hash(f"{nid}#{v}")
+                i = bisect.bisect(points, p)
+                points.insert(i, p)
+                owners.insert(i, nid)
+        return (ids, points, owners)
+
+
+class LeastLoadedPlacement:
+    # Picks the nodes with the most free disk, as reported in heartbeats;
+    # nodes busy with many transfers only come after the idle ones
+    name = "least-loaded"
+
+    def choose(self, fname, nodes, count, exclude=(), stats=None):
+        stats = stats or {}
+        candidates = [n for n in nodes if n[0] not in exclude]
+
+        def load(node):
+            s = stats.get(node[0], {})
+            return s.get('active_transfers', 0) >= BUSY_TRANSFERS, -s.get('free_disk', 0)
+
+        return sorted(candidates, key=load)[:count]
+
+
+POLICIES = {
+    ConsistentHashPlacement.name: ConsistentHashPlacement,
+    LeastLoadedPlacement.name: LeastLoadedPlacement,
+}
+
+
+def make_policy(name):
+    if name not in POLICIES:
+        raise ValueError(f"Unknown placement policy '{name}' (choose from {', '.join(POLICIES)})")
+    return POLICIES[name]()
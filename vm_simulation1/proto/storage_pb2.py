@@ -24,35 +24,121 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rstorage.proto\x12\x07storage\"O\n\x10\x46ileAnnouncement\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\x12\x10\n\x08\x66ilename\x18\x04 \x01(\t\"5\n\x08NodeInfo\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\"9\n\x0cNodeLocation\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\"8\n\x10NodeLocationList\x12$\n\x05nodes\x18\x01 \x03(\x0b\x32\x15.storage.NodeLocation\"\x1b\n\x08Response\x12\x0f\n\x07message\x18\x01 \x01(\t\"0\n\x0b\x46ileRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\x0c\"\'\n\x13\x46ileDownloadRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\"0\n\x0b\x46ileContent\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\x0c\"\x1c\n\x08\x46ileName\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\"\x1d\n\x08\x46ileList\x12\x11\n\tfilenames\x18\x01 \x03(\t2\xc3\x04\n\x11StorageController\x12?\n\x0fNotifyDuplicate\x12\x19.storage.FileAnnouncement\x1a\x11.storage.Response\x12\x34\n\x0cRegisterNode\x12\x11.storage.NodeInfo\x1a\x11.storage.Response\x12\x31\n\tHeartbeat\x12\x11.storage.NodeInfo\x1a\x11.storage.Response\x12\x32\n\nSetOffline\x12\x11.storage.NodeInfo\x1a\x11.storage.Response\x12<\n\x0c\x41nnounceFile\x12\x19.storage.FileAnnouncement\x1a\x11.storage.Response\x12@\n\x10GetFileLocations\x12\x11.storage.FileName\x1a\x19.storage.NodeLocationList\x12\x32\n\nCreateFile\x12\x11.storage.FileName\x1a\x11.storage.Response\x12\x32\n\nDeleteFile\x12\x11.storage.FileName\x1a\x11.storage.Response\x12\x35\n\nModifyFile\x12\x14.storage.FileRequest\x1a\x11.storage.Response\x12\x31\n\tListFiles\x12\x11.storage.NodeInfo\x1a\x11.storage.FileList2\x96\x01\n\x0fNodeFileService\x12\x42\n\x0c\x44ownloadFile\x12\x1c.storage.FileDownloadRequest\x1a\x14.storage.FileContent\x12?\n\x0fNotifyDuplicate\x12\x19.storage.FileAnnouncement\x1a\x11.storage.Responseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rstorage.proto\x12\x07storage\"\x8a\x01\n\x10\x46ileAnnouncement\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\x12\x10\n\x08\x66ilename\x18\x04 \x01(\t\x12\x0f\n\x07replica\x18\x05 \x01(\x08\x12\x1a\n\x12replication_factor\x18\x06 \x01(\x05\x12\x0c\n\x04size\x18\x07 \x01(\x03\"X\n\x08NodeInfo\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\x12\x11\n\tfree_disk\x18\x04 \x01(\x03\x12\x0e\n\x06\x63odecs\x18\x05 \x03(\t\"s\n\x0cNodeLocation\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0f\n\x07\x61\x64\x64ress\x18\x02 \x01(\t\x12\x0c\n\x04port\x18\x03 \x01(\x05\x12\x18\n\x10\x61\x63tive_transfers\x18\x04 \x01(\x05\x12\x0e\n\x06\x63odecs\x18\x05 \x03(\t\x12\x0e\n\x06shards\x18\x06 \x03(\x05\"8\n\x10NodeLocationList\x12$\n\x05nodes\x18\x01 \x03(\x0b\x32\x15.storage.NodeLocation\"A\n\x15\x46ileAnnouncementBatch\x12(\n\x05\x66iles\x18\x01 \x03(\x0b\x32\x19.storage.FileAnnouncement\"g\n\x0e\x41nnounceResult\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\n\n\x02ok\x18\x02 \x01(\x08\x12\x0f\n\x07message\x18\x03 \x01(\t\x12&\n\x07targets\x18\x04 \x03(\x0b\x32\x15.storage.NodeLocation\"?\n\x13\x41nnounceResultBatch\x12(\n\x07results\x18\x01 \x03(\x0b\x32\x17.storage.AnnounceResult\"\x1b\n\x08Response\x12\x0f\n\x07message\x18\x01 \x01(\t\"0\n\x0b\x46ileRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\x0c\"\'\n\x13\x46ileDownloadRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\"0\n\x0b\x46ileContent\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\x0c\"(\n\x08\x46ileName\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\n\n\x02id\x18\x02 \x01(\t\".\n\rFileNameBatch\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\tfilenames\x18\x02 \x03(\t\"G\n\rFileLocations\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12$\n\x05nodes\x18\x02 \x03(\x0b\x32\x15.storage.NodeLocation\";\n\x12\x46ileLocationsBatch\x12%\n\x05\x66iles\x18\x01 \x03(\x0b\x32\x16.storage.FileLocations\"6\n\x08\x46ileList\x12\x11\n\tfilenames\x18\x01 \x03(\t\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\"U\n\x0bListRequest\x12\x0e\n\x06prefix\x18\x01 \x01(\t\x12\x0f\n\x07pattern\x18\x02 \x01(\t\x12\x12\n\npage_token\x18\x03 \x01(\t\x12\x11\n\tpage_size\x18\x04 \x01(\x05\"R\n\x0b\x46ileSummary\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\x13\n\x0bupload_time\x18\x03 \x01(\t\x12\x0e\n\x06owners\x18\x04 \x03(\t\"P\n\x10\x46ileSummaryBatch\x12#\n\x05\x66iles\x18\x01 \x03(\x0b\x32\x14.storage.FileSummary\x12\x17\n\x0fnext_page_token\x18\x02 \x01(\t\".\n\x0bPathRequest\x12\x0c\n\x04path\x18\x01 \x01(\t\x12\x11\n\trecursive\x18\x02 \x01(\x08\"/\n\rRenameRequest\x12\x0c\n\x04path\x18\x01 \x01(\t\x12\x10\n\x08new_path\x18\x02 \x01(\t\"(\n\x08\x44irEntry\x12\x0c\n\x04path\x18\x01 \x01(\t\x12\x0e\n\x06is_dir\x18\x02 \x01(\x08\"0\n\nDirListing\x12\"\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x11.storage.DirEntry\"2\n\x11\x43ontrollerAddress\x12\x0f\n\x07\x61\x64\x64ress\x18\x01 \x01(\t\x12\x0c\n\x04port\x18\x02 \x01(\x05\"A\n\x0ePartitionTable\x12/\n\x0b\x63ontrollers\x18\x01 \x03(\x0b\x32\x1a.storage.ControllerAddress\"b\n\tNodeTable\x12!\n\x06online\x18\x01 \x03(\x0b\x32\x11.storage.NodeInfo\x12!\n\x05stats\x18\x02 \x03(\x0b\x32\x12.storage.NodeStats\x12\x0f\n\x07offline\x18\x03 \x03(\t\"N\n\x0f\x43ontrollerGroup\x12+\n\x07members\x18\x01 \x03(\x0b\x32\x1a.storage.ControllerAddress\x12\x0e\n\x06leader\x18\x02 \x01(\x05\"U\n\x0bVoteRequest\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x11\n\tcandidate\x18\x02 \x01(\x05\x12\x12\n\nlast_index\x18\x03 \x01(\x03\x12\x11\n\tlast_term\x18\x04 \x01(\x03\"*\n\tVoteReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0f\n\x07granted\x18\x02 \x01(\x08\"(\n\x08LogEntry\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0e\n\x06record\x18\x02 \x01(\x0c\"\xba\x01\n\rAppendRequest\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0e\n\x06leader\x18\x02 \x01(\x05\x12\x12\n\nprev_index\x18\x03 \x01(\x03\x12\x11\n\tprev_term\x18\x04 \x01(\x03\x12\"\n\x07\x65ntries\x18\x05 \x03(\x0b\x32\x11.storage.LogEntry\x12\x0e\n\x06\x63ommit\x18\x06 \x01(\x03\x12\r\n\x05lease\x18\x07 \x01(\x01\x12\x0f\n\x07install\x18\x08 \x01(\x08\x12\x10\n\x08snapshot\x18\t \x01(\x0c\"\x18\n\tWatchList\x12\x0b\n\x03ids\x18\x01 \x03(\t\"\xcf\x01\n\x0b\x41ppendReply\x12\x0c\n\x04term\x18\x01 \x01(\x03\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x12\n\nlast_index\x18\x03 \x01(\x03\x12\x15\n\rneed_snapshot\x18\x04 \x01(\x08\x12\x32\n\x07watches\x18\x05 \x03(\x0b\x32!.storage.AppendReply.WatchesEntry\x1a\x42\n\x0cWatchesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12!\n\x05value\x18\x02 \x01(\x0b\x32\x12.storage.WatchList:\x02\x38\x01\"R\n\tFileChunk\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\x0c\x12\x0e\n\x06offset\x18\x03 \x01(\x03\x12\x12\n\ntotal_size\x18\x04 \x01(\x03\"@\n\x0cRangeRequest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0e\n\x06offset\x18\x02 \x01(\x03\x12\x0e\n\x06length\x18\x03 \x01(\x03\"{\n\x11ReplicationStatus\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0f\n\x07targets\x18\x02 \x01(\x05\x12\x0f\n\x07pending\x18\x03 \x01(\x05\x12\x10\n\x08notified\x18\x04 \x01(\x05\x12\x0e\n\x06\x66\x61iled\x18\x05 \x01(\x05\x12\x10\n\x08replicas\x18\x06 \x01(\x05\"*\n\x08\x46ileStat\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\"&\n\x08\x43hunkRef\x12\x0c\n\x04hash\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\"M\n\x08Manifest\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12!\n\x06\x63hunks\x18\x03 \x03(\x0b\x32\x11.storage.ChunkRef\"4\n\x0b\x43hunkHashes\x12\x0e\n\x06hashes\x18\x01 \x03(\t\x12\x15\n\raccept_codecs\x18\x02 \x03(\t\"^\n\tChunkData\x12\x0c\n\x04hash\x18\x01 \x01(\t\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\x0c\x12#\n\x08manifest\x18\x03 \x01(\x0b\x32\x11.storage.Manifest\x12\r\n\x05\x63odec\x18\x04 \x01(\t\"C\n\rShardLocation\x12\r\n\x05index\x18\x01 \x01(\x05\x12#\n\x04node\x18\x02 \x01(\x0b\x32\x15.storage.NodeLocation\"w\n\x0bShardLayout\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\t\n\x01k\x18\x02 \x01(\x05\x12\t\n\x01m\x18\x03 \x01(\x05\x12\x0c\n\x04size\x18\x04 \x01(\x03\x12&\n\x06shards\x18\x05 \x03(\x0b\x32\x16.storage.ShardLocation\x12\n\n\x02id\x18\x06 \x01(\t\".\n\x0e\x42lockSignature\x12\x0c\n\x04weak\x18\x01 \x01(\r\x12\x0e\n\x06strong\x18\x02 \x01(\x0c\"l\n\rFileSignature\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\x12\n\nblock_size\x18\x03 \x01(\x05\x12\'\n\x06\x62locks\x18\x04 \x03(\x0b\x32\x17.storage.BlockSignature\"\x97\x01\n\tFileDelta\x12\x10\n\x08\x66ilename\x18\x01 \x01(\t\x12\x0c\n\x04size\x18\x02 \x01(\x03\x12\x0e\n\x06\x64igest\x18\x03 \x01(\t\x12\x12\n\nblock_size\x18\x04 \x01(\x05\x12\x12\n\ncopy_block\x18\x05 \x01(\x03\x12\x12\n\ncopy_count\x18\x06 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x07 \x01(\x0c\x12\r\n\x05\x63odec\x18\x08 \x01(\t\"\"\n\x11\x43\x61\x63heStatsRequest\x12\r\n\x05reset\x18\x01 \x01(\x08\"\x86\x01\n\nCacheStats\x12\x0c\n\x04hits\x18\x01 \x01(\x03\x12\x0e\n\x06misses\x18\x02 \x01(\x03\x12\x11\n\tevictions\x18\x03 \x01(\x03\x12\x15\n\rinvalidations\x18\x04 \x01(\x03\x12\x0f\n\x07\x65ntries\x18\x05 \x01(\x05\x12\r\n\x05\x62ytes\x18\x06 \x01(\x03\x12\x10\n\x08\x63\x61pacity\x18\x07 \x01(\x03\"k\n\tNodeStats\x12\n\n\x02id\x18\x01 \x01(\t\x12\x11\n\tfree_disk\x18\x02 \x01(\x03\x12\x18\n\x10\x61\x63tive_transfers\x18\x03 \x01(\x05\x12\x11\n\tbandwidth\x18\x04 \x01(\x03\x12\x12\n\nfile_count\x18\x05 \x01(\x05\"\x81\x01\n\x0bNodeCommand\x12\x0e\n\x06\x61\x63tion\x18\x01 \x01(\t\x12\x10\n\x08\x66ilename\x18\x02 \x01(\t\x12&\n\x07targets\x18\x03 \x03(\x0b\x32\x15.storage.NodeLocation\x12\x11\n\tfilenames\x18\x04 \x03(\t\x12\x15\n\rnew_filenames\x18\x05 \x03(\t2\xfd\x0c\n\x11StorageController\x12?\n\x0fNotifyDuplicate\x12\x19.storage.FileAnnouncement\x1a\x11.storage.Response\x12\x34\n\x0cRegisterNode\x12\x11.storage.NodeInfo\x1a\x11.storage.Response\x12\x31\n\tHeartbeat\x12\x11.storage.NodeInfo\x1a\x11.storage.Response\x12?\n\x0fHeartbeatStream\x12\x12.storage.NodeStats\x1a\x14.storage.NodeCommand(\x01\x30\x01\x12\x32\n\nSetOffline\x12\x11.storage.NodeInfo\x1a\x11.storage.Response\x12<\n\x0c\x41nnounceFile\x12\x19.storage.FileAnnouncement\x1a\x11.storage.Response\x12Q\n\rAnnounceFiles\x12\x1e.storage.FileAnnouncementBatch\x1a\x1c.storage.AnnounceResultBatch(\x01\x30\x01\x12@\n\x10GetFileLocations\x12\x11.storage.FileName\x1a\x19.storage.NodeLocationList\x12L\n\x15GetFileLocationsBatch\x12\x16.storage.FileNameBatch\x1a\x1b.storage.FileLocationsBatch\x12\x41\n\x11GetReplicaTargets\x12\x11.storage.FileName\x1a\x19.storage.NodeLocationList\x12\x45\n\x14GetReplicationStatus\x12\x11.storage.FileName\x1a\x1a.storage.ReplicationStatus\x12\x32\n\nCreateFile\x12\x11.storage.FileName\x1a\x11.storage.Response\x12\x32\n\nDeleteFile\x12\x11.storage.FileName\x1a\x11.storage.Response\x12\x42\n\nModifyFile\x12\x19.storage.FileAnnouncement\x1a\x19.storage.NodeLocationList\x12\x39\n\x0bPlaceShards\x12\x14.storage.ShardLayout\x1a\x14.storage.ShardLayout\x12\x37\n\x0c\x43ommitShards\x12\x14.storage.ShardLayout\x1a\x11.storage.Response\x12\x39\n\x0eGetShardLayout\x12\x11.storage.FileName\x1a\x14.storage.ShardLayout\x12\x31\n\tListFiles\x12\x11.storage.NodeInfo\x1a\x11.storage.FileList\x12\x38\n\rListFilesPage\x12\x14.storage.ListRequest\x1a\x11.storage.FileList\x12\x44\n\x0fListFilesStream\x12\x14.storage.ListRequest\x1a\x19.storage.FileSummaryBatch0\x01\x12\x38\n\rMakeDirectory\x12\x14.storage.PathRequest\x1a\x11.storage.Response\x12<\n\rListDirectory\x12\x14.storage.PathRequest\x1a\x13.storage.DirListing0\x01\x12\x37\n\nRenamePath\x12\x16.storage.RenameRequest\x1a\x11.storage.Response\x12\x35\n\nDeletePath\x12\x14.storage.PathRequest\x1a\x11.storage.Response\x12;\n\rGetPartitions\x12\x11.storage.NodeInfo\x1a\x17.storage.PartitionTable\x12\x32\n\tSyncNodes\x12\x12.storage.NodeTable\x1a\x11.storage.Response\x12\x37\n\x08GetGroup\x12\x11.storage.NodeInfo\x1a\x18.storage.ControllerGroup2\x88\x01\n\x0e\x43ontrollerRaft\x12\x37\n\x0bRequestVote\x12\x14.storage.VoteRequest\x1a\x12.storage.VoteReply\x12=\n\rAppendEntries\x12\x16.storage.AppendRequest\x1a\x14.storage.AppendReply2\xff\x06\n\x0fNodeFileService\x12\x42\n\x0c\x44ownloadFile\x12\x1c.storage.FileDownloadRequest\x1a\x14.storage.FileContent\x12H\n\x12\x44ownloadFileStream\x12\x1c.storage.FileDownloadRequest\x1a\x12.storage.FileChunk0\x01\x12?\n\x0fNotifyDuplicate\x12\x19.storage.FileAnnouncement\x1a\x11.storage.Response\x12\x45\n\x10NotifyDuplicates\x12\x1e.storage.FileAnnouncementBatch\x1a\x11.storage.Response\x12\x36\n\x0bPushReplica\x12\x12.storage.FileChunk\x1a\x11.storage.Response(\x01\x12;\n\x08StatFile\x12\x1c.storage.FileDownloadRequest\x1a\x11.storage.FileStat\x12\x38\n\tReadRange\x12\x15.storage.RangeRequest\x1a\x12.storage.FileChunk0\x01\x12>\n\x0bGetManifest\x12\x1c.storage.FileDownloadRequest\x1a\x11.storage.Manifest\x12\x38\n\rMissingChunks\x12\x11.storage.Manifest\x1a\x14.storage.ChunkHashes\x12\x37\n\tGetChunks\x12\x14.storage.ChunkHashes\x1a\x12.storage.ChunkData0\x01\x12\x35\n\nPushChunks\x12\x12.storage.ChunkData\x1a\x11.storage.Response(\x01\x12\x44\n\x0cGetSignature\x12\x1c.storage.FileDownloadRequest\x1a\x16.storage.FileSignature\x12\x35\n\nApplyDelta\x12\x12.storage.FileDelta\x1a\x11.storage.Response(\x01\x12@\n\rGetCacheStats\x12\x1a.storage.CacheStatsRequest\x1a\x13.storage.CacheStatsb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'storage_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_FILEANNOUNCEMENT']._serialized_start=26
-  _globals['_FILEANNOUNCEMENT']._serialized_end=105
-  _globals['_NODEINFO']._serialized_start=107
-  _globals['_NODEINFO']._serialized_end=160
-  _globals['_NODELOCATION']._serialized_start=162
-  _globals['_NODELOCATION']._serialized_end=219
-  _globals['_NODELOCATIONLIST']._serialized_start=221
-  _globals['_NODELOCATIONLIST']._serialized_end=277
-  _globals['_RESPONSE']._serialized_start=279
-  _globals['_RESPONSE']._serialized_end=306
-  _globals['_FILEREQUEST']._serialized_start=308
-  _globals['_FILEREQUEST']._serialized_end=356
-  _globals['_FILEDOWNLOADREQUEST']._serialized_start=358
-  _globals['_FILEDOWNLOADREQUEST']._serialized_end=397
-  _globals['_FILECONTENT']._serialized_start=399
-  _globals['_FILECONTENT']._serialized_end=447
-  _globals['_FILENAME']._serialized_start=449
-  _globals['_FILENAME']._serialized_end=477
-  _globals['_FILELIST']._serialized_start=479
-  _globals['_FILELIST']._serialized_end=508
-  _globals['_STORAGECONTROLLER']._serialized_start=511
-  _globals['_STORAGECONTROLLER']._serialized_end=1090
-  _globals['_NODEFILESERVICE']._serialized_start=1093
-  _globals['_NODEFILESERVICE']._serialized_end=1243
+  _globals['_APPENDREPLY_WATCHESENTRY']._loaded_options = None
+  _globals['_APPENDREPLY_WATCHESENTRY']._serialized_options = b'8\001'
+  _globals['_FILEANNOUNCEMENT']._serialized_start=27
+  _globals['_FILEANNOUNCEMENT']._serialized_end=165
+  _globals['_NODEINFO']._serialized_start=167
+  _globals['_NODEINFO']._serialized_end=255
+  _globals['_NODELOCATION']._serialized_start=257
+  _globals['_NODELOCATION']._serialized_end=372
+  _globals['_NODELOCATIONLIST']._serialized_start=374
+  _globals['_NODELOCATIONLIST']._serialized_end=430
+  _globals['_FILEANNOUNCEMENTBATCH']._serialized_start=432
+  _globals['_FILEANNOUNCEMENTBATCH']._serialized_end=497
+  _globals['_ANNOUNCERESULT']._serialized_start=499
+  _globals['_ANNOUNCERESULT']._serialized_end=602
+  _globals['_ANNOUNCERESULTBATCH']._serialized_start=604
+  _globals['_ANNOUNCERESULTBATCH']._serialized_end=667
+  _globals['_RESPONSE']._serialized_start=669
+  _globals['_RESPONSE']._serialized_end=696
+  _globals['_FILEREQUEST']._serialized_start=698
+  _globals['_FILEREQUEST']._serialized_end=746
+  _globals['_FILEDOWNLOADREQUEST']._serialized_start=748
+  _globals['_FILEDOWNLOADREQUEST']._serialized_end=787
+  _globals['_FILECONTENT']._serialized_start=789
+  _globals['_FILECONTENT']._serialized_end=837
+  _globals['_FILENAME']._serialized_start=839
+  _globals['_FILENAME']._serialized_end=879
+  _globals['_FILENAMEBATCH']._serialized_start=881
+  _globals['_FILENAMEBATCH']._serialized_end=927
+  _globals['_FILELOCATIONS']._serialized_start=929
+  _globals['_FILELOCATIONS']._serialized_end=1000
+  _globals['_FILELOCATIONSBATCH']._serialized_start=1002
+  _globals['_FILELOCATIONSBATCH']._serialized_end=1061
+  _globals['_FILELIST']._serialized_start=1063
+  _globals['_FILELIST']._serialized_end=1117
+  _globals['_LISTREQUEST']._serialized_start=1119
+  _globals['_LISTREQUEST']._serialized_end=1204
+  _globals['_FILESUMMARY']._serialized_start=1206
+  _globals['_FILESUMMARY']._serialized_end=1288
+  _globals['_FILESUMMARYBATCH']._serialized_start=1290
+  _globals['_FILESUMMARYBATCH']._serialized_end=1370
+  _globals['_PATHREQUEST']._serialized_start=1372
+  _globals['_PATHREQUEST']._serialized_end=1418
+  _globals['_RENAMEREQUEST']._serialized_start=1420
+  _globals['_RENAMEREQUEST']._serialized_end=1467
+  _globals['_DIRENTRY']._serialized_start=1469
+  _globals['_DIRENTRY']._serialized_end=1509
+  _globals['_DIRLISTING']._serialized_start=1511
+  _globals['_DIRLISTING']._serialized_end=1559
+  _globals['_CONTROLLERADDRESS']._serialized_start=1561
+  _globals['_CONTROLLERADDRESS']._serialized_end=1611
+  _globals['_PARTITIONTABLE']._serialized_start=1613
+  _globals['_PARTITIONTABLE']._serialized_end=1678
+  _globals['_NODETABLE']._serialized_start=1680
+  _globals['_NODETABLE']._serialized_end=1778
+  _globals['_CONTROLLERGROUP']._serialized_start=1780
+  _globals['_CONTROLLERGROUP']._serialized_end=1858
+  _globals['_VOTEREQUEST']._serialized_start=1860
+  _globals['_VOTEREQUEST']._serialized_end=1945
+  _globals['_VOTEREPLY']._serialized_start=1947
+  _globals['_VOTEREPLY']._serialized_end=1989
+  _globals['_LOGENTRY']._serialized_start=1991
+  _globals['_LOGENTRY']._serialized_end=2031
+  _globals['_APPENDREQUEST']._serialized_start=2034
+  _globals['_APPENDREQUEST']._serialized_end=2220
+  _globals['_WATCHLIST']._serialized_start=2222
+  _globals['_WATCHLIST']._serialized_end=2246
+  _globals['_APPENDREPLY']._serialized_start=2249
+  _globals['_APPENDREPLY']._serialized_end=2456
+  _globals['_APPENDREPLY_WATCHESENTRY']._serialized_start=2390
+  _globals['_APPENDREPLY_WATCHESENTRY']._serialized_end=2456
+  _globals['_FILECHUNK']._serialized_start=2458
+  _globals['_FILECHUNK']._serialized_end=2540
+  _globals['_RANGEREQUEST']._serialized_start=2542
+  _globals['_RANGEREQUEST']._serialized_end=2606
+  _globals['_REPLICATIONSTATUS']._serialized_start=2608
+  _globals['_REPLICATIONSTATUS']._serialized_end=2731
+  _globals['_FILESTAT']._serialized_start=2733
+  _globals['_FILESTAT']._serialized_end=2775
+  _globals['_CHUNKREF']._serialized_start=2777
+  _globals['_CHUNKREF']._serialized_end=2815
+  _globals['_MANIFEST']._serialized_start=2817
+  _globals['_MANIFEST']._serialized_end=2894
+  _globals['_CHUNKHASHES']._serialized_start=2896
+  _globals['_CHUNKHASHES']._serialized_end=2948
+  _globals['_CHUNKDATA']._serialized_start=2950
+  _globals['_CHUNKDATA']._serialized_end=3044
+  _globals['_SHARDLOCATION']._serialized_start=3046
+  _globals['_SHARDLOCATION']._serialized_end=3113
+  _globals['_SHARDLAYOUT']._serialized_start=3115
+  _globals['_SHARDLAYOUT']._serialized_end=3234
+  _globals['_BLOCKSIGNATURE']._serialized_start=3236
+  _globals['_BLOCKSIGNATURE']._serialized_end=3282
+  _globals['_FILESIGNATURE']._serialized_start=3284
+  _globals['_FILESIGNATURE']._serialized_end=3392
+  _globals['_FILEDELTA']._serialized_start=3395
+  _globals['_FILEDELTA']._serialized_end=3546
+  _globals['_CACHESTATSREQUEST']._serialized_start=3548
+  _globals['_CACHESTATSREQUEST']._serialized_end=3582
+  _globals['_CACHESTATS']._serialized_start=3585
+  _globals['_CACHESTATS']._serialized_end=3719
+  _globals['_NODESTATS']._serialized_start=3721
+  _globals['_NODESTATS']._serialized_end=3828
+  _globals['_NODECOMMAND']._serialized_start=3831
+  _globals['_NODECOMMAND']._serialized_end=3960
+  _globals['_STORAGECONTROLLER']._serialized_start=3963
+  _globals['_STORAGECONTROLLER']._serialized_end=5624
+  _globals['_CONTROLLERRAFT']._serialized_start=5627
+  _globals['_CONTROLLERRAFT']._serialized_end=5763
+  _globals['_NODEFILESERVICE']._serialized_start=5766
+  _globals['_NODEFILESERVICE']._serialized_end=6661
 # @@protoc_insertion_point(module_scope)
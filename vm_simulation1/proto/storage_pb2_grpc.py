@@ -49,6 +49,11 @@ class StorageControllerStub(object):
                 request_serializer=storage__pb2.NodeInfo.SerializeToString,
                 response_deserializer=storage__pb2.Response.FromString,
                 _registered_method=True)
+        self.HeartbeatStream = channel.stream_stream(
+                '/storage.StorageController/HeartbeatStream',
+                request_serializer=storage__pb2.NodeStats.SerializeToString,
+                response_deserializer=storage__pb2.NodeCommand.FromString,
+                _registered_method=True)
         self.SetOffline = channel.unary_unary(
                 '/storage.StorageController/SetOffline',
                 request_serializer=storage__pb2.NodeInfo.SerializeToString,
@@ -59,11 +64,31 @@ class StorageControllerStub(object):
                 request_serializer=storage__pb2.FileAnnouncement.SerializeToString,
                 response_deserializer=storage__pb2.Response.FromString,
                 _registered_method=True)
+        self.AnnounceFiles = channel.stream_stream(
+                '/storage.StorageController/AnnounceFiles',
+                request_serializer=storage__pb2.FileAnnouncementBatch.SerializeToString,
+                response_deserializer=storage__pb2.AnnounceResultBatch.FromString,
+                _registered_method=True)
         self.GetFileLocations = channel.unary_unary(
                 '/storage.StorageController/GetFileLocations',
                 request_serializer=storage__pb2.FileName.SerializeToString,
                 response_deserializer=storage__pb2.NodeLocationList.FromString,
                 _registered_method=True)
+        self.GetFileLocationsBatch = channel.unary_unary(
+                '/storage.StorageController/GetFileLocationsBatch',
+                request_serializer=storage__pb2.FileNameBatch.SerializeToString,
+                response_deserializer=storage__pb2.FileLocationsBatch.FromString,
+                _registered_method=True)
+        self.GetReplicaTargets = channel.unary_unary(
+                '/storage.StorageController/GetReplicaTargets',
+                request_serializer=storage__pb2.FileName.SerializeToString,
+                response_deserializer=storage__pb2.NodeLocationList.FromString,
+                _registered_method=True)
+        self.GetReplicationStatus = channel.unary_unary(
+                '/storage.StorageController/GetReplicationStatus',
+                request_serializer=storage__pb2.FileName.SerializeToString,
+                response_deserializer=storage__pb2.ReplicationStatus.FromString,
+                _registered_method=True)
         self.CreateFile = channel.unary_unary(
                 '/storage.StorageController/CreateFile',
                 request_serializer=storage__pb2.FileName.SerializeToString,
@@ -76,14 +101,74 @@ class StorageControllerStub(object):
                 _registered_method=True)
         self.ModifyFile = channel.unary_unary(
                 '/storage.StorageController/ModifyFile',
-                request_serializer=storage__pb2.FileRequest.SerializeToString,
+                request_serializer=storage__pb2.FileAnnouncement.SerializeToString,
+                response_deserializer=storage__pb2.NodeLocationList.FromString,
+                _registered_method=True)
+        self.PlaceShards = channel.unary_unary(
+                '/storage.StorageController/PlaceShards',
+                request_serializer=storage__pb2.ShardLayout.SerializeToString,
+                response_deserializer=storage__pb2.ShardLayout.FromString,
+                _registered_method=True)
+        self.CommitShards = channel.unary_unary(
+                '/storage.StorageController/CommitShards',
+                request_serializer=storage__pb2.ShardLayout.SerializeToString,
                 response_deserializer=storage__pb2.Response.FromString,
                 _registered_method=True)
+        self.GetShardLayout = channel.unary_unary(
+                '/storage.StorageController/GetShardLayout',
+                request_serializer=storage__pb2.FileName.SerializeToString,
+                response_deserializer=storage__pb2.ShardLayout.FromString,
+                _registered_method=True)
         self.ListFiles = channel.unary_unary(
                 '/storage.StorageController/ListFiles',
                 request_serializer=storage__pb2.NodeInfo.SerializeToString,
                 response_deserializer=storage__pb2.FileList.FromString,
                 _registered_method=True)
+        self.ListFilesPage = channel.unary_unary(
+                '/storage.StorageController/ListFilesPage',
+                request_serializer=storage__pb2.ListRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileList.FromString,
+                _registered_method=True)
+        self.ListFilesStream = channel.unary_stream(
+                '/storage.StorageController/ListFilesStream',
+                request_serializer=storage__pb2.ListRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileSummaryBatch.FromString,
+                _registered_method=True)
+        self.MakeDirectory = channel.unary_unary(
+                '/storage.StorageController/MakeDirectory',
+                request_serializer=storage__pb2.PathRequest.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.ListDirectory = channel.unary_stream(
+                '/storage.StorageController/ListDirectory',
+                request_serializer=storage__pb2.PathRequest.SerializeToString,
+                response_deserializer=storage__pb2.DirListing.FromString,
+                _registered_method=True)
+        self.RenamePath = channel.unary_unary(
+                '/storage.StorageController/RenamePath',
+                request_serializer=storage__pb2.RenameRequest.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.DeletePath = channel.unary_unary(
+                '/storage.StorageController/DeletePath',
+                request_serializer=storage__pb2.PathRequest.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.GetPartitions = channel.unary_unary(
+                '/storage.StorageController/GetPartitions',
+                request_serializer=storage__pb2.NodeInfo.SerializeToString,
+                response_deserializer=storage__pb2.PartitionTable.FromString,
+                _registered_method=True)
+        self.SyncNodes = channel.unary_unary(
+                '/storage.StorageController/SyncNodes',
+                request_serializer=storage__pb2.NodeTable.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.GetGroup = channel.unary_unary(
+                '/storage.StorageController/GetGroup',
+                request_serializer=storage__pb2.NodeInfo.SerializeToString,
+                response_deserializer=storage__pb2.ControllerGroup.FromString,
+                _registered_method=True)
 
 
 class StorageControllerServicer(object):
@@ -108,6 +193,13 @@ class StorageControllerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def HeartbeatStream(self, request_iterator, context):
+        """Long-lived heartbeat; commands come back down
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SetOffline(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -121,6 +213,13 @@ class StorageControllerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def AnnounceFiles(self, request_iterator, context):
+        """Many files; one result batch per batch
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def GetFileLocations(self, request, context):
         """Get nodes that have a file
         """
@@ -128,6 +227,26 @@ class StorageControllerServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetFileLocationsBatch(self, request, context):
+        """Same for many files in one call
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetReplicaTargets(self, request, context):
+        """Nodes the uploader should push replicas to
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetReplicationStatus(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateFile(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -141,17 +260,101 @@ class StorageControllerServicer(object):
         raise NotImplementedError('Method not implemented!')
 
     def ModifyFile(self, request, context):
-        """Missing associated documentation comment in .proto file."""
+        """Sender changed the file; returns the owners to send the delta to
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PlaceShards(self, request, context):
+        """Erasure-coded upload: which node gets each shard
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CommitShards(self, request, context):
+        """Record the shards that were stored
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetShardLayout(self, request, context):
+        """Shards of an erasure-coded file on online nodes
+        """
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
     def ListFiles(self, request, context):
+        """Every visible name in one message
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListFilesPage(self, request, context):
+        """One page of names, filtered
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListFilesStream(self, request, context):
+        """Names with size, owners and upload time
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MakeDirectory(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListDirectory(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RenamePath(self, request, context):
+        """Move a file or a whole directory
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DeletePath(self, request, context):
+        """Delete a directory with everything under it
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetPartitions(self, request, context):
+        """Empty unless the metadata is partitioned
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def SyncNodes(self, request, context):
+        """Partition 0 -> the other partitions: node states
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetGroup(self, request, context):
+        """Empty unless the controller is replicated
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_StorageControllerServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -170,6 +373,11 @@ def add_StorageControllerServicer_to_server(servicer, server):
                     request_deserializer=storage__pb2.NodeInfo.FromString,
                     response_serializer=storage__pb2.Response.SerializeToString,
             ),
+            'HeartbeatStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.HeartbeatStream,
+                    request_deserializer=storage__pb2.NodeStats.FromString,
+                    response_serializer=storage__pb2.NodeCommand.SerializeToString,
+            ),
             'SetOffline': grpc.unary_unary_rpc_method_handler(
                     servicer.SetOffline,
                     request_deserializer=storage__pb2.NodeInfo.FromString,
@@ -180,11 +388,31 @@ def add_StorageControllerServicer_to_server(servicer, server):
                     request_deserializer=storage__pb2.FileAnnouncement.FromString,
                     response_serializer=storage__pb2.Response.SerializeToString,
             ),
+            'AnnounceFiles': grpc.stream_stream_rpc_method_handler(
+                    servicer.AnnounceFiles,
+                    request_deserializer=storage__pb2.FileAnnouncementBatch.FromString,
+                    response_serializer=storage__pb2.AnnounceResultBatch.SerializeToString,
+            ),
             'GetFileLocations': grpc.unary_unary_rpc_method_handler(
                     servicer.GetFileLocations,
                     request_deserializer=storage__pb2.FileName.FromString,
                     response_serializer=storage__pb2.NodeLocationList.SerializeToString,
             ),
+            'GetFileLocationsBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetFileLocationsBatch,
+                    request_deserializer=storage__pb2.FileNameBatch.FromString,
+                    response_serializer=storage__pb2.FileLocationsBatch.SerializeToString,
+            ),
+            'GetReplicaTargets': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetReplicaTargets,
+                    request_deserializer=storage__pb2.FileName.FromString,
+                    response_serializer=storage__pb2.NodeLocationList.SerializeToString,
+            ),
+            'GetReplicationStatus': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetReplicationStatus,
+                    request_deserializer=storage__pb2.FileName.FromString,
+                    response_serializer=storage__pb2.ReplicationStatus.SerializeToString,
+            ),
             'CreateFile': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateFile,
                     request_deserializer=storage__pb2.FileName.FromString,
@@ -197,14 +425,74 @@ def add_StorageControllerServicer_to_server(servicer, server):
             ),
             'ModifyFile': grpc.unary_unary_rpc_method_handler(
                     servicer.ModifyFile,
-                    request_deserializer=storage__pb2.FileRequest.FromString,
+                    request_deserializer=storage__pb2.FileAnnouncement.FromString,
+                    response_serializer=storage__pb2.NodeLocationList.SerializeToString,
+            ),
+            'PlaceShards': grpc.unary_unary_rpc_method_handler(
+                    servicer.PlaceShards,
+                    request_deserializer=storage__pb2.ShardLayout.FromString,
+                    response_serializer=storage__pb2.ShardLayout.SerializeToString,
+            ),
+            'CommitShards': grpc.unary_unary_rpc_method_handler(
+                    servicer.CommitShards,
+                    request_deserializer=storage__pb2.ShardLayout.FromString,
                     response_serializer=storage__pb2.Response.SerializeToString,
             ),
+            'GetShardLayout': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetShardLayout,
+                    request_deserializer=storage__pb2.FileName.FromString,
+                    response_serializer=storage__pb2.ShardLayout.SerializeToString,
+            ),
             'ListFiles': grpc.unary_unary_rpc_method_handler(
                     servicer.ListFiles,
                     request_deserializer=storage__pb2.NodeInfo.FromString,
                     response_serializer=storage__pb2.FileList.SerializeToString,
             ),
+            'ListFilesPage': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListFilesPage,
+                    request_deserializer=storage__pb2.ListRequest.FromString,
+                    response_serializer=storage__pb2.FileList.SerializeToString,
+            ),
+            'ListFilesStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListFilesStream,
+                    request_deserializer=storage__pb2.ListRequest.FromString,
+                    response_serializer=storage__pb2.FileSummaryBatch.SerializeToString,
+            ),
+            'MakeDirectory': grpc.unary_unary_rpc_method_handler(
+                    servicer.MakeDirectory,
+                    request_deserializer=storage__pb2.PathRequest.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'ListDirectory': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListDirectory,
+                    request_deserializer=storage__pb2.PathRequest.FromString,
+                    response_serializer=storage__pb2.DirListing.SerializeToString,
+            ),
+            'RenamePath': grpc.unary_unary_rpc_method_handler(
+                    servicer.RenamePath,
+                    request_deserializer=storage__pb2.RenameRequest.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'DeletePath': grpc.unary_unary_rpc_method_handler(
+                    servicer.DeletePath,
+                    request_deserializer=storage__pb2.PathRequest.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'GetPartitions': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetPartitions,
+                    request_deserializer=storage__pb2.NodeInfo.FromString,
+                    response_serializer=storage__pb2.PartitionTable.SerializeToString,
+            ),
+            'SyncNodes': grpc.unary_unary_rpc_method_handler(
+                    servicer.SyncNodes,
+                    request_deserializer=storage__pb2.NodeTable.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'GetGroup': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetGroup,
+                    request_deserializer=storage__pb2.NodeInfo.FromString,
+                    response_serializer=storage__pb2.ControllerGroup.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'storage.StorageController', rpc_method_handlers)
@@ -298,7 +586,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def SetOffline(request,
+    def HeartbeatStream(request_iterator,
             target,
             options=(),
             channel_credentials=None,
@@ -308,12 +596,12 @@ class StorageController(object):
             wait_for_ready=None,
             timeout=None,
             metadata=None):
-        return grpc.experimental.unary_unary(
-            request,
+        return grpc.experimental.stream_stream(
+            request_iterator,
             target,
-            '/storage.StorageController/SetOffline',
-            storage__pb2.NodeInfo.SerializeToString,
-            storage__pb2.Response.FromString,
+            '/storage.StorageController/HeartbeatStream',
+            storage__pb2.NodeStats.SerializeToString,
+            storage__pb2.NodeCommand.FromString,
             options,
             channel_credentials,
             insecure,
@@ -325,7 +613,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def AnnounceFile(request,
+    def SetOffline(request,
             target,
             options=(),
             channel_credentials=None,
@@ -338,8 +626,8 @@ class StorageController(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/storage.StorageController/AnnounceFile',
-            storage__pb2.FileAnnouncement.SerializeToString,
+            '/storage.StorageController/SetOffline',
+            storage__pb2.NodeInfo.SerializeToString,
             storage__pb2.Response.FromString,
             options,
             channel_credentials,
@@ -352,7 +640,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def GetFileLocations(request,
+    def AnnounceFile(request,
             target,
             options=(),
             channel_credentials=None,
@@ -365,9 +653,9 @@ class StorageController(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/storage.StorageController/GetFileLocations',
-            storage__pb2.FileName.SerializeToString,
-            storage__pb2.NodeLocationList.FromString,
+            '/storage.StorageController/AnnounceFile',
+            storage__pb2.FileAnnouncement.SerializeToString,
+            storage__pb2.Response.FromString,
             options,
             channel_credentials,
             insecure,
@@ -379,7 +667,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def CreateFile(request,
+    def AnnounceFiles(request_iterator,
             target,
             options=(),
             channel_credentials=None,
@@ -389,12 +677,12 @@ class StorageController(object):
             wait_for_ready=None,
             timeout=None,
             metadata=None):
-        return grpc.experimental.unary_unary(
-            request,
+        return grpc.experimental.stream_stream(
+            request_iterator,
             target,
-            '/storage.StorageController/CreateFile',
-            storage__pb2.FileName.SerializeToString,
-            storage__pb2.Response.FromString,
+            '/storage.StorageController/AnnounceFiles',
+            storage__pb2.FileAnnouncementBatch.SerializeToString,
+            storage__pb2.AnnounceResultBatch.FromString,
             options,
             channel_credentials,
             insecure,
@@ -406,7 +694,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def DeleteFile(request,
+    def GetFileLocations(request,
             target,
             options=(),
             channel_credentials=None,
@@ -419,9 +707,9 @@ class StorageController(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/storage.StorageController/DeleteFile',
+            '/storage.StorageController/GetFileLocations',
             storage__pb2.FileName.SerializeToString,
-            storage__pb2.Response.FromString,
+            storage__pb2.NodeLocationList.FromString,
             options,
             channel_credentials,
             insecure,
@@ -433,7 +721,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def ModifyFile(request,
+    def GetFileLocationsBatch(request,
             target,
             options=(),
             channel_credentials=None,
@@ -446,9 +734,9 @@ class StorageController(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/storage.StorageController/ModifyFile',
-            storage__pb2.FileRequest.SerializeToString,
-            storage__pb2.Response.FromString,
+            '/storage.StorageController/GetFileLocationsBatch',
+            storage__pb2.FileNameBatch.SerializeToString,
+            storage__pb2.FileLocationsBatch.FromString,
             options,
             channel_credentials,
             insecure,
@@ -460,7 +748,7 @@ class StorageController(object):
             _registered_method=True)
 
     @staticmethod
-    def ListFiles(request,
+    def GetReplicaTargets(request,
             target,
             options=(),
             channel_credentials=None,
@@ -473,9 +761,9 @@ class StorageController(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/storage.StorageController/ListFiles',
-            storage__pb2.NodeInfo.SerializeToString,
-            storage__pb2.FileList.FromString,
+            '/storage.StorageController/GetReplicaTargets',
+            storage__pb2.FileName.SerializeToString,
+            storage__pb2.NodeLocationList.FromString,
             options,
             channel_credentials,
             insecure,
@@ -486,69 +774,8 @@ class StorageController(object):
             metadata,
             _registered_method=True)
 
-
-class NodeFileServiceStub(object):
-    """Missing associated documentation comment in .proto file."""
-
-    def __init__(self, channel):
-        """Constructor.
-
-        Args:
-            channel: A grpc.Channel.
-        """
-        self.DownloadFile = channel.unary_unary(
-                '/storage.NodeFileService/DownloadFile',
-                request_serializer=storage__pb2.FileDownloadRequest.SerializeToString,
-                response_deserializer=storage__pb2.FileContent.FromString,
-                _registered_method=True)
-        self.NotifyDuplicate = channel.unary_unary(
-                '/storage.NodeFileService/NotifyDuplicate',
-                request_serializer=storage__pb2.FileAnnouncement.SerializeToString,
-                response_deserializer=storage__pb2.Response.FromString,
-                _registered_method=True)
-
-
-class NodeFileServiceServicer(object):
-    """Missing associated documentation comment in .proto file."""
-
-    def DownloadFile(self, request, context):
-        """Missing associated documentation comment in .proto file."""
-        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-        context.set_details('Method not implemented!')
-        raise NotImplementedError('Method not implemented!')
-
-    def NotifyDuplicate(self, request, context):
-        """Missing associated documentation comment in .proto file."""
-        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
-        context.set_details('Method not implemented!')
-        raise NotImplementedError('Method not implemented!')
-
-
-def add_NodeFileServiceServicer_to_server(servicer, server):
-    rpc_method_handlers = {
-            'DownloadFile': grpc.unary_unary_rpc_method_handler(
-                    servicer.DownloadFile,
-                    request_deserializer=storage__pb2.FileDownloadRequest.FromString,
-                    response_serializer=storage__pb2.FileContent.SerializeToString,
-            ),
-            'NotifyDuplicate': grpc.unary_unary_rpc_method_handler(
-                    servicer.NotifyDuplicate,
-                    request_deserializer=storage__pb2.FileAnnouncement.FromString,
-                    response_serializer=storage__pb2.Response.SerializeToString,
-            ),
-    }
-    generic_handler = grpc.method_handlers_generic_handler(
-            'storage.NodeFileService', rpc_method_handlers)
-    server.add_generic_rpc_handlers((generic_handler,))
-    server.add_registered_method_handlers('storage.NodeFileService', rpc_method_handlers)
-
-
- # This class is part of an EXPERIMENTAL API.
-class NodeFileService(object):
-    """Missing associated documentation comment in .proto file."""
-
     @staticmethod
-    def DownloadFile(request,
+    def GetReplicationStatus(request,
             target,
             options=(),
             channel_credentials=None,
@@ -561,9 +788,9 @@ class NodeFileService(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/storage.NodeFileService/DownloadFile',
-            storage__pb2.FileDownloadRequest.SerializeToString,
-            storage__pb2.FileContent.FromString,
+            '/storage.StorageController/GetReplicationStatus',
+            storage__pb2.FileName.SerializeToString,
+            storage__pb2.ReplicationStatus.FromString,
             options,
             channel_credentials,
             insecure,
@@ -575,7 +802,871 @@ class NodeFileService(object):
             _registered_method=True)
 
     @staticmethod
-    def NotifyDuplicate(request,
+    def CreateFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/CreateFile',
+            storage__pb2.FileName.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DeleteFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/DeleteFile',
+            storage__pb2.FileName.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ModifyFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/ModifyFile',
+            storage__pb2.FileAnnouncement.SerializeToString,
+            storage__pb2.NodeLocationList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PlaceShards(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/PlaceShards',
+            storage__pb2.ShardLayout.SerializeToString,
+            storage__pb2.ShardLayout.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def CommitShards(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/CommitShards',
+            storage__pb2.ShardLayout.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetShardLayout(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/GetShardLayout',
+            storage__pb2.FileName.SerializeToString,
+            storage__pb2.ShardLayout.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListFiles(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/ListFiles',
+            storage__pb2.NodeInfo.SerializeToString,
+            storage__pb2.FileList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListFilesPage(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/ListFilesPage',
+            storage__pb2.ListRequest.SerializeToString,
+            storage__pb2.FileList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListFilesStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/storage.StorageController/ListFilesStream',
+            storage__pb2.ListRequest.SerializeToString,
+            storage__pb2.FileSummaryBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def MakeDirectory(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/MakeDirectory',
+            storage__pb2.PathRequest.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListDirectory(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/storage.StorageController/ListDirectory',
+            storage__pb2.PathRequest.SerializeToString,
+            storage__pb2.DirListing.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RenamePath(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/RenamePath',
+            storage__pb2.RenameRequest.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DeletePath(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/DeletePath',
+            storage__pb2.PathRequest.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetPartitions(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/GetPartitions',
+            storage__pb2.NodeInfo.SerializeToString,
+            storage__pb2.PartitionTable.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def SyncNodes(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/SyncNodes',
+            storage__pb2.NodeTable.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetGroup(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.StorageController/GetGroup',
+            storage__pb2.NodeInfo.SerializeToString,
+            storage__pb2.ControllerGroup.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class ControllerRaftStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.RequestVote = channel.unary_unary(
+                '/storage.ControllerRaft/RequestVote',
+                request_serializer=storage__pb2.VoteRequest.SerializeToString,
+                response_deserializer=storage__pb2.VoteReply.FromString,
+                _registered_method=True)
+        self.AppendEntries = channel.unary_unary(
+                '/storage.ControllerRaft/AppendEntries',
+                request_serializer=storage__pb2.AppendRequest.SerializeToString,
+                response_deserializer=storage__pb2.AppendReply.FromString,
+                _registered_method=True)
+
+
+class ControllerRaftServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def RequestVote(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AppendEntries(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_ControllerRaftServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'RequestVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.RequestVote,
+                    request_deserializer=storage__pb2.VoteRequest.FromString,
+                    response_serializer=storage__pb2.VoteReply.SerializeToString,
+            ),
+            'AppendEntries': grpc.unary_unary_rpc_method_handler(
+                    servicer.AppendEntries,
+                    request_deserializer=storage__pb2.AppendRequest.FromString,
+                    response_serializer=storage__pb2.AppendReply.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'storage.ControllerRaft', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('storage.ControllerRaft', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class ControllerRaft(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def RequestVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.ControllerRaft/RequestVote',
+            storage__pb2.VoteRequest.SerializeToString,
+            storage__pb2.VoteReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AppendEntries(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.ControllerRaft/AppendEntries',
+            storage__pb2.AppendRequest.SerializeToString,
+            storage__pb2.AppendReply.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+
+class NodeFileServiceStub(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.DownloadFile = channel.unary_unary(
+                '/storage.NodeFileService/DownloadFile',
+                request_serializer=storage__pb2.FileDownloadRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileContent.FromString,
+                _registered_method=True)
+        self.DownloadFileStream = channel.unary_stream(
+                '/storage.NodeFileService/DownloadFileStream',
+                request_serializer=storage__pb2.FileDownloadRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileChunk.FromString,
+                _registered_method=True)
+        self.NotifyDuplicate = channel.unary_unary(
+                '/storage.NodeFileService/NotifyDuplicate',
+                request_serializer=storage__pb2.FileAnnouncement.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.NotifyDuplicates = channel.unary_unary(
+                '/storage.NodeFileService/NotifyDuplicates',
+                request_serializer=storage__pb2.FileAnnouncementBatch.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.PushReplica = channel.stream_unary(
+                '/storage.NodeFileService/PushReplica',
+                request_serializer=storage__pb2.FileChunk.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.StatFile = channel.unary_unary(
+                '/storage.NodeFileService/StatFile',
+                request_serializer=storage__pb2.FileDownloadRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileStat.FromString,
+                _registered_method=True)
+        self.ReadRange = channel.unary_stream(
+                '/storage.NodeFileService/ReadRange',
+                request_serializer=storage__pb2.RangeRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileChunk.FromString,
+                _registered_method=True)
+        self.GetManifest = channel.unary_unary(
+                '/storage.NodeFileService/GetManifest',
+                request_serializer=storage__pb2.FileDownloadRequest.SerializeToString,
+                response_deserializer=storage__pb2.Manifest.FromString,
+                _registered_method=True)
+        self.MissingChunks = channel.unary_unary(
+                '/storage.NodeFileService/MissingChunks',
+                request_serializer=storage__pb2.Manifest.SerializeToString,
+                response_deserializer=storage__pb2.ChunkHashes.FromString,
+                _registered_method=True)
+        self.GetChunks = channel.unary_stream(
+                '/storage.NodeFileService/GetChunks',
+                request_serializer=storage__pb2.ChunkHashes.SerializeToString,
+                response_deserializer=storage__pb2.ChunkData.FromString,
+                _registered_method=True)
+        self.PushChunks = channel.stream_unary(
+                '/storage.NodeFileService/PushChunks',
+                request_serializer=storage__pb2.ChunkData.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.GetSignature = channel.unary_unary(
+                '/storage.NodeFileService/GetSignature',
+                request_serializer=storage__pb2.FileDownloadRequest.SerializeToString,
+                response_deserializer=storage__pb2.FileSignature.FromString,
+                _registered_method=True)
+        self.ApplyDelta = channel.stream_unary(
+                '/storage.NodeFileService/ApplyDelta',
+                request_serializer=storage__pb2.FileDelta.SerializeToString,
+                response_deserializer=storage__pb2.Response.FromString,
+                _registered_method=True)
+        self.GetCacheStats = channel.unary_unary(
+                '/storage.NodeFileService/GetCacheStats',
+                request_serializer=storage__pb2.CacheStatsRequest.SerializeToString,
+                response_deserializer=storage__pb2.CacheStats.FromString,
+                _registered_method=True)
+
+
+class NodeFileServiceServicer(object):
+    """Missing associated documentation comment in .proto file."""
+
+    def DownloadFile(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DownloadFileStream(self, request, context):
+        """Chunked download
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def NotifyDuplicate(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def NotifyDuplicates(self, request, context):
+        """NotifyDuplicate for many files at once
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PushReplica(self, request_iterator, context):
+        """Uploader streams replica content
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StatFile(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReadRange(self, request, context):
+        """Stream one byte range of a file
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetManifest(self, request, context):
+        """Chunk list of a stored file
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MissingChunks(self, request, context):
+        """Which of the manifest's chunks this node lacks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetChunks(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PushChunks(self, request_iterator, context):
+        """Manifest, then the chunks the receiver lacks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetSignature(self, request, context):
+        """Block checksums of the stored copy
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ApplyDelta(self, request_iterator, context):
+        """Rebuild the stored copy from its old blocks + literals
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetCacheStats(self, request, context):
+        """Read cache hit/miss counters
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_NodeFileServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'DownloadFile': grpc.unary_unary_rpc_method_handler(
+                    servicer.DownloadFile,
+                    request_deserializer=storage__pb2.FileDownloadRequest.FromString,
+                    response_serializer=storage__pb2.FileContent.SerializeToString,
+            ),
+            'DownloadFileStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.DownloadFileStream,
+                    request_deserializer=storage__pb2.FileDownloadRequest.FromString,
+                    response_serializer=storage__pb2.FileChunk.SerializeToString,
+            ),
+            'NotifyDuplicate': grpc.unary_unary_rpc_method_handler(
+                    servicer.NotifyDuplicate,
+                    request_deserializer=storage__pb2.FileAnnouncement.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'NotifyDuplicates': grpc.unary_unary_rpc_method_handler(
+                    servicer.NotifyDuplicates,
+                    request_deserializer=storage__pb2.FileAnnouncementBatch.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'PushReplica': grpc.stream_unary_rpc_method_handler(
+                    servicer.PushReplica,
+                    request_deserializer=storage__pb2.FileChunk.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'StatFile': grpc.unary_unary_rpc_method_handler(
+                    servicer.StatFile,
+                    request_deserializer=storage__pb2.FileDownloadRequest.FromString,
+                    response_serializer=storage__pb2.FileStat.SerializeToString,
+            ),
+            'ReadRange': grpc.unary_stream_rpc_method_handler(
+                    servicer.ReadRange,
+                    request_deserializer=storage__pb2.RangeRequest.FromString,
+                    response_serializer=storage__pb2.FileChunk.SerializeToString,
+            ),
+            'GetManifest': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetManifest,
+                    request_deserializer=storage__pb2.FileDownloadRequest.FromString,
+                    response_serializer=storage__pb2.Manifest.SerializeToString,
+            ),
+            'MissingChunks': grpc.unary_unary_rpc_method_handler(
+                    servicer.MissingChunks,
+                    request_deserializer=storage__pb2.Manifest.FromString,
+                    response_serializer=storage__pb2.ChunkHashes.SerializeToString,
+            ),
+            'GetChunks': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetChunks,
+                    request_deserializer=storage__pb2.ChunkHashes.FromString,
+                    response_serializer=storage__pb2.ChunkData.SerializeToString,
+            ),
+            'PushChunks': grpc.stream_unary_rpc_method_handler(
+                    servicer.PushChunks,
+                    request_deserializer=storage__pb2.ChunkData.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'GetSignature': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetSignature,
+                    request_deserializer=storage__pb2.FileDownloadRequest.FromString,
+                    response_serializer=storage__pb2.FileSignature.SerializeToString,
+            ),
+            'ApplyDelta': grpc.stream_unary_rpc_method_handler(
+                    servicer.ApplyDelta,
+                    request_deserializer=storage__pb2.FileDelta.FromString,
+                    response_serializer=storage__pb2.Response.SerializeToString,
+            ),
+            'GetCacheStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetCacheStats,
+                    request_deserializer=storage__pb2.CacheStatsRequest.FromString,
+                    response_serializer=storage__pb2.CacheStats.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'storage.NodeFileService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('storage.NodeFileService', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class NodeFileService(object):
+    """Missing associated documentation comment in .proto file."""
+
+    @staticmethod
+    def DownloadFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/DownloadFile',
+            storage__pb2.FileDownloadRequest.SerializeToString,
+            storage__pb2.FileContent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DownloadFileStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/storage.NodeFileService/DownloadFileStream',
+            storage__pb2.FileDownloadRequest.SerializeToString,
+            storage__pb2.FileChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def NotifyDuplicate(request,
             target,
             options=(),
             channel_credentials=None,
@@ -600,3 +1691,300 @@ class NodeFileService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def NotifyDuplicates(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/NotifyDuplicates',
+            storage__pb2.FileAnnouncementBatch.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PushReplica(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/storage.NodeFileService/PushReplica',
+            storage__pb2.FileChunk.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def StatFile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/StatFile',
+            storage__pb2.FileDownloadRequest.SerializeToString,
+            storage__pb2.FileStat.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReadRange(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/storage.NodeFileService/ReadRange',
+            storage__pb2.RangeRequest.SerializeToString,
+            storage__pb2.FileChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetManifest(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/GetManifest',
+            storage__pb2.FileDownloadRequest.SerializeToString,
+            storage__pb2.Manifest.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def MissingChunks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/MissingChunks',
+            storage__pb2.Manifest.SerializeToString,
+            storage__pb2.ChunkHashes.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetChunks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/storage.NodeFileService/GetChunks',
+            storage__pb2.ChunkHashes.SerializeToString,
+            storage__pb2.ChunkData.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PushChunks(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/storage.NodeFileService/PushChunks',
+            storage__pb2.ChunkData.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetSignature(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/GetSignature',
+            storage__pb2.FileDownloadRequest.SerializeToString,
+            storage__pb2.FileSignature.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ApplyDelta(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/storage.NodeFileService/ApplyDelta',
+            storage__pb2.FileDelta.SerializeToString,
+            storage__pb2.Response.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetCacheStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/storage.NodeFileService/GetCacheStats',
+            storage__pb2.CacheStatsRequest.SerializeToString,
+            storage__pb2.CacheStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
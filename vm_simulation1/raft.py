@@ -0,0 +1,636 @@
+# Replicated controller: a Raft-style group of controller processes.
+#
+# Every member runs the full controller. One of them is elected leader and
+# takes every write; the others follow its log and can answer reads, so the
+# metadata survives a controller crash and reads spread over the group.
+#
+# The log entries are the records the MetadataStore already produces for the
+# metadata WAL (metadata_log.encode). The leader applies a change to its own
+# store as before, the record becomes a log entry, and the gRPC handler only
+# answers once a majority of the group has the entry (GroupInterceptor).
+# Followers apply committed entries with metadata_log.apply. Applying before
+# committing means a deposed leader can hold changes the group never
+# committed; when the new leader's log disagrees with a member that applied
+# such changes, the member drops its store and installs a snapshot of the
+# leader's (also how new and lagging members catch up). The current term and
+# the vote cast in it are written to RAFT_STATE_FILE in --data-dir (fsynced)
+# before the member acts on them, so a restarted member can't vote twice in
+# one term; without a data dir it also refuses votes for one election timeout
+# after starting. The log is kept in memory: a restarted member rejoins empty
+# and is sent a snapshot, and its --data-dir WAL is only used when the whole
+# group restarts.
+#
+# Reads (file locations, ListFiles) are served by any member holding a lease.
+# The leader's lease runs LEASE seconds from the last time a majority
+# acknowledged it, which is shorter than the election timeout, so no other
+# leader can exist meanwhile; it passes what is left of it to the followers
+# with every AppendEntries. A follower answers reads only within that lease
+# and once it has applied everything the leader had committed, so its answers
+# are at most one round of AppendEntries old. Followers hand the location
+# watches of the nodes they answered to the leader in their replies.
+
+import os
+import random
+import threading
+import time
+from concurrent import futures
+from contextlib import nullcontext
+
+import grpc
+
+from channel_pool import ChannelPool, KEEPALIVE_OPTIONS
+from metadata_log import decode, apply, snapshot_state, snapshot_records
+from proto import storage_pb2, storage_pb2_grpc
+
+
+HEARTBEAT_INTERVAL = 0.1  # seconds between AppendEntries when the leader has nothing new
+ELECTION_TIMEOUT = 1.0    # seconds without a leader before a member stands for election (randomised up to 2x)
+LEASE = 0.8               # must stay below ELECTION_TIMEOUT
+RPC_TIMEOUT = 0.5         # AppendEntries / RequestVote
+COMMIT_TIMEOUT = 5.0      # seconds a write waits for a majority
+MAX_ENTRIES = 1000        # entries per AppendEntries
+LOG_LIMIT = 50000         # applied entries kept before the log is truncated (laggards get a snapshot)
+FAILOVER_TIMEOUT = 3 * ELECTION_TIMEOUT  # GroupStub: how long a write keeps looking for a leader
+RAFT_STATE_FILE = "raft.state"  # "<term> <member voted for, -1 for none>"
+
+FOLLOWER, CANDIDATE, LEADER = "follower", "candidate", "leader"
+
+# Members reconnect to a restarted member within half a second, not after
+# gRPC's default backoff (up to two minutes), which would keep it from
+# hearing the leader and make it stand for election over and over
+group_pool = ChannelPool(options=KEEPALIVE_OPTIONS + [
+    ("grpc.initial_reconnect_backoff_ms", 100),
+    ("grpc.min_reconnect_backoff_ms", 100),
+    ("grpc.max_reconnect_backoff_ms", 500),
+])
+
+# StorageController calls any member with a lease can answer; every other
+# call except the discovery ones is leader-only
+READS = {"GetFileLocations", "GetFileLocationsBatch", "ListFiles", "ListFilesPage", "ListFilesStream",
+         "ListDirectory", "GetShardLayout"}
+ANYWHERE = {"GetGroup", "GetPartitions"}
+SERVICE = "/" + storage_pb2.DESCRIPTOR.services_by_name["StorageController"].full_name
+
+
+class RaftMember(storage_pb2_grpc.ControllerRaftServicer):
+    def __init__(self, members, me, store, watchers, on_leader=None, on_step_down=None):
+        self.members = list(members)  # (host, port) of every member
+        self.me = me                  # index of this process in members
+        self.store = store
+        self.watchers = watchers      # LocationWatchers; follower watches go to the leader
+        self.on_leader = on_leader        # called (without locks) once this member has won an election
+        self.on_step_down = on_step_down  # called when it stops being the leader
+        self.durable = None           # MetadataLog the records are also written to, if any
+        self.term = 0
+        self.role = FOLLOWER
+        self.leader = -1
+        self._voted_for = None
+        self._lock = threading.Condition()
+        self._apply_lock = threading.Lock()  # applies happen in log order, outside _lock
+        self._local = threading.local()
+        self._entries = []     # (term, record, applied already) after the base
+        self._base_index = 0   # last index folded into the store without a log entry (snapshot)
+        self._base_term = 0
+        self.commit = 0
+        self._applied = 0
+        self._synced = False   # this store follows the leader's log (False until a snapshot on a fresh member)
+        self._inherited = 0    # leader: last index it had when elected
+        self._leader_commit = 0
+        self._lease_until = 0.0
+        self._heard = time.monotonic()  # when the leader last reached this member (one may be alive at start)
+        self._state_path = None  # RAFT_STATE_FILE, once attached to a durable log
+        self._deadline = 0.0
+        self._next = {}        # leader: peer -> next index to send
+        self._match = {}       # leader: peer -> highest index known replicated
+        self._acked = {}       # leader: peer -> send time of its last acknowledged AppendEntries
+        self._snapshot = set()  # leader: peers that need a snapshot
+        self._stop = threading.Event()
+        self._reset_deadline()
+
+    def attach(self, store):
+        # Take the place of the store's metadata log, keeping it for durability,
+        # and pick up the term and vote saved next to it
+        self.durable = store.log
+        store.log = self
+        if self.durable is not None:
+            self._state_path = os.path.join(self.durable.data_dir, RAFT_STATE_FILE)
+            if os.path.exists(self._state_path):
+                with open(self._state_path, encoding="utf-8") as f:
+                    term, voted_for = (int(field) for field in f.read().split())
+                self.term, self._voted_for = term, None if voted_for < 0 else voted_for
+
+    def start(self):
+        threading.Thread(target=self._ticker, daemon=True, name="raft-ticker").start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------------- state ----------------
+    def _last_index(self):
+        return self._base_index + len(self._entries)
+
+    def _term_at(self, index):
+        if index == self._base_index:
+            return self._base_term
+        if self._base_index < index <= self._last_index():
+            return self._entries[index - self._base_index - 1][0]
+        return None
+
+    def _reset_deadline(self):
+        self._deadline = time.monotonic() + ELECTION_TIMEOUT * (1 + random.random())
+
+    def _majority(self):
+        return len(self.members) // 2 + 1
+
+    def last_index(self):
+        with self._lock:
+            return self._last_index()
+
+    def is_leader(self):
+        return self.role == LEADER
+
+    def can_read(self):
+        with self._lock:
+            if time.monotonic() >= self._lease_until:
+                return False
+            if self.role == LEADER:
+                return True
+            return self.role == FOLLOWER and self._synced and self._applied >= self._leader_commit
+
+    def leader_address(self):
+        leader = self.leader
+        return self.members[leader] if leader >= 0 else None
+
+    def _save_vote(self):
+        # Caller holds _lock; done before the new term or vote is acted on
+        if self._state_path is None:
+            return
+        tmp = self._state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{self.term} {-1 if self._voted_for is None else self._voted_for}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._state_path)
+
+    def _become_follower(self, term):
+        # Caller holds _lock
+        was_leader = self.role == LEADER
+        if term > self.term:
+            self.term = term
+            self._voted_for = None
+            self._save_vote()
+        self.role = FOLLOWER
+        self._lock.notify_all()
+        if was_leader:
+            self._lease_until = 0.0
+            print(f"[Controller] Member {self.me} stepped down in term {self.term}")
+            if self.on_step_down:
+                self.on_step_down()
+
+    # ---------------- writes ----------------
+    def append(self, record):
+        # Called by the MetadataStore for every change, like MetadataLog.append
+        if self.durable is not None:
+            self.durable.append(record)
+        if getattr(self._local, "applying", False):
+            return  # a committed entry being applied, already in the log
+        with self._lock:
+            if self.role == LEADER:
+                self._entries.append((self.term, record, True))
+                self._lock.notify_all()
+
+    def wait_committed(self, index, timeout=COMMIT_TIMEOUT):
+        # True once index is committed; False if leadership or time ran out
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self.commit < index:
+                remaining = deadline - time.monotonic()
+                if self.role != LEADER or remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+            return True
+
+    def _apply_committed(self):
+        # Apply committed entries this store does not have yet, in order
+        with self._apply_lock:
+            with self._lock:
+                start = max(self._applied, self._base_index)
+                end = min(self.commit, self._last_index())
+                pending = [entry[1] for entry in self._entries[start - self._base_index:end - self._base_index]
+                           if not entry[2]]
+                self._applied = max(self._applied, end)
+            self._apply_records(pending)
+            self._compact()
+
+    def _apply_records(self, records):
+        self._local.applying = True
+        try:
+            for record in records:
+                for kind, fields, _ in decode(record):
+                    apply(self.store, kind, fields)
+        finally:
+            self._local.applying = False
+
+    def _compact(self):
+        with self._lock:
+            keep_from = self._applied
+            if keep_from - self._base_index <= LOG_LIMIT:
+                return
+            self._base_term = self._term_at(keep_from)
+            self._entries = self._entries[keep_from - self._base_index:]
+            self._base_index = keep_from
+
+    # ---------------- elections ----------------
+    def _ticker(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL / 2):
+            with self._lock:
+                if self.role == LEADER or time.monotonic() < self._deadline:
+                    continue
+                self.term += 1
+                self.role = CANDIDATE
+                self.leader = -1
+                self._voted_for = self.me
+                self._save_vote()
+                self._reset_deadline()
+                term = self.term
+                request = storage_pb2.VoteRequest(term=term, candidate=self.me, last_index=self._last_index(),
+                                                  last_term=self._term_at(self._last_index()))
+            if self._collect_votes(request) >= self._majority():
+                self._win(term)
+
+    def _collect_votes(self, request):
+        votes = 1
+        peers = [i for i in range(len(self.members)) if i != self.me]
+        if not peers:
+            return votes
+        with futures.ThreadPoolExecutor(max_workers=len(peers)) as executor:
+            calls = [executor.submit(self._stub(peer).RequestVote, request, timeout=RPC_TIMEOUT) for peer in peers]
+            for call in calls:
+                try:
+                    reply = call.result()
+                except grpc.RpcError:
+                    continue
+                with self._lock:
+                    if reply.term > self.term:
+                        self._become_follower(reply.term)
+                        return 0
+                votes += reply.granted
+        return votes
+
+    def _win(self, term):
+        with self._lock:
+            if self.role != CANDIDATE or self.term != term:
+                return
+            self.role = LEADER
+            self.leader = self.me
+            self._synced = True
+            self._inherited = self._last_index()
+            peers = [i for i in range(len(self.members)) if i != self.me]
+            self._next = {peer: self._last_index() + 1 for peer in peers}
+            self._match = {peer: 0 for peer in peers}
+            self._acked = {}
+            self._snapshot = set()
+            # An entry of its own term lets the inherited ones commit
+            self._entries.append((term, b"", True))
+            self._advance_commit()
+        print(f"[Controller] Member {self.me} is the leader for term {term}")
+        for peer in peers:
+            threading.Thread(target=self._replicate, args=(peer, term), daemon=True).start()
+        if self.on_leader:
+            self.on_leader()
+
+    def RequestVote(self, request, context):
+        with self._lock:
+            # While a leader is alive, a member that lost touch with it (just
+            # restarted, or cut off) must not depose it
+            now = time.monotonic()
+            if (self.role == LEADER and now < self._lease_until) or now < self._heard + ELECTION_TIMEOUT:
+                return storage_pb2.VoteReply(term=self.term, granted=False)
+            if request.term > self.term:
+                self._become_follower(request.term)
+            up_to_date = (request.last_term, request.last_index) >= (self._term_at(self._last_index()),
+                                                                      self._last_index())
+            granted = (request.term == self.term and self._voted_for in (None, request.candidate) and up_to_date)
+            if granted:
+                self._voted_for = request.candidate
+                self._save_vote()
+                self._reset_deadline()
+            return storage_pb2.VoteReply(term=self.term, granted=granted)
+
+    # ---------------- leader -> followers ----------------
+    def _stub(self, peer):
+        host, port = self.members[peer]
+        return group_pool.stub(host, port, storage_pb2_grpc.ControllerRaftStub)
+
+    def _replicate(self, peer, term):
+        # One thread per follower while this member leads term
+        while not self._stop.is_set():
+            with self._lock:
+                if self.role != LEADER or self.term != term:
+                    return
+                snapshot = peer in self._snapshot or self._next[peer] <= self._base_index
+                if not snapshot:
+                    prev = self._next[peer] - 1
+                    request = self._request(term, prev)
+                    start = prev - self._base_index
+                    request.entries.extend(storage_pb2.LogEntry(term=t, record=record)
+                                           for t, record, _ in self._entries[start:start + MAX_ENTRIES])
+            if snapshot:
+                request = self._snapshot_request(term)
+                if request is None:
+                    with self._lock:
+                        self._lock.wait(HEARTBEAT_INTERVAL)
+                    continue
+                prev = request.prev_index
+            sent = time.monotonic()
+            try:
+                reply = self._stub(peer).AppendEntries(request, timeout=RPC_TIMEOUT)
+            except grpc.RpcError:
+                time.sleep(HEARTBEAT_INTERVAL)
+                continue
+            for fname, watch in reply.watches.items():
+                for nid in watch.ids:
+                    self.watchers.watch(nid, [fname])
+            with self._lock:
+                if reply.term > self.term:
+                    self._become_follower(reply.term)
+                    return
+                if self.role != LEADER or self.term != term:
+                    return
+                self._acked[peer] = sent
+                if reply.need_snapshot:
+                    self._snapshot.add(peer)
+                elif reply.success:
+                    self._snapshot.discard(peer)
+                    self._match[peer] = max(self._match[peer], prev + len(request.entries))
+                    self._next[peer] = self._match[peer] + 1
+                    self._advance_commit()
+                else:
+                    self._next[peer] = max(1, min(self._next[peer] - 1, reply.last_index + 1))
+                self._renew_lease()
+                if self._next[peer] > self._last_index() and peer not in self._snapshot:
+                    self._lock.wait(HEARTBEAT_INTERVAL)
+            self._apply_committed()
+
+    def _request(self, term, prev):
+        # Caller holds _lock
+        lease = max(0.0, self._lease_until - time.monotonic())
+        return storage_pb2.AppendRequest(term=term, leader=self.me, prev_index=prev, prev_term=self._term_at(prev),
+                                         commit=self.commit, lease=lease)
+
+    def _snapshot_request(self, term):
+        # The leader's store and the log index it matches, taken together:
+        # with the store frozen no change can be applied or logged in between.
+        # Entries after that index are sent after the snapshot, never in it
+        # as well (replaying a record twice is not safe). None while this
+        # member can't send one.
+        with self._apply_lock, self.store.frozen(), self._lock:
+            if self.role != LEADER or self.term != term:
+                return None
+            if self._applied < self._inherited:
+                # The store lacks inherited entries until they are committed and applied
+                return None
+            request = self._request(term, self._last_index())
+            state = snapshot_state(self.store)
+        request.install = True
+        request.snapshot = b"".join(snapshot_records(state))
+        return request
+
+    def _advance_commit(self):
+        # Caller holds _lock. The highest index a majority has, if it is from
+        # this term (older entries commit along with it)
+        indexes = sorted(list(self._match.values()) + [self._last_index()], reverse=True)
+        candidate = indexes[self._majority() - 1]
+        if candidate > self.commit and self._term_at(candidate) == self.term:
+            self.commit = candidate
+            self._lock.notify_all()
+
+    def _renew_lease(self):
+        # Caller holds _lock. The lease starts when the majority-th most
+        # recent acknowledged AppendEntries was sent
+        times = sorted(list(self._acked.values()) + [time.monotonic()], reverse=True)
+        if len(times) >= self._majority():
+            self._lease_until = max(self._lease_until, times[self._majority() - 1] + LEASE)
+
+    def AppendEntries(self, request, context):
+        with self._lock:
+            if request.term < self.term:
+                return storage_pb2.AppendReply(term=self.term, last_index=self._last_index())
+            if request.term > self.term or self.role != FOLLOWER:
+                self._become_follower(request.term)
+            self.leader = request.leader
+            self._heard = time.monotonic()
+            self._reset_deadline()
+            self._lease_until = time.monotonic() + request.lease
+            self._leader_commit = request.commit
+            install = request.install
+            if not install:
+                reply = self._append(request)
+                if reply is not None:
+                    return reply
+        if install:
+            self._install(request)
+        else:
+            self._apply_committed()
+        with self._lock:
+            return storage_pb2.AppendReply(term=self.term, success=True, last_index=self._last_index(),
+                                           watches=self._take_watches())
+
+    def _append(self, request):
+        # Caller holds _lock. Adds request's entries to the log; returns a
+        # refusal, or None on success
+        refuse = lambda **kwargs: storage_pb2.AppendReply(term=self.term, last_index=self._last_index(), **kwargs)
+        if not self._synced or request.prev_index < self._base_index:
+            return refuse(need_snapshot=True)
+        if request.prev_index > self._last_index():
+            return refuse()  # behind; the leader backs up
+        if self._term_at(request.prev_index) != request.prev_term:
+            return self._diverged(refuse)
+        index = request.prev_index
+        for entry in request.entries:
+            index += 1
+            if index <= self._last_index():
+                if self._term_at(index) == entry.term:
+                    continue
+                if any(applied for _, _, applied in self._entries[index - self._base_index - 1:]):
+                    return self._diverged(refuse)
+                del self._entries[index - self._base_index - 1:]
+            self._entries.append((entry.term, entry.record, False))
+        self.commit = max(self.commit, min(request.commit, index))
+        return None
+
+    def _diverged(self, refuse):
+        # This store holds changes the leader's log doesn't: start over from a snapshot
+        self._synced = False
+        return refuse(need_snapshot=True)
+
+    def _install(self, request):
+        # Replace the store with the leader's snapshot taken at prev_index
+        # Lock order: _apply_lock -> the WAL's compaction lock -> store locks;
+        # the WAL's flusher compacts without _apply_lock
+        with self._apply_lock:
+            with self.durable.replacing() if self.durable is not None else nullcontext():
+                self.store.reset()
+                self._apply_records([request.snapshot])
+            with self._lock:
+                self._entries = []
+                self._base_index = self._applied = request.prev_index
+                self._base_term = request.prev_term
+                self.commit = max(self.commit, request.prev_index)
+                self._synced = True
+        print(f"[Controller] Member {self.me} installed a snapshot of the leader's metadata at index "
+              f"{request.prev_index}")
+
+    def _take_watches(self):
+        return {fname: storage_pb2.WatchList(ids=sorted(nids)) for fname, nids in self.watchers.take().items()}
+
+
+class GroupInterceptor(grpc.ServerInterceptor):
+    # Enforces the group's rules on StorageController calls: writes only on
+    # the leader and answered once committed, reads only under a lease.
+    # Refused calls fail with UNAVAILABLE; GroupStub then finds the leader.
+    def __init__(self, raft):
+        self.raft = raft
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        service, _, name = handler_call_details.method.rpartition("/")
+        if handler is None or service != SERVICE or name in ANYWHERE:
+            return handler
+        allowed = self.raft.can_read if name in READS else self.raft.is_leader
+        if handler.unary_unary:
+            return handler._replace(unary_unary=self._unary(handler.unary_unary, allowed, name not in READS))
+        if handler.unary_stream:
+            return handler._replace(unary_stream=self._stream(handler.unary_stream, allowed))
+        if handler.stream_stream:
+            return handler._replace(stream_stream=self._stream(handler.stream_stream, allowed, name not in READS))
+        return handler
+
+    def _refuse(self, context):
+        leader = self.raft.leader_address()
+        where = f"the leader is {leader[0]}:{leader[1]}" if leader else "no leader elected yet"
+        context.abort(grpc.StatusCode.UNAVAILABLE, f"Controller member {self.raft.me} can't serve this; {where}")
+
+    def _unary(self, behavior, allowed, write):
+        def call(request, context):
+            if not allowed():
+                self._refuse(context)
+            before = self.raft.last_index()
+            response = behavior(request, context)
+            after = self.raft.last_index()
+            if write and after > before and not self.raft.wait_committed(after):
+                context.abort(grpc.StatusCode.UNAVAILABLE, "Lost leadership before the change was committed")
+            return response
+        return call
+
+    def _stream(self, behavior, allowed, write=False):
+        # A write stream sends each response once the changes before it are committed
+        def call(request, context):
+            if not allowed():
+                self._refuse(context)
+            before = self.raft.last_index()
+            for response in behavior(request, context):
+                after = self.raft.last_index()
+                if write and after > before and not self.raft.wait_committed(after):
+                    context.abort(grpc.StatusCode.UNAVAILABLE, "Lost leadership before the change was committed")
+                before = after
+                yield response
+        return call
+
+
+class GroupStub:
+    # Drop-in for the StorageControllerStub of a controller group: reads go
+    # round-robin to all members, writes to the leader, which is looked up
+    # again (and the call retried) while an election is going on
+    def __init__(self, members, leader=-1):
+        self.stubs = [group_pool.controller_stub(host, port) for host, port in members]
+        self.leader = leader
+        self._lock = threading.Lock()
+        self._turn = 0
+
+    def __getattr__(self, name):
+        if name in READS:
+            return lambda request, **kwargs: self._read(name, request, **kwargs)
+        return lambda request, **kwargs: self._write(name, request, **kwargs)
+
+    def _read(self, name, request, **kwargs):
+        with self._lock:
+            start = self._turn
+            self._turn += 1
+        for i in range(len(self.stubs)):
+            try:
+                return getattr(self.stubs[(start + i) % len(self.stubs)], name)(request, **kwargs)
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE or i == len(self.stubs) - 1:
+                    raise
+
+    def ListFilesStream(self, request, **kwargs):
+        return self._read_stream("ListFilesStream", request, **kwargs)
+
+    def ListDirectory(self, request, **kwargs):
+        return self._read_stream("ListDirectory", request, **kwargs)
+
+    def _read_stream(self, name, request, **kwargs):
+        # A member without a lease refuses the stream before its first batch;
+        # the next member is tried then
+        with self._lock:
+            start = self._turn
+            self._turn += 1
+        for i in range(len(self.stubs)):
+            call = getattr(self.stubs[(start + i) % len(self.stubs)], name)(request, **kwargs)
+            try:
+                first = next(call)
+            except StopIteration:
+                return
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE or i == len(self.stubs) - 1:
+                    raise
+                continue
+            try:
+                yield first
+                yield from call
+            finally:
+                call.cancel()
+            return
+
+    def _write(self, name, request, **kwargs):
+        deadline = time.monotonic() + FAILOVER_TIMEOUT
+        while True:
+            if self.leader < 0:
+                self.find_leader()
+            try:
+                return getattr(self.stubs[max(self.leader, 0)], name)(request, **kwargs)
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE or time.monotonic() > deadline:
+                    raise
+                self.leader = -1
+                time.sleep(HEARTBEAT_INTERVAL)
+
+    def find_leader(self):
+        for stub in self.stubs:
+            try:
+                group = stub.GetGroup(storage_pb2.NodeInfo(), timeout=RPC_TIMEOUT)
+            except grpc.RpcError:
+                continue
+            if group.leader >= 0:
+                self.leader = group.leader
+                return self.leader
+        return -1
+
+    def HeartbeatStream(self, request_iterator, **kwargs):
+        if self.leader < 0:
+            self.find_leader()
+        return self._follow(self.stubs[max(self.leader, 0)].HeartbeatStream(request_iterator, **kwargs))
+
+    def AnnounceFiles(self, request_iterator, **kwargs):
+        # Not retried: batches already sent may have been recorded
+        if self.leader < 0:
+            self.find_leader()
+        return self.stubs[max(self.leader, 0)].AnnounceFiles(request_iterator, **kwargs)
+
+    def _follow(self, call):
+        # The stream ends when the leader steps down or dies; look it up again next time
+        try:
+            yield from call
+        finally:
+            self.leader = -1
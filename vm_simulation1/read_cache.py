@@ -0,0 +1,91 @@
+# Node-side cache of download responses for hot files.
+#
+# Popular files are downloaded from the same owners over and over. The cache
+# keeps the pre-encoded responses (zero_copy.EncodedMessage) of recent
+# downloads, keyed by (method, filename, offset, length), so a hit is sent
+# without reading the manifest, touching the chunk mappings or copying data.
+#
+# Eviction is LRU within a byte budget. A response bigger than a quarter of
+# the budget is not cached, so one large download can't flush every hot file.
+# The chunk store reports every file it commits or removes (ChunkStore
+# on_change), which drops that file's entries; a per-file generation number
+# keeps a response that was being built during the change from being cached.
+
+import collections
+import threading
+
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ReadCache:
+    def __init__(self, capacity=DEFAULT_CACHE_BYTES):
+        self.capacity = capacity
+        self.max_entry = capacity // 4
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> (messages, size)
+        self._keys = {}          # filename -> keys cached for it
+        self._generation = {}    # filename -> bumped on every invalidation
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        # Cached messages for key, or None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def token(self, fname):
+        # Take before reading the file; put() ignores responses built from a
+        # version that has been invalidated since
+        with self._lock:
+            return self._generation.get(fname, 0)
+
+    def put(self, key, messages, size, token):
+        fname = key[1]
+        with self._lock:
+            if size > self.max_entry or self._generation.get(fname, 0) != token:
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.used -= old[1]
+            self._entries[key] = (tuple(messages), size)
+            self._keys.setdefault(fname, set()).add(key)
+            self.used += size
+            while self.used > self.capacity:
+                old_key, (_, old_size) = self._entries.popitem(last=False)
+                self._forget(old_key)
+                self.used -= old_size
+                self.evictions += 1
+            return True
+
+    def invalidate(self, fname):
+        with self._lock:
+            self._generation[fname] = self._generation.get(fname, 0) + 1
+            for key in self._keys.pop(fname, ()):
+                self.used -= self._entries.pop(key)[1]
+                self.invalidations += 1
+
+    def _forget(self, key):
+        keys = self._keys.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[key[1]]
+
+    def stats(self, reset=False):
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                     'invalidations': self.invalidations, 'entries': len(self._entries),
+                     'bytes': self.used, 'capacity': self.capacity}
+            if reset:
+                self.hits = self.misses = self.evictions = self.invalidations = 0
+            return stats
@@ -0,0 +1,144 @@
+# Background replication fan-out for the controller.
+#
+# AnnounceFile hands the list of replica targets to the scheduler and returns
+# straight away; AnnounceFiles hands over a whole batch of uploads, and each
+# target node is told about all of its files in one NotifyDuplicates call.
+# The notifications run on a thread pool with a deadline per call, so a dead
+# node only costs one worker for NOTIFY_TIMEOUT seconds instead of stalling
+# the upload. Channels to the targets come from the shared pool.
+#
+# Under the asyncio controller (use_asyncio) the notifications are tasks on
+# the event loop instead, so any number of them can wait on slow nodes at once.
+
+import asyncio
+import threading
+from concurrent import futures
+
+import grpc
+
+from channel_pool import pool
+from proto import storage_pb2
+
+
+NOTIFY_TIMEOUT = 3  # seconds allowed for one NotifyDuplicate call
+MAX_WORKERS = 16
+
+PENDING = "pending"
+NOTIFIED = "notified"
+FAILED = "failed"
+
+
+class ReplicationScheduler:
+    def __init__(self, max_workers=MAX_WORKERS, timeout=NOTIFY_TIMEOUT):
+        self.timeout = timeout
+        self._pool = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="replication")
+        self._lock = threading.Lock()
+        self._jobs = {}  # filename -> {target id: state}
+        self._aio_pool = None
+        self._loop = None
+        self._tasks = set()  # running notification tasks, asyncio mode only
+
+    def use_asyncio(self, aio_pool):
+        # Notify with coroutines on the running event loop, over aio channels
+        self._aio_pool = aio_pool
+        self._loop = asyncio.get_running_loop()
+
+    def _spawn(self, coroutine):
+        # Start a notification task on the loop; the handlers that schedule
+        # them run in worker threads
+        def start():
+            task = self._loop.create_task(coroutine)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._loop.call_soon_threadsafe(start)
+
+    def schedule(self, announcement, targets):
+        # Queue a NotifyDuplicate for every (id, address, port) target
+        fname = announcement.filename
+        with self._lock:
+            self._jobs[fname] = {nid: PENDING for nid, _, _ in targets}
+        for nid, addr, port in targets:
+            if self._aio_pool is not None:
+                self._spawn(self._notify_async(announcement, nid, addr, port))
+            else:
+                self._pool.submit(self._notify, announcement, nid, addr, port)
+
+    def schedule_batch(self, uploads):
+        # schedule() for many [(announcement, targets)], one call per target node
+        per_node = {}
+        with self._lock:
+            for announcement, targets in uploads:
+                self._jobs[announcement.filename] = {nid: PENDING for nid, _, _ in targets}
+                for target in targets:
+                    per_node.setdefault(target, []).append(announcement)
+        for (nid, addr, port), announcements in per_node.items():
+            batch = storage_pb2.FileAnnouncementBatch(files=announcements)
+            if self._aio_pool is not None:
+                self._spawn(self._notify_batch_async(batch, nid, addr, port))
+            else:
+                self._pool.submit(self._notify_batch, batch, nid, addr, port)
+
+    def progress(self, fname):
+        # Returns a copy of {target id: state} for fname
+        with self._lock:
+            return dict(self._jobs.get(fname, {}))
+
+    def forget(self, fname):
+        with self._lock:
+            self._jobs.pop(fname, None)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _notify(self, announcement, nid, addr, port):
+        fname = announcement.filename
+        try:
+            pool.node_stub(addr, port).NotifyDuplicate(announcement, timeout=self.timeout)
+            state = NOTIFIED
+            print(f"[Controller] Notified {nid} about replica of {fname}")
+        except grpc.RpcError as e:
+            state = FAILED
+            print(f"[Controller] Failed to notify {nid}: {e.code().name}")
+        self._finish(fname, nid, state)
+
+    async def _notify_async(self, announcement, nid, addr, port):
+        fname = announcement.filename
+        try:
+            await self._aio_pool.node_stub(addr, port).NotifyDuplicate(announcement, timeout=self.timeout)
+            state = NOTIFIED
+            print(f"[Controller] Notified {nid} about replica of {fname}")
+        except grpc.RpcError as e:
+            state = FAILED
+            print(f"[Controller] Failed to notify {nid}: {e.code().name}")
+        self._finish(fname, nid, state)
+
+    def _notify_batch(self, batch, nid, addr, port):
+        try:
+            pool.node_stub(addr, port).NotifyDuplicates(batch, timeout=self.timeout)
+            state = NOTIFIED
+            print(f"[Controller] Notified {nid} about replicas of {len(batch.files)} files")
+        except grpc.RpcError as e:
+            state = FAILED
+            print(f"[Controller] Failed to notify {nid}: {e.code().name}")
+        for announcement in batch.files:
+            self._finish(announcement.filename, nid, state)
+
+    async def _notify_batch_async(self, batch, nid, addr, port):
+        try:
+            await self._aio_pool.node_stub(addr, port).NotifyDuplicates(batch, timeout=self.timeout)
+            state = NOTIFIED
+            print(f"[Controller] Notified {nid} about replicas of {len(batch.files)} files")
+        except grpc.RpcError as e:
+            state = FAILED
+            print(f"[Controller] Failed to notify {nid}: {e.code().name}")
+        for announcement in batch.files:
+            self._finish(announcement.filename, nid, state)
+
+    def _finish(self, fname, nid, state):
+        with self._lock:
+            job = self._jobs.get(fname)
+            # A newer announcement may have replaced this job in the meantime
+            if job is not None and nid in job:
+                job[nid] = state
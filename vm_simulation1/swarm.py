@@ -0,0 +1,340 @@
+# Parallel multi-source ("swarm") downloads.
+#
+# A file is split into fixed-size byte ranges that are fetched at the same time
+# from every node holding a copy. Each peer pulls the next range when it finishes
+# its current one, so slow peers naturally end up serving fewer ranges. A range
+# that fails is put back in the queue for the other peers to retry.
+#
+# With a chunk store the download is content-addressed instead: the peers'
+# manifests say which chunks make up the file, chunks the store already has
+# (from other files or an older version) are skipped, and the missing ones are
+# fetched in batches of about RANGE_SIZE bytes the same way ranges are.
+#
+# Only as many peers as the file has parts to keep busy are used, best first
+# by the PeerSelector (load hints, measured latency, recent failures). The
+# rest are spares: when a peer is dropped after repeated failures, the next
+# spare that holds the same version takes over its share.
+#
+# Erasure-coded files are fetched shard by shard instead (ShardDownloader):
+# k shards at once, any k of the k + m rebuild the file.
+
+import math
+import os
+import queue
+import threading
+
+import grpc
+
+from proto import storage_pb2
+from channel_pool import pool
+from chunk_store import from_proto
+from peer_selector import selector as default_selector
+import erasure
+import transfer_codec
+
+
+RANGE_SIZE = 4 * 1024 * 1024   # bytes requested per ReadRange call
+STREAMS_PER_PEER = 2           # concurrent ranges in flight per peer
+MAX_PEER_FAILURES = 2          # consecutive failures before a peer is dropped
+RANGE_TIMEOUT = 60             # seconds allowed for one range
+
+
+class SwarmDownloadError(Exception):
+    pass
+
+
+class SwarmDownloader:
+    def __init__(self, peers, range_size=RANGE_SIZE, streams_per_peer=STREAMS_PER_PEER, store=None, selector=None,
+                 codecs=None):
+        # peers: NodeLocation messages (anything with id/address/port/active_transfers)
+        self.selector = selector or default_selector
+        self.peers = self.selector.order(peers)
+        self.range_size = range_size
+        self.streams_per_peer = streams_per_peer
+        self.store = store  # ChunkStore to download into, or None for plain range downloads
+        self.codecs = transfer_codec.available() if codecs is None else codecs  # accepted for chunk payloads
+        self.bytes_per_peer = {}
+        self.ranges_per_peer = {}  # ranges (or chunk batches) served by each peer
+        self.bytes_saved = 0       # bytes of the file the store already had
+        self._lock = threading.Lock()
+        self._completed = 0
+        self._threads = []
+        self._started = 0  # workers started by _run, each woken once the last item is done
+        self._spares = []
+
+    def download(self, fname, local_name):
+        # Fetch fname from all peers into local_name; returns the file size
+        if self.store is not None:
+            manifest, live, spares = self._manifest(fname)
+            if manifest is not None:
+                return self._download_chunks(fname, local_name, manifest, live, spares)
+        # No peer has a chunk store: fetch byte ranges
+        size, live, spares = self._stat(fname)
+        tmp_name = f"{local_name}.part"
+        os.makedirs(os.path.dirname(local_name) or ".", exist_ok=True)  # a nested name like d/f
+        with open(tmp_name, "wb") as f:
+            f.truncate(size)
+        try:
+            self._fetch_ranges(fname, size, tmp_name, live, spares)
+        except BaseException:
+            os.remove(tmp_name)
+            raise
+        os.replace(tmp_name, local_name)
+        if self.store is not None:
+            self.store.ingest(local_name, fname)
+        return size
+
+    def _peers_for(self, size):
+        # How many peers it takes to keep every stream busy
+        return max(1, math.ceil(size / (self.range_size * self.streams_per_peer)))
+
+    def _manifest(self, fname):
+        # The file's manifest, the best peers that hold that exact version and
+        # the peers left over as spares
+        manifest = None
+        live = []
+        for i, peer in enumerate(self.peers):
+            message = self._ask(peer, "GetManifest", fname)
+            if message is None:
+                continue
+            if manifest is None:
+                manifest = from_proto(message)
+            if from_proto(message)['chunks'] == manifest['chunks']:
+                live.append(peer)
+                if len(live) == self._peers_for(manifest['size']):
+                    return manifest, live, self.peers[i + 1:]
+        return manifest, live, []
+
+    def _ask(self, peer, method, fname):
+        # One metadata call (GetManifest/StatFile), timed by the selector; None
+        # if the peer can't answer
+        stub = pool.node_stub(peer.address, peer.port)
+        try:
+            return self.selector.call(peer, lambda: getattr(stub, method)(
+                storage_pb2.FileDownloadRequest(filename=fname), timeout=5))
+        except grpc.RpcError:
+            return None
+
+    def _download_chunks(self, fname, local_name, manifest, live, spares):
+        sizes = dict(manifest['chunks'])
+        missing = self.store.missing(h for h, _ in manifest['chunks'])
+        self.bytes_saved = manifest['size'] - sum(sizes[h] for h in missing)
+        batches = [[]]
+        batch_bytes = 0
+        for h in missing:
+            if batch_bytes >= self.range_size:
+                batches.append([])
+                batch_bytes = 0
+            batches[-1].append(h)
+            batch_bytes += sizes[h]
+
+        def fetch(stub, hashes):
+            got = set()
+            size = 0
+            request = storage_pb2.ChunkHashes(hashes=hashes, accept_codecs=self.codecs)
+            for message in stub.GetChunks(request, timeout=RANGE_TIMEOUT, compression=transfer_codec.GZIP):
+                try:
+                    data = transfer_codec.decode(message.codec, message.content)
+                    self.store.write_chunk(message.hash, data)
+                except ValueError as e:
+                    raise SwarmDownloadError(str(e))
+                got.add(message.hash)
+                size += len(data)
+            if got != set(hashes):
+                raise SwarmDownloadError(f"Peer sent {len(got)} of {len(set(hashes))} chunks")
+            return size
+
+        def check(peer):
+            message = self._ask(peer, "GetManifest", fname)
+            return message is not None and from_proto(message)['chunks'] == manifest['chunks']
+
+        if missing:
+            self._run(fname, live, batches, fetch, spares, check)
+        self.store.put_manifest(manifest)
+        return self.store.export(fname, local_name)
+
+    def _stat(self, fname):
+        # The file size, the best peers that report it and the spares; peers
+        # that can't answer are left out
+        size = None
+        live = []
+        for i, peer in enumerate(self.peers):
+            stat = self._ask(peer, "StatFile", fname)
+            if stat is None:
+                continue
+            if size is None:
+                size = stat.size
+            if stat.size == size:
+                live.append(peer)
+                if len(live) == self._peers_for(size):
+                    return size, live, self.peers[i + 1:]
+        if not live:
+            raise SwarmDownloadError(f"No peer could serve {fname}")
+        return size, live, []
+
+    def _fetch_ranges(self, fname, size, tmp_name, live, spares):
+        ranges = [(offset, min(self.range_size, size - offset)) for offset in range(0, size, self.range_size)]
+
+        def fetch(stub, item):
+            offset, length = item
+            with open(tmp_name, "r+b") as f:
+                self._fetch_range(stub, fname, offset, length, f)
+            return length
+
+        def check(peer):
+            stat = self._ask(peer, "StatFile", fname)
+            return stat is not None and stat.size == size
+
+        self._run(fname, live, ranges, fetch, spares, check)
+
+    def _run(self, fname, live, items, fetch, spares=(), check=None):
+        # Spread items over streams_per_peer workers per peer; fetch(stub, item)
+        # returns the bytes it got. check(peer) says whether a spare can stand
+        # in for a dropped peer.
+        total = len(items)
+        pending = queue.Queue()
+        for index in range(total):
+            pending.put(index)
+        self._completed = 0
+        self._started = 0
+        self._spares = list(spares)
+        for peer in live:
+            self._start(peer, items, fetch, pending, check)
+        while True:
+            with self._lock:
+                if not self._threads:
+                    break
+                t = self._threads.pop()
+            t.join()
+        if self._completed < total:
+            raise SwarmDownloadError(f"{total - self._completed} of {total} parts of {fname} could not be fetched")
+
+    def _start(self, peer, items, fetch, pending, check):
+        self.bytes_per_peer.setdefault(peer.id, 0)
+        self.ranges_per_peer.setdefault(peer.id, 0)
+        failures = [0]  # shared by all streams of this peer
+        for _ in range(self.streams_per_peer):
+            t = threading.Thread(target=self._worker, daemon=True,
+                                 args=(peer, items, fetch, pending, failures, check))
+            with self._lock:
+                self._threads.append(t)
+                self._started += 1
+            t.start()
+
+    def _failover(self, items, fetch, pending, check):
+        # A peer was dropped: the next spare holding the same version replaces it
+        while self._completed < len(items):
+            with self._lock:
+                if not self._spares:
+                    return
+                peer = self._spares.pop(0)
+            if check is None or check(peer):
+                self._start(peer, items, fetch, pending, check)
+                return
+
+    def _worker(self, peer, items, fetch, pending, failures, check):
+        while self._completed < len(items) and failures[0] < MAX_PEER_FAILURES:
+            try:
+                index = pending.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if index is None:
+                break
+            stub = pool.node_stub(peer.address, peer.port)
+            try:
+                got = self.selector.call(peer, lambda: fetch(stub, items[index]), timed=False)
+            except (grpc.RpcError, SwarmDownloadError):
+                # Hand the item back so another peer can retry it
+                pending.put(index)
+                with self._lock:
+                    failures[0] += 1
+                    dropped = failures[0] == MAX_PEER_FAILURES
+                if dropped:
+                    self._failover(items, fetch, pending, check)
+                continue
+            with self._lock:
+                failures[0] = 0
+                self._completed += 1
+                self.bytes_per_peer[peer.id] += got
+                self.ranges_per_peer[peer.id] += 1
+                done = self._completed == len(items)
+            if done:
+                # Wake the workers still waiting for an item
+                for _ in range(self._started):
+                    pending.put(None)
+
+    def _fetch_range(self, stub, fname, offset, length, f):
+        request = storage_pb2.RangeRequest(filename=fname, offset=offset, length=length)
+        got = 0
+        for chunk in stub.ReadRange(request, timeout=RANGE_TIMEOUT):
+            f.seek(chunk.offset)
+            f.write(chunk.content)
+            got += len(chunk.content)
+        if got != length:
+            raise SwarmDownloadError(f"Short read at offset {offset}: {got}/{length} bytes")
+
+
+
+class ShardDownloader:
+    # Rebuilds an erasure-coded file from the first k of its shards that
+    # arrive. k fetches run at once, data shards (no decoding needed) and the
+    # best peers first; a fetch that fails is replaced by the next shard.
+    def __init__(self, layout, store=None, selector=None):
+        self.layout = layout  # ShardLayout from the controller
+        self.store = store    # ChunkStore the rebuilt file is added to, or None
+        self.selector = selector or default_selector
+        self.bytes_per_peer = {}
+        self.ranges_per_peer = {}  # shards served by each peer
+        self.bytes_saved = 0       # kept for the same report as SwarmDownloader
+        self._lock = threading.Lock()
+
+    def download(self, fname, local_name):
+        k = self.layout.k
+        rank = {node.id: i for i, node in enumerate(self.selector.order(s.node for s in self.layout.shards))}
+        candidates = queue.Queue()
+        for shard in sorted(self.layout.shards, key=lambda s: (s.index >= k, rank[s.node.id])):
+            candidates.put(shard)
+        shards = {}
+        threads = [threading.Thread(target=self._worker, args=(fname, candidates, shards), daemon=True)
+                   for _ in range(k)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if len(shards) < k:
+            raise SwarmDownloadError(f"Only {len(shards)} of the {k} shards needed to rebuild {fname} "
+                                     f"could be fetched")
+        data = erasure.decode(shards, k, self.layout.m, self.layout.size)
+        tmp_name = f"{local_name}.part"
+        os.makedirs(os.path.dirname(local_name) or ".", exist_ok=True)
+        with open(tmp_name, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, local_name)
+        if self.store is not None:
+            self.store.ingest(local_name, fname)
+        return len(data)
+
+    def _worker(self, fname, candidates, shards):
+        expected = erasure.shard_size(self.layout.size, self.layout.k)
+        while True:
+            with self._lock:
+                if len(shards) >= self.layout.k:
+                    return
+            try:
+                placed = candidates.get_nowait()
+            except queue.Empty:
+                return
+            node = placed.node
+            stub = pool.node_stub(node.address, node.port)
+            request = storage_pb2.FileDownloadRequest(filename=erasure.shard_name(fname, placed.index))
+            fetch = lambda: b"".join(c.content for c in stub.DownloadFileStream(request, timeout=RANGE_TIMEOUT))
+            try:
+                data = self.selector.call(node, fetch, timed=False)
+            except grpc.RpcError:
+                continue
+            if len(data) != expected:
+                continue  # a shard of some other version
+            with self._lock:
+                shards[placed.index] = data
+                self.bytes_per_peer[node.id] = self.bytes_per_peer.get(node.id, 0) + len(data)
+                self.ranges_per_peer[node.id] = self.ranges_per_peer.get(node.id, 0) + 1
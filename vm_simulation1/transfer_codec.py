@@ -0,0 +1,98 @@
+# Compression of file bytes sent between nodes.
+#
+# Chunk payloads (ChunkData, FileDelta literals) carry a codec name next to
+# the content; "" means raw. Nodes advertise the codecs they can decode when
+# they register and the controller hands them out with every NodeLocation;
+# a sender uses the first codec of its own preference order that the
+# receiver also has, and raw bytes when there is none. Downloads work the
+# other way round: the receiver lists the codecs it accepts in the request.
+#
+# zlib is always there; zstd and lz4 are used when the zstandard / lz4
+# packages are installed. Before compressing, a sample of the data is checked
+# for byte entropy, so media, archives and encrypted data go out raw without
+# burning CPU, and a payload that does not shrink by MIN_GAIN is sent raw too.
+#
+# The hash lists (manifests, MissingChunks answers) are hex strings; those
+# calls use gRPC's own gzip message compression (GZIP below) instead.
+
+import collections
+import math
+import zlib
+
+import grpc
+
+
+MIN_SIZE = 512          # payloads below this are not worth compressing
+MIN_GAIN = 0.1          # compressed output must be at least 10% smaller
+SAMPLE_SIZE = 1024      # bytes per entropy sample; three samples per payload
+MAX_ENTROPY = 7.0       # bits/byte; above this the data is taken as incompressible
+GZIP = grpc.Compression.Gzip
+
+_CODECS = {"zlib": (lambda data: zlib.compress(data, 1), zlib.decompress)}
+try:
+    import zstandard
+    _zstd_c, _zstd_d = zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor()
+    _CODECS["zstd"] = (_zstd_c.compress, _zstd_d.decompress)
+except ImportError:
+    pass
+try:
+    import lz4.frame
+    _CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+PREFERENCE = [name for name in ("zstd", "lz4", "zlib") if name in _CODECS]
+
+
+def available():
+    # Codecs this process can decode, best first
+    return list(PREFERENCE)
+
+
+def choose(remote):
+    # Best codec both sides have, or "" for raw
+    remote = set(remote)
+    for name in PREFERENCE:
+        if name in remote:
+            return name
+    return ""
+
+
+def entropy(data):
+    # Shannon entropy of data in bits per byte (0..8)
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(c / total * math.log2(c / total) for c in collections.Counter(data).values())
+
+
+def compressible(data):
+    # Sample the start, middle and end instead of scanning all of data
+    n = len(data)
+    if n <= 3 * SAMPLE_SIZE:
+        return entropy(bytes(data)) <= MAX_ENTROPY
+    middle = (n - SAMPLE_SIZE) // 2
+    sample = bytes(data[:SAMPLE_SIZE]) + bytes(data[middle:middle + SAMPLE_SIZE]) + bytes(data[-SAMPLE_SIZE:])
+    return entropy(sample) <= MAX_ENTROPY
+
+
+def encode(data, codec):
+    # (codec used, payload): data compressed with codec when it pays off
+    if not codec or len(data) < MIN_SIZE or not compressible(data):
+        return "", data
+    packed = _CODECS[codec][0](data)
+    if len(packed) > len(data) * (1 - MIN_GAIN):
+        return "", data
+    return codec, packed
+
+
+def decode(codec, payload):
+    # Raises ValueError for codecs this process lacks and corrupt payloads
+    if not codec:
+        return payload
+    if codec not in _CODECS:
+        raise ValueError(f"Unsupported codec {codec!r}")
+    try:
+        return _CODECS[codec][1](payload)
+    except Exception as e:  # zlib.error, zstandard.ZstdError, lz4 RuntimeError
+        raise ValueError(f"Corrupt {codec} payload: {e}")
@@ -0,0 +1,91 @@
+# Pre-encoded download responses, built around mapped chunk data.
+#
+# upb protobuf messages only accept bytes, so a FileChunk built the usual way
+# copies its data three times in Python: read() into bytes, into the message,
+# and out again in SerializeToString(). For files in the chunk store the node
+# instead writes the FileChunk / FileContent wire format itself around
+# memoryview slices of the mapped chunk files (ChunkStore.view) and returns an
+# EncodedMessage. PreEncodedInterceptor gives the download methods a serializer
+# that passes those through unchanged, so the one copy left is the b"".join()
+# from the page cache into the bytes handed to gRPC. Ordinary messages still
+# serialize as before.
+
+import grpc
+
+
+# Methods whose handlers may return EncodedMessage instead of a protobuf message
+DOWNLOAD_METHODS = (
+    "/storage.NodeFileService/DownloadFile",
+    "/storage.NodeFileService/DownloadFileStream",
+    "/storage.NodeFileService/ReadRange",
+)
+
+
+class EncodedMessage:
+    # Serialized message; content is the payload, kept for byte counting
+    __slots__ = ("wire", "content")
+
+    def __init__(self, wire, content):
+        self.wire = wire
+        self.content = content
+
+
+def _varint(n):
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def _field(number, data_len):
+    # Tag and length prefix of a length-delimited field
+    return _varint(number << 3 | 2) + _varint(data_len)
+
+
+def _int_field(number, value):
+    return _varint(number << 3) + _varint(value) if value else b""
+
+
+def encode_file_chunk(fname, views, offset, total_size):
+    # FileChunk{filename=1, content=2, offset=3, total_size=4}, content being
+    # the views back to back
+    name = fname.encode("utf-8")
+    size = sum(len(v) for v in views)
+    head = _field(1, len(name)) + name + _field(2, size)
+    wire = b"".join([head] + list(views) + [_int_field(3, offset) + _int_field(4, total_size)])
+    return EncodedMessage(wire, memoryview(wire)[len(head):len(head) + size])
+
+
+def encode_file_content(fname, views):
+    # FileContent{filename=1, content=2}
+    name = fname.encode("utf-8")
+    size = sum(len(v) for v in views)
+    head = _field(1, len(name)) + name + _field(2, size)
+    wire = b"".join([head] + list(views))
+    return EncodedMessage(wire, memoryview(wire)[len(head):])
+
+
+def serialize(message):
+    if isinstance(message, EncodedMessage):
+        return message.wire
+    return message.SerializeToString()
+
+
+class PreEncodedInterceptor(grpc.ServerInterceptor):
+    def __init__(self, methods=DOWNLOAD_METHODS):
+        self.methods = set(methods)
+        self._handlers = {}  # method -> handler with the pass-through serializer
+
+    def intercept_service(self, continuation, handler_call_details):
+        method = handler_call_details.method
+        if method not in self.methods:
+            return continuation(handler_call_details)
+        handler = self._handlers.get(method)
+        if handler is None:
+            handler = continuation(handler_call_details)
+            if handler is None:
+                return None
+            handler = self._handlers[method] = handler._replace(response_serializer=serialize)
+        return handler